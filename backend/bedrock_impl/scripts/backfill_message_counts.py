@@ -0,0 +1,16 @@
+"""
+Recount message_count on every session in CONVERSATIONS_TABLE_NAME.
+
+Sessions created before message_count was added to the METADATA item have no
+count, and the first message after the upgrade starts it from 0. Run once after
+deploying that change (it is safe to run again):
+
+    CONVERSATIONS_TABLE_NAME=... poetry run backfill-message-counts
+"""
+from bedrock_impl.store import ChatStore
+
+
+def main():
+    print("Recounting messages of every session...")
+    corrected = ChatStore().backfill_message_counts()
+    print(f"Corrected {corrected} session(s)")
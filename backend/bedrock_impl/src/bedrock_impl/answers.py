@@ -0,0 +1,73 @@
+"""
+Exact-match answer cache for context-free turns.
+
+The first question of a conversation has no history, so its answer depends only on
+the question and the knowledge base: word-for-word repeats across users ("how do I
+get an API key") are answered from CacheTable instead of another RetrieveAndGenerate
+call. Keys are the normalized question and the knowledge-base version, so a re-sync
+invalidates every cached answer.
+"""
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import uuid4
+
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import MetricUnit
+from botocore.exceptions import ClientError
+
+from bedrock_impl.cache import KnowledgeBaseVersion, TTLCache, metrics, normalize_query, require_env
+from bedrock_impl.models import RAGResponse
+
+logger = Logger('lambda-rag')
+
+ANSWER_CACHE_TTL_S = float(os.environ.get("ANSWER_CACHE_TTL_S", "86400"))
+
+
+class AnswerCache:
+
+    def __init__(
+        self,
+        knowledge_base_id: Optional[str] = None,
+        cache: Optional[TTLCache] = None,
+        version: Optional[KnowledgeBaseVersion] = None
+        ) -> None:
+
+        self.knowledge_base_id = knowledge_base_id or require_env("KNOWLEDGE_BASE_ID")
+        self.cache = cache if cache is not None else TTLCache("ANSWER", ANSWER_CACHE_TTL_S)
+        self.version = version if version is not None else KnowledgeBaseVersion(self.knowledge_base_id)
+
+    def _key(self, question: str) -> str:
+        return self.cache.key(self.knowledge_base_id, self.version(), normalize_query(question))
+
+    def get(self, question: str) -> Optional[RAGResponse]:
+        """The cached answer to `question` as a new message (fresh id and time, no Bedrock session)."""
+        started = time.perf_counter()
+        try:
+            cached = self.cache.get(self._key(question))
+        except ClientError:
+            # the cache only saves time: failing to read it must not fail the question
+            logger.warning("Answer cache read failed", exc_info = True)
+            cached = None
+
+        if cached is None:
+            metrics.add_metric(name = "AnswerCacheMiss", unit = MetricUnit.Count, value = 1)
+            return None
+        metrics.add_metric(name = "AnswerCacheHit", unit = MetricUnit.Count, value = 1)
+        metrics.add_metric(name = "AnswerCacheLookup", unit = MetricUnit.Milliseconds, value = (time.perf_counter() - started) * 1000)
+        return RAGResponse(
+            message_id = str(uuid4()),
+            content = cached["content"],
+            response_parts = cached["response_parts"],
+            session_id = "",
+            created_at = datetime.now(timezone.utc)
+        )
+
+    def put(self, question: str, response: RAGResponse) -> None:
+        try:
+            self.cache.put(self._key(question), response.model_dump(mode = "json", include = {"content", "response_parts"}))
+        except ClientError:
+            logger.warning("Answer cache write failed", exc_info = True)
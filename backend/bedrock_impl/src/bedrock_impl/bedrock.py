@@ -1,12 +1,17 @@
-from typing import Optional
-from bedrock_impl.models import RAGRequest, RAGResponse
-from bedrock_impl.store import AiMessage, UserMessage
+from __future__ import annotations
 
-import boto3
+from typing import TYPE_CHECKING, Iterator, Optional
+from bedrock_impl import clients
+from bedrock_impl.retrieval import CachedRetriever
+from bedrock_impl.models import RAGRequest, RAGResponse
+from bedrock_impl.store import AiMessage, ContextMessage, UserMessage
 
-from mypy_boto3_bedrock_agent_runtime.type_defs import RetrieveAndGenerateResponseTypeDef, RetrieveAndGenerateConfigurationTypeDef
-from mypy_boto3_bedrock_agent_runtime import AgentsforBedrockRuntimeClient
+# type stubs only: not needed (nor loaded) at run time
+if TYPE_CHECKING:
+    from mypy_boto3_bedrock_agent_runtime.type_defs import RetrieveAndGenerateResponseTypeDef, RetrieveAndGenerateConfigurationTypeDef
+    from mypy_boto3_bedrock_agent_runtime import AgentsforBedrockRuntimeClient
 from aws_lambda_powertools import Logger
+from botocore.exceptions import ClientError
 
 from uuid import uuid4
 from datetime import datetime, timezone
@@ -20,36 +25,67 @@ def require_env(name: str) -> str:
 
 logger = Logger(service="rag-bedrock-lambda")
 
+MODEL_ARN = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+GUARDRAIL_ID = "3x3fwig8roag"
+GUARDRAIL_VERSION = "3"
+
+# system prompt of the split path, which generates from retrieved (possibly cached) passages
+GROUNDED_PROMPT = (
+    "Answer the user's question using only the search results below. "
+    "If they do not contain the answer, say that you could not find it.\n\n{sources}"
+)
+
+# what RetrieveAndGenerate answers for a sessionId it has expired (or never issued)
+SESSION_EXPIRED_CODES = {"ValidationException", "ResourceNotFoundException"}
+
+class SessionExpiredError(RuntimeError):
+    """Bedrock no longer holds the conversation of this sessionId."""
+
 class Bedrock:
 
     def __init__(
         self,
         client: AgentsforBedrockRuntimeClient | None = None,
-        rag_config: RetrieveAndGenerateConfigurationTypeDef | None = None
+        rag_config: RetrieveAndGenerateConfigurationTypeDef | None = None,
+        retriever: CachedRetriever | None = None,
+        runtime_client = None
         ) -> None:
             
             self.client = (
                 client
                 if client is not None
-                else boto3.client("bedrock-agent-runtime")
+                else clients.bedrock_agent_runtime()
             )
             self.rag_config = (
                 rag_config
                 if rag_config is not None
-                else RetrieveAndGenerateConfigurationTypeDef(
-                    type = "KNOWLEDGE_BASE",
-                    knowledgeBaseConfiguration={
+                else {
+                    "type": "KNOWLEDGE_BASE",
+                    "knowledgeBaseConfiguration": {
                         "knowledgeBaseId": require_env("KNOWLEDGE_BASE_ID"),
-                        "modelArn": "anthropic.claude-3-5-sonnet-20240620-v1:0",
+                        "modelArn": MODEL_ARN,
                         "generationConfiguration": {
                             "guardrailConfiguration": {
-                                "guardrailId": "3x3fwig8roag",
-                                "guardrailVersion": "3",
+                                "guardrailId": GUARDRAIL_ID,
+                                "guardrailVersion": GUARDRAIL_VERSION,
                             }
                         }
                     }
-                )
+                }
             )
+            # split path: Retrieve (through the cache) and generate with Converse, instead of
+            # RetrieveAndGenerate running the vector search again for every question
+            self.retriever = retriever
+            self.runtime_client = (
+                runtime_client
+                if runtime_client is not None or retriever is None
+                else clients.bedrock_runtime()
+            )
+
+    @property
+    def keeps_sessions(self) -> bool:
+        """Whether answers come with a Bedrock sessionId to continue (not on the split path)."""
+        return self.retriever is None
 
     def parse_request(self, body: str) -> RAGRequest:
         """
@@ -57,53 +93,92 @@ class Bedrock:
         """
         return RAGRequest.model_validate_json(body)
 
-    def generate_response(self, query: str, context: Optional[list[AiMessage | UserMessage]] = None) -> RetrieveAndGenerateResponseTypeDef:
-        try:
-            if context:
-                prompt = f"Query: {query} | Context: {[str(message) + "\n" for message in context]}"
-            else:
-                prompt = query
+    def generate_response(
+        self,
+        query: str,
+        context: Optional[list[ContextMessage | AiMessage | UserMessage]] = None,
+        session_id: Optional[str] = None) -> RetrieveAndGenerateResponseTypeDef:
+        """
+        With a Bedrock `session_id`, Bedrock already holds the conversation: only the
+        query is sent. Without one, earlier messages (`context`) go into the prompt.
+        Raises SessionExpiredError when Bedrock no longer knows `session_id`.
+        On the split path (`retriever` set) there are no Bedrock sessions: pass `context`.
+        """
+        if self.retriever is not None:
+            return self._generate_from_passages(query, context)
+        return self._call(self.client.retrieve_and_generate, query, context, session_id)
 
-            return self.client.retrieve_and_generate(
+    def generate_response_stream(
+        self,
+        query: str,
+        context: Optional[list[ContextMessage | AiMessage | UserMessage]] = None,
+        session_id: Optional[str] = None) -> AnswerStream:
+        """generate_response through RetrieveAndGenerateStream: the answer arrives in chunks."""
+        return AnswerStream(self._call(self.client.retrieve_and_generate_stream, query, context, session_id))
+
+    def _call(self, operation, query: str, context, session_id: Optional[str]):
+        kwargs = {}
+        if session_id:
+            kwargs["sessionId"] = session_id
+
+        try:
+            return operation(
                 input = {
-                    "text": prompt
+                    "text": query if session_id else self._prompt(query, context)
                 },
                 retrieveAndGenerateConfiguration = self.rag_config,
+                **kwargs
             )
+        except ClientError as e:
+            if session_id and e.response.get("Error", {}).get("Code") in SESSION_EXPIRED_CODES:
+                raise SessionExpiredError(session_id) from e
+            raise RuntimeError(f"Bedrock API call failed: {e}") from e
         except Exception as e:
              raise RuntimeError(f"Bedrock API call failed: {e}") from e
 
+    def _prompt(self, query: str, context) -> str:
+        if not context:
+            return query
+        history = "\n".join(str(message) for message in context)
+        return f"Conversation so far:\n{history}\n\nQuery: {query}"
+
+    def _generate_from_passages(self, query: str, context) -> dict:
+        """
+        Converse over the retrieved passages, answered in RetrieveAndGenerate's shape
+        (without a sessionId) so parse_response applies: one citation of the whole
+        answer, referencing every passage it was given.
+        """
+        passages = self.retriever.retrieve(query)
+        sources = "\n\n".join(f"[{i}] {passage['text']}" for i, passage in enumerate(passages, 1))
+        try:
+            response = self.runtime_client.converse(
+                modelId = MODEL_ARN,
+                system = [{"text": GROUNDED_PROMPT.format(sources = sources)}],
+                messages = [{"role": "user", "content": [{"text": self._prompt(query, context)}]}],
+                guardrailConfig = {"guardrailIdentifier": GUARDRAIL_ID, "guardrailVersion": GUARDRAIL_VERSION},
+            )
+        except Exception as e:
+            raise RuntimeError(f"Bedrock API call failed: {e}") from e
+
+        text = "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+        references = [
+            {"content": {"text": passage["text"]}, "location": {"type": "WEB", "webLocation": {"url": passage["url"]}}}
+            for passage in passages
+            if passage.get("url")
+        ]
+        return {
+            "output": {"text": text},
+            "citations": [{"generatedResponsePart": {"textResponsePart": {"text": text}}, "retrievedReferences": references}] if references else [],
+        }
+
     def parse_response(self, response: RetrieveAndGenerateResponseTypeDef) -> RAGResponse:
         message_id = str(uuid4())
         output = response.get("output").get("text")
-        session_id = response.get("sessionId")
+        session_id = response.get("sessionId", "")
         citations = response.get("citations", [])
         created_at = datetime.now(timezone.utc)
 
-        extracted_parts = []
-
-        for citation in citations:
-            generated_response_part = citation.get("generatedResponsePart")
-            part_text = None
-            if generated_response_part:
-                text_response_part = generated_response_part.get("textResponsePart")
-                if text_response_part:
-                    part_text = text_response_part.get("text")
-
-            refs = citation.get("retrievedReferences", [])
-            simplified_refs = [
-                {
-                    "text": ref.get("content", {}).get("text"),
-                    "url": ref.get("location", {}).get("webLocation", {}).get("url"),
-                }
-                for ref in refs
-                if ref.get("location", {}).get("type") == "WEB"
-            ]
-
-            extracted_parts.append({
-                "text": part_text,
-                "references": simplified_refs,
-            })
+        extracted_parts = [parse_citation(citation) for citation in citations]
 
         return RAGResponse(
             message_id = message_id,
@@ -111,4 +186,65 @@ class Bedrock:
             response_parts = extracted_parts,
             session_id = session_id,
             created_at = created_at
-        )
\ No newline at end of file
+        )
+
+
+def parse_citation(citation: dict) -> dict:
+    """A Bedrock citation as a ResponsePart: the cited answer text and its WEB references."""
+    generated_response_part = citation.get("generatedResponsePart")
+    part_text = None
+    if generated_response_part:
+        text_response_part = generated_response_part.get("textResponsePart")
+        if text_response_part:
+            part_text = text_response_part.get("text")
+
+    refs = citation.get("retrievedReferences", [])
+    simplified_refs = [
+        {
+            "text": ref.get("content", {}).get("text"),
+            "url": ref.get("location", {}).get("webLocation", {}).get("url"),
+        }
+        for ref in refs
+        if ref.get("location", {}).get("type") == "WEB"
+    ]
+
+    return {
+        "text": part_text,
+        "references": simplified_refs,
+    }
+
+
+class AnswerStream:
+    """
+    A RetrieveAndGenerateStream answer. Iterating yields the text chunks as Bedrock
+    sends them, collecting citations on the way; `response()` is the whole answer
+    once the stream has been consumed.
+    """
+
+    def __init__(self, response: dict) -> None:
+        self.session_id = response.get("sessionId")
+        self._events = response["stream"]
+        self.chunks: list[str] = []
+        self.response_parts: list[dict] = []
+
+    def __iter__(self) -> Iterator[str]:
+        for event in self._events:
+            if "output" in event:
+                text = event["output"].get("text", "")
+                self.chunks.append(text)
+                yield text
+            elif "citation" in event:
+                citation = event["citation"]
+                # newer SDKs flatten the citation into the event; older ones nest it
+                self.response_parts.append(parse_citation(citation.get("citation", citation)))
+            elif event.keys() - {"guardrail"}:
+                raise RuntimeError(f"Bedrock stream failed: {event}")
+
+    def response(self) -> RAGResponse:
+        return RAGResponse(
+            message_id = str(uuid4()),
+            content = "".join(self.chunks),
+            response_parts = self.response_parts,
+            session_id = self.session_id,
+            created_at = datetime.now(timezone.utc)
+        )
@@ -0,0 +1,136 @@
+"""
+Caches kept across invocations: an in-memory layer per warm execution environment
+in front of CacheTable (template.yaml), a DynamoDB table whose items expire through
+its `expires_at` TTL attribute.
+
+Keys embed the knowledge-base version (see KnowledgeBaseVersion), so a re-sync of
+any data source makes every earlier entry unreachable; TTL then removes them.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from aws_lambda_powertools import Logger, Metrics
+
+from bedrock_impl import clients
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.service_resource import Table
+
+logger = Logger('lambda-rag')
+
+# flushed by the handlers' @metrics.log_metrics
+metrics = Metrics(namespace = "RagDemon", service = "rag-bedrock-lambda")
+
+# how long a knowledge-base version is trusted before the ingestion jobs are listed again
+KB_VERSION_REFRESH_S = float(os.environ.get("KB_VERSION_REFRESH_S", "60"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def require_env(name: str) -> str:
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise RuntimeError(f"Missing required environment variable: {name}")
+
+
+def normalize_query(text: str) -> str:
+    """Case, punctuation and spacing do not change the question: "How do I get an API key?" == "how do i get an api key"."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+class KnowledgeBaseVersion:
+    """
+    The knowledge base's content version: the latest completed ingestion job of each
+    of its data sources. Looked up at most every `refresh_s`, so a re-sync reaches a
+    warm environment within that interval.
+    """
+
+    def __init__(self, knowledge_base_id: str, client = None, refresh_s: float = KB_VERSION_REFRESH_S) -> None:
+        self.knowledge_base_id = knowledge_base_id
+        self.client = client if client is not None else clients.bedrock_agent()
+        self.refresh_s = refresh_s
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= self.refresh_s:
+                self._version = self._lookup()
+                self._checked_at = time.monotonic()
+            return self._version
+
+    def _lookup(self) -> str:
+        jobs = []
+        paginator = self.client.get_paginator("list_data_sources")
+        for page in paginator.paginate(knowledgeBaseId = self.knowledge_base_id):
+            for data_source in page["dataSourceSummaries"]:
+                latest = self.client.list_ingestion_jobs(
+                    knowledgeBaseId = self.knowledge_base_id,
+                    dataSourceId = data_source["dataSourceId"],
+                    filters = [{"attribute": "STATUS", "operator": "EQ", "values": ["COMPLETE"]}],
+                    sortBy = {"attribute": "STARTED_AT", "order": "DESCENDING"},
+                    maxResults = 1,
+                )["ingestionJobSummaries"]
+                jobs.append(f"{data_source['dataSourceId']}:{latest[0]['ingestionJobId'] if latest else '-'}")
+        return hashlib.sha256(",".join(sorted(jobs)).encode()).hexdigest()[:16]
+
+
+class TTLCache:
+    """
+    JSON values under `prefix`, kept for `ttl_s`: first in this environment's memory
+    (up to `max_entries`, least recently used out first), then in CacheTable.
+    """
+
+    def __init__(self, prefix: str, ttl_s: float, table: Optional[Table] = None, max_entries: int = 256) -> None:
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+        self.table = table if table is not None else clients.dynamodb_resource().Table(require_env("CACHE_TABLE_NAME"))
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, *parts: str) -> str:
+        return f"{self.prefix}#" + hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+
+        item = self.table.get_item(Key = {"pk": key}).get("Item")
+        # TTL deletes expired items eventually, not on time
+        if item is None or item["expires_at"] <= now:
+            return None
+        value = json.loads(item["value"])
+        self._remember(key, float(item["expires_at"]), value)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        expires_at = int(time.time() + self.ttl_s)
+        self.table.put_item(Item = {"pk": key, "value": json.dumps(value), "expires_at": expires_at})
+        self._remember(key, expires_at, value)
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last = False)
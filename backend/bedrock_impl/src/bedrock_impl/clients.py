@@ -0,0 +1,63 @@
+"""
+AWS clients shared by every invocation a Lambda execution environment serves.
+
+Clients are created on first use and then kept, so warm invocations reuse their
+connection pools (and TLS sessions) instead of building a new client per call.
+Handlers that never touch a service never pay for its client.
+"""
+import functools
+import os
+
+import boto3
+from botocore.config import Config
+
+
+def _config(read_timeout: float) -> Config:
+    return Config(
+        max_pool_connections = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10")),
+        tcp_keepalive = True,
+        connect_timeout = float(os.environ.get("AWS_CONNECT_TIMEOUT_S", "2")),
+        read_timeout = read_timeout,
+        retries = {"mode": "adaptive", "max_attempts": int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))},
+    )
+
+
+# DynamoDB answers in milliseconds; RetrieveAndGenerate may take most of the 30 s function timeout
+DYNAMODB_CONFIG = _config(float(os.environ.get("DYNAMODB_READ_TIMEOUT_S", "5")))
+BEDROCK_CONFIG = _config(float(os.environ.get("BEDROCK_READ_TIMEOUT_S", "25")))
+
+
+@functools.cache
+def session() -> boto3.session.Session:
+    return boto3.session.Session()
+
+
+@functools.cache
+def dynamodb_resource():
+    return session().resource("dynamodb", config = DYNAMODB_CONFIG)
+
+
+@functools.cache
+def dynamodb_client():
+    return session().client("dynamodb", config = DYNAMODB_CONFIG)
+
+
+@functools.cache
+def bedrock_agent_runtime():
+    return session().client("bedrock-agent-runtime", config = BEDROCK_CONFIG)
+
+
+@functools.cache
+def bedrock_runtime():
+    return session().client("bedrock-runtime", config = BEDROCK_CONFIG)
+
+
+@functools.cache
+def bedrock_agent():
+    return session().client("bedrock-agent", config = DYNAMODB_CONFIG)
+
+
+def reset() -> None:
+    """Forget every cached client (tests, or after a credentials change)."""
+    for factory in (session, dynamodb_resource, dynamodb_client, bedrock_agent_runtime, bedrock_runtime, bedrock_agent):
+        factory.cache_clear()
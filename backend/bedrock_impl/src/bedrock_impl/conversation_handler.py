@@ -0,0 +1,192 @@
+from typing import Any
+from pydantic import ValidationError
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent, event_source
+
+# no Bedrock client here: this function only reads and deletes conversations
+from bedrock_impl.store import ChatStore
+
+import functools
+import json
+
+logger = Logger('lambda-rag')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+DEFAULT_MESSAGES_PAGE_SIZE = 100
+MAX_MESSAGES_PAGE_SIZE = 500
+
+# built on first use and kept for the warm invocations that follow
+@functools.cache
+def get_chat_store() -> ChatStore:
+    return ChatStore()
+
+@event_source(data_class = APIGatewayProxyEvent)
+def conversation_handler(event: APIGatewayProxyEvent, context: LambdaContext) -> dict[str, Any]:
+    """
+    AWS Lambda handler for fetching conversations (sessions).
+    """
+
+    try:
+        path = event.path
+        path_params = event.path_parameters or {}
+        chat_store = get_chat_store()
+        http_method = event.http_method
+
+        if "/messages/" in path:
+            session_id = path_params.get("session_id")
+            if not session_id:
+                return {
+                    "statusCode": 400,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": "Missing session ID"
+                }
+
+            # ?limit=N&cursor=...&include_response_parts=false ; older pages via X-Next-Cursor
+            query_params = event.query_string_parameters or {}
+            include_response_parts = query_params.get("include_response_parts", "true").lower() != "false"
+            try:
+                limit = int(query_params.get("limit", DEFAULT_MESSAGES_PAGE_SIZE))
+                if not 1 <= limit <= MAX_MESSAGES_PAGE_SIZE:
+                    raise ValueError(f"limit must be between 1 and {MAX_MESSAGES_PAGE_SIZE}")
+                page = chat_store.get_messages(
+                    session_id,
+                    limit = limit,
+                    cursor = query_params.get("cursor"),
+                    include_response_parts = include_response_parts
+                )
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": f"Bad request: {e}"
+                }
+
+            headers = {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
+                'Access-Control-Expose-Headers': 'X-Next-Cursor'
+            }
+            if page.next_cursor:
+                headers['X-Next-Cursor'] = page.next_cursor
+            exclude = None if include_response_parts else {"response_parts"}
+            return {
+                "statusCode": 200,
+                'headers': headers,
+                "body": json.dumps([message.model_dump(mode='json', exclude=exclude) for message in page.messages]),
+            }
+        
+        elif "/conversation/" in path and http_method == "DELETE":
+            session_id = path_params.get("session_id")
+            if not session_id:
+                return {
+                    "statusCode": 400,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": "Missing session ID"
+                }
+
+            messages = chat_store.delete_conversation(session_id)
+            return {
+                "statusCode": 200,
+                'headers': {
+                    'Access-Control-Allow-Headers': 'Content-Type',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                },
+                "body": f"Successfully deleted conversation: {session_id}",
+            }
+        
+        elif "/conversation/" in path:
+            user_id = path_params.get("user_id")
+            if not user_id:
+                return {
+                    "statusCode": 400,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": "Missing user ID"
+                }
+
+            # ?limit=N&cursor=... ; the cursor of the next page comes back in X-Next-Cursor
+            query_params = event.query_string_parameters or {}
+            try:
+                limit = int(query_params.get("limit", DEFAULT_PAGE_SIZE))
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+                page = chat_store.get_conversations(user_id, limit = limit, cursor = query_params.get("cursor"))
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": f"Bad request: {e}"
+                }
+
+            headers = {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
+                'Access-Control-Expose-Headers': 'X-Next-Cursor'
+            }
+            if page.next_cursor:
+                headers['X-Next-Cursor'] = page.next_cursor
+            return {
+                "statusCode": 200,
+                'headers': headers,
+                "body": json.dumps([conversation.model_dump() for conversation in page.conversations]),
+            }
+
+        else:
+            return {
+                    "statusCode": 404,
+                    'headers': {
+                        'Access-Control-Allow-Headers': 'Content-Type',
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+                    },
+                    "body": "Not found"
+                }
+    
+    except ValidationError as ve:
+        logger.error("Validation error:", ve)
+        return {
+            "statusCode": 400,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+            },
+            "body": "Bad request"
+        }
+
+    except Exception as e:
+        logger.error("Internal error:", e)
+        return {
+            "statusCode": 500,
+            'headers': {
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+            },
+            "body": "Internal server error"
+        }
@@ -1,15 +1,15 @@
 import json, os, uuid
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional, Literal
-import boto3
 from aws_lambda_powertools import Logger
 from pydantic import BaseModel, ValidationError
 
+from bedrock_impl import clients
+
 # Initialise logger
 logger = Logger(service="feedback-handler")
 
 TABLE_NAME = os.environ.get("FEEDBACK_TABLE_NAME", "FeedbackTable")
-dynamodb = boto3.client("dynamodb")
 
 
 # -------------------- helpers --------------------
@@ -132,7 +132,7 @@ def handler(event, _context):
 
     # Save to DynamoDB
     try:
-        dynamodb.put_item(
+        clients.dynamodb_client().put_item(
             TableName=TABLE_NAME,
             Item=item,
             ConditionExpression="attribute_not_exists(pk) AND attribute_not_exists(sk)",
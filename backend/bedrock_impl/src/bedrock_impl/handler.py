@@ -1,17 +1,52 @@
-from typing import Any
+from typing import Any, Optional
 from pydantic import ValidationError, BaseModel
 
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent, event_source
 
+from bedrock_impl.answers import AnswerCache
 from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.cache import KnowledgeBaseVersion, metrics, require_env
+from bedrock_impl.idempotency import IdempotencyStore, RequestMismatchError, TurnInProgressError
+from bedrock_impl.retrieval import CachedRetriever
 from bedrock_impl.store import ChatStore
+from bedrock_impl.turns import ChatTurn
 
-import json
+import functools
+import os
 
 logger = Logger('lambda-rag')
 
+def enabled(flag: str) -> bool:
+    return os.environ.get(flag, "false").lower() == "true"
+
+# built on first use and kept for the warm invocations that follow
+@functools.cache
+def get_kb_version() -> KnowledgeBaseVersion:
+    return KnowledgeBaseVersion(require_env("KNOWLEDGE_BASE_ID"))
+
+@functools.cache
+def get_bedrock() -> Bedrock:
+    # KB_RETRIEVAL_CACHE=true: Retrieve through the cache, then generate (no Bedrock sessions)
+    if enabled("KB_RETRIEVAL_CACHE"):
+        return Bedrock(retriever = CachedRetriever(version = get_kb_version()))
+    return Bedrock()
+
+@functools.cache
+def get_answer_cache() -> Optional[AnswerCache]:
+    # ANSWER_CACHE=true: first questions are answered from earlier identical ones
+    return AnswerCache(version = get_kb_version()) if enabled("ANSWER_CACHE") else None
+
+@functools.cache
+def get_chat_store() -> ChatStore:
+    return ChatStore()
+
+@functools.cache
+def get_idempotency_store() -> Optional[IdempotencyStore]:
+    # IDEMPOTENCY=true: retries of a message_id get the first attempt's response
+    return IdempotencyStore() if enabled("IDEMPOTENCY") else None
+
 class Response(BaseModel):
     statusCode: int
     body: str
@@ -21,6 +56,7 @@ class Response(BaseModel):
                             'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
                         }
 
+@metrics.log_metrics
 @event_source(data_class = APIGatewayProxyEvent)
 def bedrock_handler(event: APIGatewayProxyEvent, context: LambdaContext) -> dict[str, Any]:
     """
@@ -36,167 +72,45 @@ def bedrock_handler(event: APIGatewayProxyEvent, context: LambdaContext) -> dict
         if not user_id:
             return Response(statusCode=400, body="Missing cognito user ID").model_dump()
         
-        bedrock = Bedrock()
-        chat_store = ChatStore()
+        bedrock = get_bedrock()
+        chat_store = get_chat_store()
 
         request = bedrock.parse_request(event.body)
         logger.debug("Parsed request: ", request)
 
-        session_id = request.session_id if request.session_id else chat_store.create_session(user_id = user_id)
-
-        chat_store.save_message(
-            role = 'user',
-            body = request.content,
-            session_id = session_id,
-        )
-
-        query_context = chat_store.get_latest_messages(
-            user_id = user_id,
-            session_id = session_id,
-            n = 5
-        )
-        
-        response = bedrock.generate_response(request.content, query_context)
-        response = bedrock.parse_response(response)
-
+        idempotency = get_idempotency_store()
+        if idempotency is not None:
+            stored = idempotency.begin(user_id, request)
+            if stored is not None:
+                logger.info("Retried request, returning the stored response", message_id = request.message_id)
+                return Response(statusCode=200, body=stored).model_dump()
+
+        try:
+            turn = ChatTurn(bedrock, chat_store, user_id, request, answers = get_answer_cache())
+            response = turn.finish(turn.generate())
+        except Exception:
+            if idempotency is not None:
+                idempotency.release(user_id, request)
+            raise
         logger.debug(f"Parsed response: {response}")
 
-        chat_store.save_message(
-            role = 'ai',
-            body = response.content,
-            session_id = session_id,
-            response_parts = response.response_parts
-        )
+        body = response.model_dump_json()
+        if idempotency is not None:
+            idempotency.complete(user_id, request, body)
+        return Response(statusCode=200, body=body).model_dump()
 
-        response.session_id = session_id
+    except TurnInProgressError:
+        return Response(statusCode=409, body="This message is still being answered").model_dump()
 
-        return Response(statusCode=200, body=response.model_dump_json()).model_dump()
+    except RequestMismatchError as e:
+        return Response(statusCode=422, body=str(e)).model_dump()
 
     except ValidationError as ve:
         logger.exception("Validation error")
         return Response(statusCode=400, body=f"Validation error: {ve.errors()}").model_dump()
 
-    except Exception as e:
-        logger.error("Internal error:", e)
-        return {
-            "statusCode": 500,
-            'headers': {
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            "body": "Internal server error"
-        }
-
-@event_source(data_class = APIGatewayProxyEvent)
-def conversation_handler(event: APIGatewayProxyEvent, context: LambdaContext) -> dict[str, Any]:
-    """
-    AWS Lambda handler for fetching conversations (sessions).
-    """
-
-    try:
-        path = event.path
-        path_params = event.path_parameters or {}
-        chat_store = ChatStore()
-        http_method = event.http_method
-
-        if "/messages/" in path:
-            session_id = path_params.get("session_id")
-            if not session_id:
-                return {
-                    "statusCode": 400,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    "body": "Missing session ID"
-                }
-
-            messages = chat_store.get_messages(session_id)
-            return {
-                "statusCode": 200,
-                'headers': {
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                "body": json.dumps([message.model_dump(mode='json') for message in messages]),
-            }
-        
-        elif "/conversation/" in path and http_method == "DELETE":
-            session_id = path_params.get("session_id")
-            if not session_id:
-                return {
-                    "statusCode": 400,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    "body": "Missing session ID"
-                }
-
-            messages = chat_store.delete_conversation(session_id)
-            return {
-                "statusCode": 200,
-                'headers': {
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                "body": f"Successfully deleted conversation: {session_id}",
-            }
-        
-        elif "/conversation/" in path:
-            user_id = path_params.get("user_id")
-            if not user_id:
-                return {
-                    "statusCode": 400,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    "body": "Missing user ID"
-                }
-
-            conversations = chat_store.get_conversations(user_id)
-            return {
-                "statusCode": 200,
-                'headers': {
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                "body": json.dumps([conversation.model_dump() for conversation in conversations]),
-            }
-
-        else:
-            return {
-                    "statusCode": 404,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    "body": "Not found"
-                }
-    
-    except ValidationError as ve:
-        logger.error("Validation error:", ve)
-        return {
-            "statusCode": 400,
-            'headers': {
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            "body": "Bad request"
-        }
-
-    except Exception as e:
-        logger.error("Internal error:", e)
+    except Exception:
+        logger.exception("Internal error")
         return {
             "statusCode": 500,
             'headers': {
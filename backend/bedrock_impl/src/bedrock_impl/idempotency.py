@@ -0,0 +1,119 @@
+"""
+Idempotent chat turns, keyed on the caller and RAGRequest.message_id.
+
+API Gateway and clients retry a request that timed out. Without a record of the
+first attempt every retry stored another user message, ran another Bedrock call
+and stored another answer. Each turn now claims an IDEMPOTENCY item in CacheTable
+with a conditional put:
+
+    IN_PROGRESS  a retry gets 409 until the turn completes (or its claim lapses)
+    COMPLETED    a retry gets the stored response body, without touching Bedrock
+
+Records expire through CacheTable's TTL after IDEMPOTENCY_TTL_S.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+from botocore.exceptions import ClientError
+
+from bedrock_impl import clients
+from bedrock_impl.cache import require_env
+from bedrock_impl.models import RAGRequest
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.service_resource import Table
+
+IDEMPOTENCY_TTL_S = int(os.environ.get("IDEMPOTENCY_TTL_S", "3600"))
+# a claim outlives the function timeout (30 s), so only a crashed turn's claim lapses
+IN_PROGRESS_TIMEOUT_S = int(os.environ.get("IDEMPOTENCY_IN_PROGRESS_TIMEOUT_S", "60"))
+
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+
+
+class TurnInProgressError(Exception):
+    """The same request is still being answered."""
+
+
+class RequestMismatchError(ValueError):
+    """The message_id was already used for a different request."""
+
+
+class IdempotencyStore:
+
+    def __init__(self, table: Optional[Table] = None) -> None:
+        self.table = table if table is not None else clients.dynamodb_resource().Table(require_env("CACHE_TABLE_NAME"))
+
+    def _key(self, user_id: str, request: RAGRequest) -> dict:
+        return {"pk": f"IDEMPOTENCY#{user_id}#{request.message_id}"}
+
+    def _fingerprint(self, request: RAGRequest) -> str:
+        return hashlib.sha256(f"{request.session_id or ''}\x1f{request.content}".encode()).hexdigest()
+
+    def begin(self, user_id: str, request: RAGRequest) -> Optional[str]:
+        """
+        Claim the turn: None when this invocation should answer it, else the response
+        body of the completed original. Raises TurnInProgressError while the original
+        runs, RequestMismatchError if the message_id came with another question.
+        """
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item = {
+                    **self._key(user_id, request),
+                    "status": IN_PROGRESS,
+                    "fingerprint": self._fingerprint(request),
+                    "in_progress_until": now + IN_PROGRESS_TIMEOUT_S,
+                    "expires_at": now + IDEMPOTENCY_TTL_S,
+                },
+                # free, expired (TTL deletes late), or claimed by a turn that died without releasing
+                ConditionExpression = "attribute_not_exists(pk) OR expires_at < :now OR (#status = :in_progress AND in_progress_until < :now)",
+                ExpressionAttributeNames = {"#status": "status"},
+                ExpressionAttributeValues = {":now": now, ":in_progress": IN_PROGRESS},
+                ReturnValuesOnConditionCheckFailure = "ALL_OLD",
+            )
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+            existing = e.response.get("Item") or self.table.get_item(Key = self._key(user_id, request), ConsistentRead = True)["Item"]
+
+        # low-level attribute values when they come from the error response
+        def attribute(name: str) -> str:
+            value = existing[name]
+            return value["S"] if isinstance(value, dict) else value
+
+        if attribute("fingerprint") != self._fingerprint(request):
+            raise RequestMismatchError(f"message_id {request.message_id} was already used for another request")
+        if attribute("status") != COMPLETED:
+            raise TurnInProgressError(request.message_id)
+        return attribute("response")
+
+    def complete(self, user_id: str, request: RAGRequest, response_body: str) -> None:
+        self.table.update_item(
+            Key = self._key(user_id, request),
+            UpdateExpression = "SET #status = :completed, #response = :response, expires_at = :expires_at REMOVE in_progress_until",
+            ExpressionAttributeNames = {"#status": "status", "#response": "response"},
+            ExpressionAttributeValues = {
+                ":completed": COMPLETED,
+                ":response": response_body,
+                ":expires_at": int(time.time()) + IDEMPOTENCY_TTL_S,
+            },
+        )
+
+    def release(self, user_id: str, request: RAGRequest) -> None:
+        """The turn failed: let a retry run it again."""
+        try:
+            self.table.delete_item(
+                Key = self._key(user_id, request),
+                ConditionExpression = "#status = :in_progress",
+                ExpressionAttributeNames = {"#status": "status"},
+                ExpressionAttributeValues = {":in_progress": IN_PROGRESS},
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
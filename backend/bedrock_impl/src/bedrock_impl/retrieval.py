@@ -0,0 +1,86 @@
+"""
+Knowledge-base retrieval through a cache, for the split path of Bedrock
+(Retrieve, then generate from the passages).
+
+RetrieveAndGenerate runs the vector search again for every question, FAQ repeats
+included. Here the passages of a question are cached under its normalized text and
+the knowledge-base version, in memory and in CacheTable, for KB_RETRIEVAL_CACHE_TTL_S.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Optional
+
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import MetricUnit
+from botocore.exceptions import ClientError
+
+from bedrock_impl import clients
+from bedrock_impl.cache import KnowledgeBaseVersion, TTLCache, metrics, normalize_query, require_env
+
+logger = Logger('lambda-rag')
+
+RETRIEVAL_CACHE_TTL_S = float(os.environ.get("KB_RETRIEVAL_CACHE_TTL_S", "86400"))
+RETRIEVAL_TOP_K = int(os.environ.get("KB_RETRIEVAL_TOP_K", "5"))
+
+
+class CachedRetriever:
+
+    def __init__(
+        self,
+        knowledge_base_id: Optional[str] = None,
+        client = None,
+        cache: Optional[TTLCache] = None,
+        version: Optional[KnowledgeBaseVersion] = None,
+        top_k: int = RETRIEVAL_TOP_K
+        ) -> None:
+
+        self.knowledge_base_id = knowledge_base_id or require_env("KNOWLEDGE_BASE_ID")
+        self.client = client if client is not None else clients.bedrock_agent_runtime()
+        self.cache = cache if cache is not None else TTLCache("RETRIEVE", RETRIEVAL_CACHE_TTL_S)
+        self.version = version if version is not None else KnowledgeBaseVersion(self.knowledge_base_id)
+        self.top_k = top_k
+
+    def retrieve(self, query: str) -> list[dict]:
+        """The top_k passages for `query`, as {"text", "url"} (url None for non-web sources)."""
+        started = time.perf_counter()
+        try:
+            key = self.cache.key(self.knowledge_base_id, self.version(), str(self.top_k), normalize_query(query))
+            cached = self.cache.get(key)
+        except ClientError:
+            # the cache only saves time: failing to read it (or the version) must not fail the question
+            logger.warning("Retrieval cache read failed", exc_info = True)
+            key = cached = None
+
+        if cached is not None:
+            lookup_ms = (time.perf_counter() - started) * 1000
+            metrics.add_metric(name = "RetrievalCacheHit", unit = MetricUnit.Count, value = 1)
+            metrics.add_metric(name = "RetrievalLatencySaved", unit = MetricUnit.Milliseconds, value = max(cached["retrieve_ms"] - lookup_ms, 0))
+            return cached["passages"]
+
+        metrics.add_metric(name = "RetrievalCacheMiss", unit = MetricUnit.Count, value = 1)
+        started = time.perf_counter()
+        try:
+            response = self.client.retrieve(
+                knowledgeBaseId = self.knowledge_base_id,
+                retrievalQuery = {"text": query},
+                retrievalConfiguration = {"vectorSearchConfiguration": {"numberOfResults": self.top_k}},
+            )
+        except Exception as e:
+            raise RuntimeError(f"Bedrock API call failed: {e}") from e
+        retrieve_ms = (time.perf_counter() - started) * 1000
+
+        passages = [
+            {
+                "text": result["content"]["text"],
+                "url": result.get("location", {}).get("webLocation", {}).get("url"),
+            }
+            for result in response["retrievalResults"]
+        ]
+        if key is not None:
+            try:
+                self.cache.put(key, {"passages": passages, "retrieve_ms": retrieve_ms})
+            except ClientError:
+                logger.warning("Retrieval cache write failed", exc_info = True)
+        return passages
@@ -1,28 +1,62 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Literal, Union
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Literal, Union
 
 from pydantic import AnyUrl, BaseModel, Field, model_serializer
 
 from uuid import uuid4
 import os
 
-from mypy_boto3_dynamodb.service_resource import Table
 from datetime import datetime, timezone
 from typing import Any
-import boto3
 from boto3.dynamodb.conditions import Key
 
+from bedrock_impl import clients
 from bedrock_impl.models import ResponsePart
 
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.service_resource import Table
+
+import base64
+import json
 import urllib.parse
 
+CONVERSATIONS_INDEX_NAME = "UserConversationsIndex"
+TITLE_CHARS = 80
+PREVIEW_CHARS = 120
+TRANSACTION_ATTEMPTS = 5
+
 def require_env(name: str) -> str:
     try:
         return os.environ[name]
     except KeyError:
         raise RuntimeError(f"Missing required environment variable: {name}")
 
+def truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def encode_cursor(last_evaluated_key: Dict[str, Any]) -> str:
+    """Opaque pagination cursor: the query's LastEvaluatedKey as url-safe base64 JSON."""
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor: str, attribute: str, value: str) -> Dict[str, Any]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    # a cursor only continues the listing it was issued for (same user / session)
+    if not isinstance(key, dict) or key.get(attribute) != value:
+        raise ValueError("Invalid cursor")
+    return key
+
+class ContextMessage(NamedTuple):
+    """Prompt-context view of a message; formats like Message.__str__."""
+    role: str
+    body: str
+
+    def __str__(self) -> str:
+        return f"[{self.role}] : {self.body}"
+
 class ChatStore:
 
     def __init__(
@@ -32,7 +66,7 @@ class ChatStore:
             self.table = (
                 table
                 if table is not None
-                else boto3.resource("dynamodb").Table(require_env("CONVERSATIONS_TABLE_NAME"))
+                else clients.dynamodb_resource().Table(require_env("CONVERSATIONS_TABLE_NAME"))
             )
 
     def save_message(
@@ -40,7 +74,8 @@ class ChatStore:
         role: Literal['user', 'ai'],
         body: str,
         session_id: str,
-        response_parts: Optional[List[ResponsePart]] = None) -> Union[UserMessage, AiMessage]:
+        response_parts: Optional[List[ResponsePart]] = None,
+        bedrock_session_id: Optional[str] = None) -> Union[UserMessage, AiMessage]:
 
             if role == 'ai':
                 if not response_parts:
@@ -58,12 +93,135 @@ class ChatStore:
             else:
                 raise ValueError("Invalid role")
             
-            self.table.put_item(
-                Item = message.model_dump(mode = "json")
-            )
+            self.write_message(message, bedrock_session_id)
 
             return message
-        
+
+    def write_message(self, message: Message, bedrock_session_id: Optional[str] = None) -> None:
+        """
+        Store `message` and bring the session METADATA item's summary up to date in one
+        TransactWriteItems round trip. message_count is incremented server-side (ADD),
+        so concurrent writers never lose a count. last_updated/preview only move forward:
+        if a newer message got there first, the transaction is retried bumping just the
+        count. The title is set once, from the first user message. The message is never
+        stored without its summary update: a missing session raises ValueError.
+        Goes through the resource's client (thread-safe, and it still takes plain
+        Python values), so it may run on a worker thread.
+        `bedrock_session_id` is stored on the METADATA item in the same transaction.
+        """
+        client = self.table.meta.client
+        put = {"Put": {"TableName": self.table.name, "Item": message.model_dump(mode = "json")}}
+        advance = True
+        for _ in range(TRANSACTION_ATTEMPTS):
+            try:
+                client.transact_write_items(TransactItems = [put, self._summary_update(message, advance, bedrock_session_id)])
+                return
+            except client.exceptions.TransactionCanceledException as e:
+                reasons = [reason.get("Code") for reason in e.response.get("CancellationReasons", [])]
+                if "TransactionConflict" in reasons:
+                    continue  # another writer held the METADATA item; try again
+                if advance and reasons[1:2] == ["ConditionalCheckFailed"]:
+                    advance = False  # a newer message got there first
+                    continue
+                if reasons[1:2] == ["ConditionalCheckFailed"]:
+                    # only sessions made by create_session/start_session exist; don't create a bare METADATA item
+                    raise ValueError(f"Session {message.session_id} not found") from e
+                raise
+        raise RuntimeError(f"Message write for session {message.session_id} kept conflicting")
+
+    def _summary_update(self, message: Message, advance: bool = True, bedrock_session_id: Optional[str] = None) -> Dict[str, Any]:
+        assignments: List[str] = []
+        values: Dict[str, Any] = {":one": 1}
+        condition = "attribute_exists(session_id)"
+        if advance:
+            assignments += ["last_updated = :ts", "preview = :preview"]
+            values[":ts"] = message.created_at
+            values[":preview"] = truncate(message.body, PREVIEW_CHARS)
+            if message.role == 'user':
+                assignments.append("title = if_not_exists(title, :title)")
+                values[":title"] = truncate(message.body, TITLE_CHARS)
+            condition += " AND last_updated <= :ts"
+        if bedrock_session_id:
+            assignments.append("bedrock_session_id = :bedrock_session_id")
+            values[":bedrock_session_id"] = bedrock_session_id
+
+        return {"Update": {
+            "TableName": self.table.name,
+            "Key": {"session_id": f"SESSION#{message.session_id}", "created_at_message_id": "METADATA"},
+            "UpdateExpression": (f"SET {', '.join(assignments)} " if assignments else "") + "ADD message_count :one",
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": values,
+        }}
+
+    def recount_messages(self, session_id: str) -> int:
+        """
+        Set the session's message_count to the number of messages it holds, and return it.
+        Sessions written before message_count existed have none, and the first ADD after
+        the upgrade starts them from 0; this brings them back in line. The count is only
+        stored if message_count did not change while counting (a concurrent write_message
+        adds a message and bumps the count in one transaction); otherwise it counts again.
+        """
+        key = {"session_id": f"SESSION#{session_id}", "created_at_message_id": "METADATA"}
+        for _ in range(TRANSACTION_ATTEMPTS):
+            item = self.table.get_item(Key = key, ProjectionExpression = "message_count", ConsistentRead = True).get("Item")
+            if item is None:
+                raise ValueError(f"Session {session_id} not found")
+            seen = item.get("message_count")
+
+            count, query_kwargs = 0, {}
+            while True:
+                page = self.table.query(
+                    KeyConditionExpression = Key("session_id").eq(key["session_id"]) & Key("created_at_message_id").begins_with("MESSAGE#"),
+                    Select = "COUNT",
+                    ConsistentRead = True,
+                    **query_kwargs
+                )
+                count += page["Count"]
+                if "LastEvaluatedKey" not in page:
+                    break
+                query_kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+            try:
+                self.table.update_item(
+                    Key = key,
+                    UpdateExpression = "SET message_count = :count",
+                    ConditionExpression = "attribute_not_exists(message_count)" if seen is None else "message_count = :seen",
+                    ExpressionAttributeValues = {":count": count} if seen is None else {":count": count, ":seen": seen},
+                )
+                return count
+            except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+                continue  # a message was written meanwhile; count again
+        raise RuntimeError(f"Message count for session {session_id} kept changing")
+
+    def backfill_message_counts(self) -> int:
+        """
+        One-off after the upgrade that added message_count: recount every session (a
+        paged Scan of the METADATA items). Safe to run again or while the API serves
+        traffic. Returns the number of sessions whose count was corrected.
+        """
+        corrected, scan_kwargs = 0, {}
+        while True:
+            page = self.table.scan(
+                FilterExpression = Key("created_at_message_id").eq("METADATA"),
+                ProjectionExpression = "session_id, message_count",
+                **scan_kwargs
+            )
+            for item in page.get("Items", []):
+                session_id = item["session_id"].removeprefix("SESSION#")
+                if self.recount_messages(session_id) != item.get("message_count"):
+                    corrected += 1
+            if "LastEvaluatedKey" not in page:
+                return corrected
+            scan_kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+    def get_bedrock_session_id(self, session_id: str) -> Optional[str]:
+        """The Bedrock sessionId stored with the session, if a previous turn got one."""
+        response = self.table.get_item(
+            Key = {"session_id": f"SESSION#{session_id}", "created_at_message_id": "METADATA"},
+            ProjectionExpression = "bedrock_session_id",
+        )
+        return response.get("Item", {}).get("bedrock_session_id")
+
     def get_latest_messages(self, user_id: str, session_id: str, n: int) -> list[AiMessage | UserMessage]:
         response = self.table.query(
             KeyConditionExpression = Key("session_id").eq(f"SESSION#{session_id}") & Key("created_at_message_id").begins_with("MESSAGE#"),
@@ -78,14 +236,57 @@ class ChatStore:
 
         return messages
 
+    def get_context(self, session_id: str, n: int, before: Optional[str] = None) -> list[ContextMessage]:
+        """
+        The last `n` messages as (role, body) only, oldest first, for the Bedrock prompt.
+        Reads just those two attributes (no response_parts reference texts) and skips
+        model validation. Same items and RCUs as get_latest_messages; far less data
+        transferred and deserialized.
+        With `before` (a created_at timestamp) only older messages are read, so a message
+        being written concurrently at that time is never part of the result.
+        """
+        sort_key = (
+            Key("created_at_message_id").between("MESSAGE#", f"MESSAGE#{before}")
+            if before
+            else Key("created_at_message_id").begins_with("MESSAGE#")
+        )
+        response = self.table.query(
+            KeyConditionExpression = Key("session_id").eq(f"SESSION#{session_id}") & sort_key,
+            ProjectionExpression = "#role, body",
+            ExpressionAttributeNames = {"#role": "role"},
+            ScanIndexForward = False,  # descending order
+            Limit = n
+        )
+        return [ContextMessage(item.get("role", ""), item.get("body", "")) for item in reversed(response.get("Items", []))]
+
     def create_session(self, user_id: str) -> str:
         session = Session(user_id=user_id)
 
         self.table.put_item(
-            Item=session.model_dump(mode = "json")
+            # no NULL title: write_message sets it with if_not_exists
+            Item=session.model_dump(mode = "json", exclude_none = True)
         )
 
         return session.session_id
+
+    def start_session(self, user_id: str, body: str) -> tuple[str, UserMessage]:
+        """
+        Create a session together with its first user message: one TransactWriteItems
+        instead of create_session + save_message, with the summary written up front.
+        """
+        session = Session(user_id = user_id)
+        message = UserMessage(session_id = session.session_id, body = body)
+        session.last_updated = message.created_at
+        session.title = truncate(body, TITLE_CHARS)
+        session.preview = truncate(body, PREVIEW_CHARS)
+        session.message_count = 1
+
+        self.table.meta.client.transact_write_items(TransactItems = [
+            {"Put": {"TableName": self.table.name, "Item": session.model_dump(mode = "json")}},
+            {"Put": {"TableName": self.table.name, "Item": message.model_dump(mode = "json")}},
+        ])
+
+        return session.session_id, message
     
     def get_session(self, session_id: str) -> Session:
         response = self.table.query(
@@ -100,38 +301,80 @@ class ChatStore:
         session_item = items[0]
         return Session.model_validate(session_item)
     
-    def get_messages(self, session_id: str) -> list[AiMessage | UserMessage]:
+    def get_messages(
+        self,
+        session_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_response_parts: bool = True) -> MessagePage:
+        """
+        A window of the session's messages: the newest `limit` (or the ones before
+        `cursor`), returned oldest first. `next_cursor` pages further back in time.
+        Without `include_response_parts` the reference texts are not read at all
+        (ProjectionExpression) and AI messages come back with empty `response_parts`.
+        """
         # if url encoded id is passed through, decode it
         if session_id.startswith("SESSION%23"):
             decoded_session_id = urllib.parse.unquote(session_id)
         # if url stripped id if passed in (just a uuid without prefix) if passed, append it
         else:
             decoded_session_id = f"SESSION#{session_id}"
-        response = self.table.query(
-            KeyConditionExpression = Key("session_id").eq(f"{decoded_session_id}") & Key("created_at_message_id").begins_with("MESSAGE#"),
-            ScanIndexForward = True, 
+
+        query_kwargs: Dict[str, Any] = {
+            "KeyConditionExpression": Key("session_id").eq(f"{decoded_session_id}") & Key("created_at_message_id").begins_with("MESSAGE#"),
+            "ScanIndexForward": False,  # newest first
+            "Limit": limit,
+        }
+        if cursor:
+            query_kwargs["ExclusiveStartKey"] = decode_cursor(cursor, "session_id", decoded_session_id)
+        if not include_response_parts:
+            query_kwargs["ProjectionExpression"] = "session_id, created_at_message_id, #role, body"
+            query_kwargs["ExpressionAttributeNames"] = {"#role": "role"}
+
+        response = self.table.query(**query_kwargs)
+
+        items = response.get("Items", [])
+        items.reverse()
+        if not include_response_parts:
+            for item in items:
+                if item.get("role") == 'ai':
+                    item["response_parts"] = []
+
+        last_key = response.get("LastEvaluatedKey")
+        return MessagePage(
+            messages = [Message.from_dynamodb(item) for item in items],
+            next_cursor = encode_cursor(last_key) if last_key else None
         )
-        messages = response.get("Items", [])
-        return [Message.from_dynamodb(message) for message in messages]
     
-    def get_conversations(self, user_id: str) -> list[Session]:
-        print("Fetching conversations for user_id:", user_id)
-        response = self.table.scan(
-            FilterExpression=Key("user_id").eq(user_id) & Key("created_at_message_id").eq("METADATA")
-        )
-        print("Scan response:", response)
-        
-        items = response.get("Items", [])
-        print("Items found:", items)
+    def get_conversations(self, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> ConversationPage:
+        """
+        One page of a user's conversations, most recently updated first.
+        Queries the sparse user_id/last_updated GSI (only METADATA items carry user_id),
+        so it reads just this user's sessions instead of scanning every message.
+        """
+        query_kwargs: Dict[str, Any] = {
+            "IndexName": os.environ.get("CONVERSATIONS_INDEX_NAME", CONVERSATIONS_INDEX_NAME),
+            "KeyConditionExpression": Key("user_id").eq(user_id),
+            "ScanIndexForward": False,  # newest first
+            "Limit": limit,
+        }
+        if cursor:
+            query_kwargs["ExclusiveStartKey"] = decode_cursor(cursor, "user_id", user_id)
+
+        response = self.table.query(**query_kwargs)
 
         conversations = []
-        for item in items:
+        for item in response.get("Items", []):
             try:
                 conversations.append(Session.model_validate(item))
             except Exception as e:
                 print("Session validation failed for item:", item, e)
 
-        return conversations
+        last_key = response.get("LastEvaluatedKey")
+        return ConversationPage(
+            conversations = conversations,
+            next_cursor = encode_cursor(last_key) if last_key else None
+        )
     
     def delete_conversation(self, sessionId: str) -> None:
         session_id = sessionId.replace("SESSION%23", "SESSION#")
@@ -229,6 +472,12 @@ class Session(BaseModel):
         default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
         description="UTC timestamp of the last message sent in ISO format with milliseconds"
     )
+    # summary kept current by ChatStore.write_message, so listings need no message reads
+    title: Optional[str] = Field(None, description="The first user message, truncated")
+    preview: Optional[str] = Field(None, description="The last message, truncated")
+    message_count: int = Field(0, description="Number of messages in the session")
+    # internal: not part of the API representation
+    bedrock_session_id: Optional[str] = Field(None, exclude=True, description="Bedrock RetrieveAndGenerate sessionId continuing this conversation")
 
     def model_dump(self, *args, **kwargs) -> Dict[str, Any]:
         base = super().model_dump(*args, **kwargs)
@@ -252,3 +501,10 @@ class Session(BaseModel):
 
         return Session.model_validate(item)
 
+class ConversationPage(BaseModel):
+    conversations: List[Session] = Field(default_factory=list, description="Conversations on this page, newest first")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, None on the last page")
+
+class MessagePage(BaseModel):
+    messages: List[Union[AiMessage, UserMessage]] = Field(default_factory=list, description="Messages in this window, oldest first")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the page of older messages, None at the start of the session")
@@ -0,0 +1,148 @@
+"""
+Streaming chat endpoint, served through the Lambda Web Adapter.
+
+A Python Lambda handler cannot stream its response. With the Lambda Web Adapter
+layer (AWS_LWA_INVOKE_MODE=response_stream) the function runs this stdlib HTTP
+server instead, and the adapter forwards the body to API Gateway as it is written.
+
+POST /rag/bedrock/stream takes a RAGRequest and answers with server-sent events:
+
+    event: token   data: {"text": "..."}     one per RetrieveAndGenerateStream chunk
+    event: end     data: <RAGResponse>       once the AI message is stored
+    event: error   data: {"detail": "..."}
+
+The caller's Cognito `sub` comes from the API Gateway request context, which the
+adapter passes on in the x-amzn-request-context header.
+"""
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+
+from aws_lambda_powertools import Logger
+from pydantic import ValidationError
+
+from bedrock_impl import handler
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.models import RAGRequest
+from bedrock_impl.store import ChatStore
+from bedrock_impl.turns import ChatTurn
+
+logger = Logger('lambda-rag')
+
+STREAM_PATH = "/rag/bedrock/stream"
+HEALTH_PATH = "/healthz"
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def request_user(request_context: Optional[str]) -> Optional[str]:
+    """Cognito `sub` from the x-amzn-request-context header set by the adapter."""
+    try:
+        context = json.loads(request_context or "{}")
+    except ValueError:
+        return None
+    return ((context.get("authorizer") or {}).get("claims") or {}).get("sub")
+
+
+def chat_events(bedrock: Bedrock, chat_store: ChatStore, user_id: str, request: RAGRequest) -> Iterator[str]:
+    """
+    The SSE body of one streamed turn. Chunks are forwarded as they arrive; the AI
+    message (with its citations) is stored once Bedrock has finished.
+    """
+    try:
+        turn = ChatTurn(bedrock, chat_store, user_id, request)
+        stream = turn.stream()
+        try:
+            for text in stream:
+                yield sse_event("token", {"text": text})
+        except Exception:
+            turn.abort()
+            raise
+        response = turn.finish(stream.response())
+        yield sse_event("end", json.loads(response.model_dump_json()))
+    except Exception:
+        logger.exception("Streaming turn failed")
+        yield sse_event("error", {"detail": "Internal server error"})
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # chunked transfer encoding
+
+    def do_GET(self) -> None:
+        # the adapter's readiness check (AWS_LWA_READINESS_CHECK_PATH)
+        if self.path == HEALTH_PATH:
+            self._plain(200, "ok")
+        else:
+            self._plain(404, "Not found")
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0] != STREAM_PATH:
+            return self._plain(404, "Not found")
+
+        # read the body even when rejecting: the connection is kept alive
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        user_id = request_user(self.headers.get("x-amzn-request-context"))
+        if not user_id:
+            return self._plain(400, "Missing cognito user ID")
+        if not body:
+            return self._plain(400, "Missing request body")
+        try:
+            request = RAGRequest.model_validate_json(body)
+        except ValidationError as ve:
+            return self._plain(400, f"Validation error: {ve.errors()}")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        connected = True
+        for event in chat_events(handler.get_bedrock(), handler.get_chat_store(), user_id, request):
+            if not connected:
+                continue  # keep consuming: the answer is still stored when the stream ends
+            try:
+                self._chunk(event.encode())
+            except OSError:
+                logger.info("Client went away mid-stream")
+                connected = False
+        if connected:
+            self._chunk(b"")
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _plain(self, status: int, body: str) -> None:
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def main() -> None:
+    port = int(os.environ.get("PORT", "8080"))
+    logger.info(f"Streaming chat server listening on {port}")
+    ThreadingHTTPServer(("0.0.0.0", port), StreamHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
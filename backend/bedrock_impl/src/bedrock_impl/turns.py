@@ -0,0 +1,126 @@
+"""
+One question/answer exchange of a chat: the DynamoDB I/O around the Bedrock call,
+shared by the blocking handler and the streaming server.
+
+    turn = ChatTurn(bedrock, chat_store, user_id, request)
+    response = turn.finish(turn.generate())        # blocking
+    stream = turn.stream(); ...; turn.finish(stream.response())  # streamed
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+from aws_lambda_powertools import Logger
+
+from bedrock_impl.answers import AnswerCache
+from bedrock_impl.bedrock import AnswerStream, Bedrock, SessionExpiredError
+from bedrock_impl.models import RAGRequest, RAGResponse
+from bedrock_impl.store import ChatStore, UserMessage
+
+T = TypeVar("T")
+
+logger = Logger('lambda-rag')
+
+# earlier messages put in the prompt when there is no live Bedrock session to continue
+CONTEXT_MESSAGES = 5
+
+# the user-message write overlaps the reads and the Bedrock call; a Lambda environment
+# serves one invocation at a time, so one worker, kept across warm invocations
+io_pool = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "ddb-write")
+
+
+class ChatTurn:
+
+    def __init__(
+        self,
+        bedrock: Bedrock,
+        chat_store: ChatStore,
+        user_id: str,
+        request: RAGRequest,
+        answers: Optional[AnswerCache] = None
+        ) -> None:
+
+        self.bedrock = bedrock
+        self.chat_store = chat_store
+        self.request = request
+        self.answers = answers
+        self.new_session = not request.session_id
+        self.user_message_saved: Optional[Future] = None
+
+        if self.new_session:
+            # one transaction for the session and its first message
+            self.session_id, self.user_message = chat_store.start_session(user_id = user_id, body = request.content)
+            self.bedrock_session_id = None
+        else:
+            self.session_id = request.session_id
+            self.user_message = UserMessage(session_id = self.session_id, body = request.content)
+            # persisting the user message does not feed this turn: run it alongside the
+            # reads and the Bedrock call, and join before the answer is written
+            self.user_message_saved = io_pool.submit(chat_store.write_message, self.user_message)
+            try:
+                self.bedrock_session_id = chat_store.get_bedrock_session_id(self.session_id) if bedrock.keeps_sessions else None
+            except Exception:
+                self.abort()
+                raise
+
+    def generate(self) -> RAGResponse:
+        # a first question has no context: its answer can be shared across conversations
+        cacheable = self.new_session and self.answers is not None
+        try:
+            if cacheable:
+                cached = self.answers.get(self.request.content)
+                if cached is not None:
+                    return cached
+            raw = self._ask(self.bedrock.generate_response)
+            response = self.bedrock.parse_response(raw)
+        except Exception:
+            self.abort()
+            raise
+        # a guardrail's refusal is about this question, asked this time: don't hand it out again
+        if cacheable and raw.get("guardrailAction") != "INTERVENED":
+            self.answers.put(self.request.content, response)
+        return response
+
+    def stream(self) -> AnswerStream:
+        """The answer stream; call abort() if consuming it fails."""
+        try:
+            return self._ask(self.bedrock.generate_response_stream)
+        except Exception:
+            self.abort()
+            raise
+
+    def _ask(self, call: Callable[..., T]) -> T:
+        if self.bedrock_session_id:
+            # Bedrock holds the conversation: send only the question
+            try:
+                return call(self.request.content, session_id = self.bedrock_session_id)
+            except SessionExpiredError:
+                logger.info("Bedrock session expired, resending recent messages", session_id = self.session_id)
+        history = [] if self.new_session else self.chat_store.get_context(
+            session_id = self.session_id,
+            n = CONTEXT_MESSAGES - 1,
+            before = self.user_message.created_at
+        )
+        return call(self.request.content, history)
+
+    def abort(self) -> None:
+        """The turn failed: don't leave the user-message write running into the next invocation."""
+        if self.user_message_saved is not None:
+            wait([self.user_message_saved])
+
+    def finish(self, response: RAGResponse) -> RAGResponse:
+        """Store the answer (with the summary and Bedrock sessionId, one transaction) and return it."""
+        if self.user_message_saved is not None:
+            self.user_message_saved.result()  # a failed user-message write fails the turn
+
+        self.chat_store.save_message(
+            role = 'ai',
+            body = response.content,
+            session_id = self.session_id,
+            response_parts = response.response_parts,
+            bedrock_session_id = response.session_id
+        )
+
+        response.session_id = self.session_id
+        return response
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Entry point of BedrockStreamFunction: the Lambda Web Adapter (AWS_LAMBDA_EXEC_WRAPPER)
+# starts this server and streams its responses back through API Gateway.
+PYTHONPATH=$PYTHONPATH:$LAMBDA_TASK_ROOT exec python3 -m bedrock_impl.stream_server
@@ -0,0 +1,112 @@
+import os
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+from moto.dynamodb.models import DynamoDBBackend
+
+from bedrock_impl.store import CONVERSATIONS_INDEX_NAME
+
+CONVERSATIONS_TABLE = "test-conversations"
+
+
+def create_conversations_table(client) -> None:
+    """Same key schema and GSI as ConversationsTable in template.yaml."""
+    client.create_table(
+        TableName=CONVERSATIONS_TABLE,
+        AttributeDefinitions=[
+            {"AttributeName": "session_id", "AttributeType": "S"},
+            {"AttributeName": "created_at_message_id", "AttributeType": "S"},
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "last_updated", "AttributeType": "S"},
+        ],
+        KeySchema=[
+            {"AttributeName": "session_id", "KeyType": "HASH"},
+            {"AttributeName": "created_at_message_id", "KeyType": "RANGE"},
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": CONVERSATIONS_INDEX_NAME,
+            "KeySchema": [
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "last_updated", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["created_at", "title", "preview", "message_count"]},
+        }],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+@pytest.fixture
+def conversations_table(monkeypatch):
+    """Moto-backed ConversationsTable; CONVERSATIONS_TABLE_NAME points at it."""
+    monkeypatch.setenv("CONVERSATIONS_TABLE_NAME", CONVERSATIONS_TABLE)
+    with mock_aws():
+        create_conversations_table(boto3.client("dynamodb"))
+        yield boto3.resource("dynamodb").Table(CONVERSATIONS_TABLE)
+
+
+CACHE_TABLE = "test-cache"
+
+
+@pytest.fixture
+def cache_table(monkeypatch, conversations_table):
+    """Moto-backed CacheTable (same mock as conversations_table); CACHE_TABLE_NAME points at it."""
+    monkeypatch.setenv("CACHE_TABLE_NAME", CACHE_TABLE)
+    boto3.client("dynamodb").create_table(
+        TableName=CACHE_TABLE,
+        AttributeDefinitions=[{"AttributeName": "pk", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return boto3.resource("dynamodb").Table(CACHE_TABLE)
+
+
+@pytest.fixture
+def atomic_item_writes(monkeypatch):
+    """
+    DynamoDB applies each write request to an item atomically; moto does not under
+    threads. Serialise moto's item writes so concurrency tests see DynamoDB semantics
+    (a client-side read-modify-write still races: it spans two requests).
+    """
+    lock = threading.RLock()  # transact_write_items applies its items through put_item/update_item
+    for name in ("put_item", "update_item", "delete_item", "transact_write_items"):
+        original = getattr(DynamoDBBackend, name)
+
+        def serialised(self, *args, __original=original, **kwargs):
+            with lock:
+                return __original(self, *args, **kwargs)
+
+        monkeypatch.setattr(DynamoDBBackend, name, serialised)
+
+
+@pytest.fixture(autouse=True)
+def cold_clients():
+    """Clients and stores are kept per process, as in a warm Lambda; start every test cold."""
+    from bedrock_impl import clients, conversation_handler, handler
+
+    def reset():
+        clients.reset()
+        for factory in (handler.get_bedrock, handler.get_chat_store, handler.get_answer_cache, handler.get_kb_version,
+                        handler.get_idempotency_store, conversation_handler.get_chat_store):
+            factory.cache_clear()
+
+    reset()
+    yield
+    reset()
+
+
+@pytest.fixture(autouse=True)
+def no_metrics():
+    """Metrics are shared module state: drop what a test left unflushed."""
+    from bedrock_impl.cache import metrics
+
+    metrics.clear_metrics()
+    yield
+    metrics.clear_metrics()
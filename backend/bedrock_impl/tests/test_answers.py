@@ -0,0 +1,143 @@
+import json
+import time
+from typing import Callable
+
+import pytest
+
+from bedrock_impl import handler
+from bedrock_impl.answers import AnswerCache
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.cache import KnowledgeBaseVersion, TTLCache, metrics
+from bedrock_impl.handler import bedrock_handler
+from bedrock_impl.store import ChatStore
+
+from tests.test_retrieval import _stub_kb_versions
+from tests.test_store import _chat_event, _sent, _stub_bedrock
+
+CITATION = {
+    "generatedResponsePart": {"textResponsePart": {"text": "Open Account > Credentials."}},
+    "retrievedReferences": [{
+        "content": {"text": "API keys are created under Account > Credentials."},
+        "location": {"type": "WEB", "webLocation": {"url": "https://example.com/docs/keys"}},
+    }],
+}
+
+
+def _emitted(capsys) -> dict[str, list[float]]:
+    """
+    Answer-cache metric values: those flushed as EMF records by bedrock_handler's
+    @metrics.log_metrics, then those added since outside a handler.
+    """
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    return {
+        name: [value for record in records for value in record.get(name, [])] + metrics.metric_set.get(name, {}).get("Value", [])
+        for name in ("AnswerCacheHit", "AnswerCacheMiss")
+    }
+
+
+@pytest.fixture
+def cached_turn(monkeypatch, conversations_table, cache_table):
+    """bedrock_handler with the answer cache on, a stub Bedrock client and knowledge-base versions."""
+    client = _stub_bedrock(latency=0.1, answer="Open Account > Credentials.")
+    answer = client.retrieve_and_generate.side_effect
+    client.retrieve_and_generate.side_effect = lambda **kwargs: {**answer(**kwargs), "citations": [CITATION]}
+    agent = _stub_kb_versions()
+    answers = AnswerCache(
+        knowledge_base_id="kb",
+        cache=TTLCache("ANSWER", 3600, table=cache_table),
+        version=KnowledgeBaseVersion("kb", client=agent, refresh_s=0),
+    )
+    monkeypatch.setattr(handler, "get_chat_store", lambda: ChatStore(table=conversations_table))
+    monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=client, rag_config={}))
+    monkeypatch.setattr(handler, "get_answer_cache", lambda: answers)
+
+    def turn(user_id: str, content: str, session_id: str | None = None) -> dict:
+        response = bedrock_handler(_chat_event(user_id, content, session_id), None)
+        assert response["statusCode"] == 200, response["body"]
+        return json.loads(response["body"])
+
+    turn.bedrock, turn.agent = client, agent
+    return turn
+
+
+def test_repeated_first_questions_are_answered_from_the_cache(cached_turn, conversations_table, capsys):
+    alice = cached_turn("alice", "How do I get an API key?")
+    bob = cached_turn("bob", "how do I get an api key")
+
+    assert cached_turn.bedrock.retrieve_and_generate.call_count == 1
+    assert (bob["content"], bob["response_parts"]) == (alice["content"], alice["response_parts"])
+    assert bob["message_id"] != alice["message_id"] and bob["session_id"] != alice["session_id"]
+
+    # the cached answer is stored in bob's conversation like any other
+    store = ChatStore(table=conversations_table)
+    messages = store.get_messages(bob["session_id"]).messages
+    assert [(m.role, m.body) for m in messages] == [("user", "how do I get an api key"), ("ai", alice["content"])]
+    assert str(messages[1].response_parts[0].references[0].url) == "https://example.com/docs/keys"
+    assert store.get_bedrock_session_id(bob["session_id"]) is None
+
+    # a follow-up has context, so it goes to Bedrock (with the history, as there is no session)
+    cached_turn("bob", "And how do I rotate it?", bob["session_id"])
+    prompt, kb_session = _sent(cached_turn.bedrock)[-1]
+    assert kb_session is None and prompt.startswith("Conversation so far:")
+    emitted = _emitted(capsys)
+    assert emitted["AnswerCacheHit"] == [1.0]
+    assert emitted["AnswerCacheMiss"] == [1.0]
+
+
+def test_follow_ups_are_neither_served_nor_stored(cached_turn, cache_table):
+    session_id = cached_turn("alice", "How do I get an API key?")["session_id"]
+    before = cache_table.scan()["Count"]
+    cached_turn("alice", "How do I get an API key?", session_id)
+    cached_turn("bob", "Hello", None)
+
+    assert cached_turn.bedrock.retrieve_and_generate.call_count == 3
+    assert cache_table.scan()["Count"] == before + 1  # only bob's first question
+
+
+def test_a_knowledge_base_sync_invalidates_cached_answers(cached_turn):
+    cached_turn("alice", "How do I get an API key?")
+    cached_turn.agent.job_id = "job-2"
+    cached_turn("bob", "How do I get an API key?")
+    cached_turn("carol", "How do I get an API key?")
+    assert cached_turn.bedrock.retrieve_and_generate.call_count == 2
+
+
+def test_guardrail_interventions_are_not_cached(cached_turn):
+    answer = cached_turn.bedrock.retrieve_and_generate.side_effect
+    cached_turn.bedrock.retrieve_and_generate.side_effect = lambda **kwargs: {**answer(**kwargs), "guardrailAction": "INTERVENED"}
+    cached_turn("alice", "Tell me a secret")
+    cached_turn("bob", "Tell me a secret")
+    assert cached_turn.bedrock.retrieve_and_generate.call_count == 2
+
+
+def test_benchmark_repeated_first_question_cached_vs_bedrock(cached_turn, cache_table, capsys):
+    rounds = 10
+    question = "How do I get an API key?"
+    answers = handler.get_answer_cache()
+
+    def lookup_ms(cache: Callable[[], AnswerCache]) -> float:
+        caches = [cache() for _ in range(rounds)]
+        started = time.perf_counter()
+        for answers in caches:
+            assert answers.get(question) is not None
+        return (time.perf_counter() - started) * 1000 / rounds
+
+    def turn_ms(user_id: str) -> float:
+        started = time.perf_counter()
+        cached_turn(user_id, question)
+        return (time.perf_counter() - started) * 1000
+
+    uncached_ms = turn_ms("alice")
+    cached_ms = min(turn_ms(f"user-{i}") for i in range(rounds))
+    warm_ms = lookup_ms(lambda: answers)
+    # other environments: the answer comes from CacheTable
+    cold_ms = lookup_ms(lambda: AnswerCache(knowledge_base_id="kb", cache=TTLCache("ANSWER", 3600, table=cache_table), version=answers.version))
+    emitted = _emitted(capsys)
+    hits, misses = sum(emitted["AnswerCacheHit"]), sum(emitted["AnswerCacheMiss"])
+
+    print(
+        f"\nfirst-turn answer: Bedrock turn {uncached_ms:.0f} ms, cached turn {cached_ms:.0f} ms; "
+        f"answer lookup {warm_ms:.2f} ms in memory, {cold_ms:.2f} ms from DynamoDB; hit rate {hits / (hits + misses):.0%}"
+    )
+    assert cached_turn.bedrock.retrieve_and_generate.call_count == 1
+    assert warm_ms < 10 and cached_ms < uncached_ms
@@ -0,0 +1,114 @@
+import functools
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from botocore.awsrequest import AWSResponse
+
+from bedrock_impl import clients, conversation_handler as conversations, handler
+from bedrock_impl.store import Session
+
+EVENTS = sorted((Path(__file__).parent.parent / "events").glob("*.json"))
+
+
+def test_clients_are_created_once_and_tuned():
+    assert clients.dynamodb_resource() is clients.dynamodb_resource()
+    assert clients.bedrock_agent_runtime() is clients.bedrock_agent_runtime()
+
+    config = clients.bedrock_agent_runtime().meta.config
+    assert config.tcp_keepalive and config.retries["mode"] == "adaptive"
+    assert config.read_timeout > clients.dynamodb_resource().meta.client.meta.config.read_timeout
+
+    client = clients.dynamodb_client()
+    clients.reset()
+    assert clients.dynamodb_client() is not client
+
+
+def _import_ms(module: str) -> tuple[float, list[str]]:
+    """Cold import of a handler module in a fresh interpreter, as on a Lambda cold start."""
+    script = (
+        "import sys, time; started = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - started); "
+        "print(' '.join(sorted(m for m in sys.modules if m.startswith(('bedrock_impl', 'mypy_boto3')))))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+        cwd=Path(__file__).parent.parent / "src",
+    ).stdout.splitlines()
+    return float(out[0]) * 1000, out[1].split()
+
+
+def _answer(**kwargs):
+    # short-circuits the HTTP call: a before-call handler's return value is the response
+    return AWSResponse("https://bedrock-agent-runtime", 200, {}, None), {
+        "output": {"text": "The content platform hosts the developer docs."},
+        "sessionId": "kb-session",
+        "citations": [],
+    }
+
+
+@pytest.fixture
+def events_table(conversations_table, monkeypatch):
+    @functools.cache
+    def bedrock_agent_runtime():
+        client = clients.session().client("bedrock-agent-runtime", config=clients.BEDROCK_CONFIG)
+        client.meta.events.register("before-call.bedrock-agent-runtime.RetrieveAndGenerate", _answer)
+        return client
+
+    monkeypatch.setattr(clients, "bedrock_agent_runtime", bedrock_agent_runtime)
+
+    def seed():
+        # the sessions the sample events refer to
+        for session_id, user_id in (("test-session-id", "test-user-id"), ("a9927d12-d8a4-4f2c-94fa-ef4dbe102af7", "4418c4e8-4041-7057-a19a-f1def33de47a")):
+            conversations_table.put_item(Item=Session(session_id=session_id, user_id=user_id).model_dump(mode="json", exclude_none=True))
+
+    return seed
+
+
+def test_benchmark_cold_and_warm_init_over_sample_events(events_table):
+    assert EVENTS
+
+    bedrock_ms, bedrock_modules = _import_ms("bedrock_impl.handler")
+    conversation_ms, conversation_modules = _import_ms("bedrock_impl.conversation_handler")
+    assert "bedrock_impl.bedrock" in bedrock_modules
+    assert "bedrock_impl.bedrock" not in conversation_modules
+    assert not [m for m in bedrock_modules + conversation_modules if m.startswith("mypy_boto3")]
+
+    def invoke(path: Path) -> int:
+        event = json.loads(path.read_text())
+        route = handler.bedrock_handler if event.get("body") else conversations.conversation_handler
+        return route(event, None)["statusCode"]
+
+    def per_invocation_ms(new_clients_per_call: bool, rounds: int = 5) -> float:
+        total = 0.0
+        for _ in range(rounds):
+            for path in EVENTS:
+                events_table()
+                if new_clients_per_call:
+                    # what every invocation used to do: build a new resource and client (on boto3's
+                    # default session, which was kept)
+                    for factory in (clients.dynamodb_resource, clients.bedrock_agent_runtime,
+                                    handler.get_bedrock, handler.get_chat_store, conversations.get_chat_store):
+                        factory.cache_clear()
+                started = time.perf_counter()
+                assert invoke(path) == 200, path.name
+                total += time.perf_counter() - started
+        return total * 1000 / (rounds * len(EVENTS))
+
+    first_started = time.perf_counter()
+    events_table()
+    invoke(EVENTS[0])
+    first_ms = (time.perf_counter() - first_started) * 1000
+    per_call_ms = per_invocation_ms(new_clients_per_call=True)
+    warm_ms = per_invocation_ms(new_clients_per_call=False)
+
+    print(
+        f"\ncold import: handler {bedrock_ms:.0f} ms, conversation_handler {conversation_ms:.0f} ms; "
+        f"first invocation {first_ms:.0f} ms; over {len(EVENTS)} sample events: "
+        f"clients per call {per_call_ms:.1f} ms, warm reuse {warm_ms:.1f} ms per invocation"
+    )
+    assert warm_ms < per_call_ms
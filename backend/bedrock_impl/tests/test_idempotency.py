@@ -0,0 +1,108 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+
+from bedrock_impl import handler, idempotency
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.handler import bedrock_handler
+from bedrock_impl.idempotency import IdempotencyStore
+from bedrock_impl.store import ChatStore
+
+from tests.conftest import CACHE_TABLE, CONVERSATIONS_TABLE
+from tests.test_store import _chat_event, _stub_bedrock
+
+
+@pytest.fixture
+def idempotent_handler(monkeypatch, conversations_table, cache_table, atomic_item_writes):
+    """bedrock_handler with idempotency on; stores per call, as boto3 resources are not thread-safe."""
+    client = _stub_bedrock(latency=0.3)
+    monkeypatch.setattr(handler, "get_chat_store", lambda: ChatStore(table=boto3.resource("dynamodb").Table(CONVERSATIONS_TABLE)))
+    monkeypatch.setattr(handler, "get_idempotency_store", lambda: IdempotencyStore(table=boto3.resource("dynamodb").Table(CACHE_TABLE)))
+    monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=client, rag_config={}))
+    return client
+
+
+def _messages(conversations_table) -> list:
+    return [item for item in conversations_table.scan()["Items"] if item["created_at_message_id"].startswith("MESSAGE#")]
+
+
+def test_retry_returns_the_stored_response_without_calling_bedrock(idempotent_handler, conversations_table):
+    event = _chat_event("alice", "How do I download a release?")
+
+    first = bedrock_handler(event, None)
+    retry = bedrock_handler(event, None)
+
+    assert first["statusCode"] == retry["statusCode"] == 200
+    assert retry["body"] == first["body"]
+    assert idempotent_handler.retrieve_and_generate.call_count == 1
+    assert len(_messages(conversations_table)) == 2
+
+    # the same message_id from another user is another request
+    other = dict(event, requestContext={"authorizer": {"claims": {"sub": "bob"}}})
+    assert bedrock_handler(other, None)["statusCode"] == 200
+    assert idempotent_handler.retrieve_and_generate.call_count == 2
+
+
+def test_concurrent_duplicates_run_bedrock_once(idempotent_handler, conversations_table):
+    session_id = json.loads(bedrock_handler(_chat_event("alice", "How do I download a release?"), None)["body"])["session_id"]
+    event = _chat_event("alice", "And the previous versions?", session_id)
+    duplicates = 8
+    start = threading.Barrier(duplicates)
+
+    def invoke(_):
+        start.wait()
+        return bedrock_handler(event, None)
+
+    with ThreadPoolExecutor(max_workers=duplicates) as pool:
+        responses = list(pool.map(invoke, range(duplicates)))
+
+    statuses = sorted(r["statusCode"] for r in responses)
+    assert statuses == [200] + [409] * (duplicates - 1)
+    assert idempotent_handler.retrieve_and_generate.call_count == 2
+    assert len(_messages(conversations_table)) == 4
+
+    # once completed, a late retry gets the winner's response
+    [winner] = [r for r in responses if r["statusCode"] == 200]
+    assert bedrock_handler(event, None)["body"] == winner["body"]
+
+
+def test_failed_turn_releases_its_claim(idempotent_handler):
+    answer = idempotent_handler.retrieve_and_generate.side_effect
+    failures = [RuntimeError("throttled")]
+
+    def throttled_once(**kwargs):
+        if failures:
+            raise failures.pop()
+        return answer(**kwargs)
+
+    idempotent_handler.retrieve_and_generate.side_effect = throttled_once
+    event = _chat_event("alice", "How do I download a release?")
+
+    assert bedrock_handler(event, None)["statusCode"] == 500
+    assert bedrock_handler(event, None)["statusCode"] == 200
+
+
+def test_reused_message_id_with_another_question_is_rejected(idempotent_handler):
+    event = _chat_event("alice", "How do I download a release?")
+    assert bedrock_handler(event, None)["statusCode"] == 200
+
+    body = json.loads(event["body"])
+    reused = dict(event, body=json.dumps({**body, "content": "Something else?"}))
+    assert bedrock_handler(reused, None)["statusCode"] == 422
+    assert idempotent_handler.retrieve_and_generate.call_count == 1
+
+
+def test_claim_of_a_crashed_turn_lapses(idempotent_handler, cache_table, monkeypatch):
+    event = _chat_event("alice", "How do I download a release?")
+    request = Bedrock(client=idempotent_handler, rag_config={}).parse_request(event["body"])
+    store = IdempotencyStore(table=cache_table)
+
+    monkeypatch.setattr(idempotency, "IN_PROGRESS_TIMEOUT_S", -1)
+    assert store.begin("alice", request) is None  # the invocation died before completing
+    monkeypatch.setattr(idempotency, "IN_PROGRESS_TIMEOUT_S", 60)
+
+    assert bedrock_handler(event, None)["statusCode"] == 200
+    assert idempotent_handler.retrieve_and_generate.call_count == 1
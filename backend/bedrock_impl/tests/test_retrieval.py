@@ -0,0 +1,161 @@
+import json
+import time
+from unittest.mock import MagicMock
+
+from bedrock_impl import handler
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.cache import KnowledgeBaseVersion, TTLCache, metrics, normalize_query
+from bedrock_impl.handler import bedrock_handler
+from bedrock_impl.retrieval import CachedRetriever
+from bedrock_impl.store import ChatStore
+
+from tests.test_store import _chat_event
+
+PASSAGES = [
+    ("API keys are created under Account > Credentials.", "https://example.com/docs/keys"),
+    ("Keys can be rotated at any time.", "https://example.com/docs/rotation"),
+]
+
+
+def _stub_retrieve(latency: float = 0.0) -> MagicMock:
+    client = MagicMock()
+
+    def retrieve(**kwargs):
+        time.sleep(latency)
+        return {"retrievalResults": [
+            {"content": {"text": text}, "location": {"type": "WEB", "webLocation": {"url": url}}, "score": 0.9}
+            for text, url in PASSAGES
+        ]}
+
+    client.retrieve.side_effect = retrieve
+    return client
+
+
+def _stub_converse() -> MagicMock:
+    client = MagicMock()
+    client.converse.return_value = {
+        "output": {"message": {"role": "assistant", "content": [{"text": "Open Account > Credentials."}]}},
+        "stopReason": "end_turn",
+    }
+    return client
+
+
+def _stub_kb_versions(job_id: str = "job-1") -> MagicMock:
+    """bedrock-agent stand-in: two data sources, `client.job_id` their latest completed sync."""
+    client = MagicMock()
+    client.job_id = job_id
+    client.get_paginator.return_value.paginate.return_value = [
+        {"dataSourceSummaries": [{"dataSourceId": "docs"}, {"dataSourceId": "api"}]}
+    ]
+    client.list_ingestion_jobs.side_effect = lambda **kwargs: {"ingestionJobSummaries": [{"ingestionJobId": client.job_id}]}
+    return client
+
+
+def _retriever(cache_table, agent: MagicMock, latency: float = 0.0, **cache) -> CachedRetriever:
+    return CachedRetriever(
+        knowledge_base_id="kb",
+        client=_stub_retrieve(latency),
+        cache=TTLCache("RETRIEVE", 3600, table=cache_table, **cache),
+        version=KnowledgeBaseVersion("kb", client=agent, refresh_s=0),
+    )
+
+
+def test_normalized_questions_share_a_key():
+    assert normalize_query("  How do I get an API key? ") == normalize_query("how do I get an  API-key") == "how do i get an api key"
+    assert normalize_query("How do I get an API key?") != normalize_query("How do I rotate an API key?")
+
+
+def test_knowledge_base_version_follows_syncs_and_is_throttled():
+    agent = _stub_kb_versions()
+    version = KnowledgeBaseVersion("kb", client=agent, refresh_s=3600)
+    first = version()
+    agent.job_id = "job-2"
+    assert version() == first
+    assert agent.list_ingestion_jobs.call_count == 2  # one per data source, once
+
+    assert KnowledgeBaseVersion("kb", client=agent, refresh_s=3600)() != first
+
+
+def test_retrieval_is_cached_in_memory_then_dynamodb_and_invalidated_by_a_sync(cache_table):
+    agent = _stub_kb_versions()
+    warm = _retriever(cache_table, agent)
+
+    passages = warm.retrieve("How do I get an API key?")
+    assert [(p["text"], p["url"]) for p in passages] == PASSAGES
+    assert warm.retrieve("how do i get an api key") == passages
+    assert warm.client.retrieve.call_count == 1
+
+    # another (cold) environment finds it in the table
+    cold = _retriever(cache_table, agent)
+    assert cold.retrieve("How do I get an API key?") == passages
+    assert cold.client.retrieve.call_count == 0
+
+    agent.job_id = "job-2"  # the knowledge base was re-synced
+    warm.retrieve("How do I get an API key?")
+    assert warm.client.retrieve.call_count == 2
+
+    assert metrics.metric_set["RetrievalCacheHit"]["Value"] == [1.0, 1.0]
+    assert metrics.metric_set["RetrievalCacheMiss"]["Value"] == [1.0, 1.0]
+    assert len(metrics.metric_set["RetrievalLatencySaved"]["Value"]) == 2
+
+
+def test_expired_entries_are_not_served(cache_table):
+    retriever = _retriever(cache_table, _stub_kb_versions())
+    retriever.cache.ttl_s = -1  # written already expired, as an item TTL has not deleted yet
+    retriever.retrieve("How do I get an API key?")
+    retriever.retrieve("How do I get an API key?")
+    assert retriever.client.retrieve.call_count == 2
+
+
+def test_split_path_generates_from_cached_passages(monkeypatch, cache_table, conversations_table):
+    retriever = _retriever(cache_table, _stub_kb_versions())
+    runtime = _stub_converse()
+    monkeypatch.setattr(handler, "get_chat_store", lambda: ChatStore(table=conversations_table))
+    monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=MagicMock(), rag_config={}, retriever=retriever, runtime_client=runtime))
+
+    bodies = []
+    for user_id in ("alice", "bob"):
+        response = bedrock_handler(_chat_event(user_id, "How do I get an API key?"), None)
+        assert response["statusCode"] == 200, response["body"]
+        bodies.append(json.loads(response["body"]))
+
+    session_id = bodies[0]["session_id"]
+    follow_up = json.loads(bedrock_handler(_chat_event("alice", "And rotate it?", session_id), None)["body"])
+
+    assert retriever.client.retrieve.call_count == 2  # the repeated question was served from the cache
+    [references] = [part["references"] for part in bodies[1]["response_parts"]]
+    assert [r["url"] for r in references] == [url for _, url in PASSAGES]
+    assert bodies[1]["content"] == "Open Account > Credentials."
+    system = runtime.converse.call_args_list[0].kwargs["system"][0]["text"]
+    assert all(text in system for text, _ in PASSAGES)
+    # no Bedrock session on the split path: the follow-up carries the conversation itself
+    assert runtime.converse.call_args.kwargs["messages"][0]["content"][0]["text"].startswith("Conversation so far:")
+    assert follow_up["session_id"] == session_id
+
+
+def test_benchmark_faq_retrieval_cached_vs_uncached(cache_table):
+    retrieve_latency = 0.15
+    faq = ["How do I get an API key?", "How do I rotate my key?", "Where are the rate limits documented?"]
+    # 30 questions, FAQ repeats with varying case and punctuation
+    questions = [(q.upper() if i % 3 == 0 else q.rstrip("?")) for i in range(10) for q in faq]
+
+    def per_question_ms(cached: bool) -> float:
+        retriever = _retriever(cache_table, _stub_kb_versions(), latency=retrieve_latency)
+        started = time.perf_counter()
+        for question in questions:
+            if cached:
+                retriever.retrieve(question)
+            else:
+                retriever.client.retrieve(knowledgeBaseId="kb", retrievalQuery={"text": question})
+        return (time.perf_counter() - started) * 1000 / len(questions)
+
+    uncached_ms = per_question_ms(cached=False)
+    cached_ms = per_question_ms(cached=True)
+    saved_ms = sum(metrics.metric_set["RetrievalLatencySaved"]["Value"])
+
+    print(
+        f"\nretrieval over {len(questions)} FAQ questions: uncached {uncached_ms:.1f} ms, "
+        f"cached {cached_ms:.1f} ms per question ({saved_ms:.0f} ms saved in total)"
+    )
+    assert metrics.metric_set["RetrievalCacheMiss"]["Value"] == [1.0] * len(faq)
+    assert cached_ms < uncached_ms / 5
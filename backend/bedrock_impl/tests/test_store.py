@@ -0,0 +1,538 @@
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import boto3
+import pytest
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from bedrock_impl import handler
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.conversation_handler import conversation_handler
+from bedrock_impl.handler import bedrock_handler
+from bedrock_impl.models import Chunk, ResponsePart
+from bedrock_impl.store import PREVIEW_CHARS, AiMessage, ChatStore, Session, UserMessage
+
+from tests.conftest import CONVERSATIONS_TABLE
+
+
+def _session(user_id: str, i: int) -> Session:
+    stamp = f"2025-01-01T00:00:{i:02d}.000+00:00"
+    return Session(user_id=user_id, created_at=stamp, last_updated=stamp)
+
+
+def _put_sessions(table, user_id: str, n: int) -> list[Session]:
+    sessions = [_session(user_id, i) for i in range(n)]
+    for session in sessions:
+        table.put_item(Item=session.model_dump(mode="json"))
+    return sessions
+
+
+def _conversations_event(user_id: str, **query):
+    return {
+        "path": f"/rag/bedrock/conversation/{user_id}",
+        "pathParameters": {"user_id": user_id},
+        "queryStringParameters": query or None,
+        "httpMethod": "GET",
+    }
+
+
+def test_conversations_are_paged_newest_first(conversations_table):
+    sessions = _put_sessions(conversations_table, "alice", 5)
+    _put_sessions(conversations_table, "bob", 3)
+    store = ChatStore(table=conversations_table)
+
+    seen, cursor = [], None
+    while True:
+        page = store.get_conversations("alice", limit=2, cursor=cursor)
+        seen += page.conversations
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [s.last_updated for s in seen] == sorted((s.last_updated for s in sessions), reverse=True)
+    assert {s.user_id for s in seen} == {"alice"}
+
+
+def test_cursor_is_bound_to_its_user(conversations_table):
+    _put_sessions(conversations_table, "alice", 3)
+    store = ChatStore(table=conversations_table)
+    cursor = store.get_conversations("alice", limit=1).next_cursor
+
+    with pytest.raises(ValueError):
+        store.get_conversations("bob", cursor=cursor)
+    with pytest.raises(ValueError):
+        store.get_conversations("alice", cursor="not-a-cursor")
+
+
+def test_conversation_handler_pages_through_x_next_cursor(conversations_table):
+    _put_sessions(conversations_table, "alice", 3)
+
+    first = conversation_handler(_conversations_event("alice", limit="2"), None)
+    assert first["statusCode"] == 200
+    assert first["headers"]["Access-Control-Expose-Headers"] == "X-Next-Cursor"
+    cursor = first["headers"]["X-Next-Cursor"]
+
+    second = conversation_handler(_conversations_event("alice", limit="2", cursor=cursor), None)
+    assert second["statusCode"] == 200
+    assert "X-Next-Cursor" not in second["headers"]
+    assert len(json.loads(first["body"])) == 2
+    assert len(json.loads(second["body"])) == 1
+
+    assert conversation_handler(_conversations_event("alice", limit="0"), None)["statusCode"] == 400
+    assert conversation_handler(_conversations_event("alice", cursor="garbage"), None)["statusCode"] == 400
+
+
+def test_save_message_keeps_the_session_summary_current(conversations_table):
+    store = ChatStore(table=conversations_table)
+    session_id = store.create_session(user_id="alice")
+    store.save_message(role="user", body="How do I download a release?", session_id=session_id)
+    answer = store.save_message(role="ai", body="Open the Releases tab. " * 20, session_id=session_id)
+
+    with patch.object(conversations_table, "query", wraps=conversations_table.query) as query:
+        [conversation] = store.get_conversations("alice").conversations
+    assert query.call_count == 1  # rendered from the index alone, no per-session reads
+
+    assert conversation.title == "How do I download a release?"
+    assert conversation.message_count == 2
+    assert conversation.last_updated == answer.created_at
+    assert len(conversation.preview) == PREVIEW_CHARS and conversation.preview.endswith("…")
+
+
+def test_summary_counts_stay_consistent_under_concurrent_writes(conversations_table, atomic_item_writes):
+    session_id = ChatStore(table=conversations_table).create_session(user_id="alice")
+    writers, per_writer = 8, 25
+
+    def write(w):
+        # boto3 resources are not thread-safe: one per writer, as in separate Lambda invocations
+        store = ChatStore(table=boto3.resource("dynamodb").Table(CONVERSATIONS_TABLE))
+        for i in range(per_writer):
+            store.save_message(role="user" if i % 2 else "ai", body=f"writer {w} message {i}", session_id=session_id)
+
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(writers)))
+
+    metadata = conversations_table.get_item(
+        Key={"session_id": f"SESSION#{session_id}", "created_at_message_id": "METADATA"}
+    )["Item"]
+    messages = ChatStore(table=conversations_table).get_messages(session_id, limit=500).messages
+    assert metadata["message_count"] == len(messages) == writers * per_writer
+    assert metadata["last_updated"] == max(m.created_at for m in messages)
+
+
+def test_backfill_recounts_sessions_from_before_message_count(conversations_table):
+    store = ChatStore(table=conversations_table)
+    legacy = Session(user_id="alice")
+    conversations_table.put_item(Item={k: v for k, v in legacy.model_dump(mode="json").items() if k != "message_count"})
+    for i in range(3):
+        conversations_table.put_item(Item=UserMessage(session_id=legacy.session_id, body=f"old message {i}").model_dump(mode="json"))
+    store.save_message(role="user", body="First question after the upgrade", session_id=legacy.session_id)
+    assert store.get_session(legacy.session_id).message_count == 1  # ADD started from 0
+
+    current = store.create_session(user_id="alice")
+    store.save_message(role="user", body="Hello?", session_id=current)
+
+    assert store.backfill_message_counts() == 1
+    assert store.get_session(legacy.session_id).message_count == 4
+    assert store.get_session(current).message_count == 1
+    assert store.backfill_message_counts() == 0
+
+
+def test_message_is_not_stored_without_its_session(conversations_table):
+    store = ChatStore(table=conversations_table)
+    with pytest.raises(ValueError, match="not found"):
+        store.save_message(role="user", body="Hello?", session_id="missing")
+    assert conversations_table.scan()["Count"] == 0
+
+
+def _answer(session_id: str, i: int) -> AiMessage:
+    return AiMessage(
+        session_id=session_id,
+        body=f"Answer {i}: open the Releases tab and choose Download.",
+        response_parts=[ResponsePart(
+            text="Open the Releases tab and choose Download.",
+            references=[Chunk(text="Releases can be downloaded from the portal. " * 20, url="https://example.com/docs")] * 3,
+        )],
+    )
+
+
+def _put_messages(table, session_id: str, n: int) -> None:
+    with table.batch_writer() as batch:
+        for i in range(n):
+            message = UserMessage(session_id=session_id, body=f"Question {i}?") if i % 2 == 0 else _answer(session_id, i)
+            # distinct, ordered timestamps even when created within the same millisecond
+            message.created_at = f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}.000+00:00"
+            batch.put_item(Item=message.model_dump(mode="json"))
+
+
+def _messages_event(session_id: str, **query):
+    return {
+        "path": f"/rag/bedrock/messages/{session_id}",
+        "pathParameters": {"session_id": session_id},
+        "queryStringParameters": query or None,
+        "httpMethod": "GET",
+    }
+
+
+def test_messages_are_windowed_newest_first_with_a_cursor_for_older_pages(conversations_table):
+    _put_messages(conversations_table, "s1", 7)
+    _put_messages(conversations_table, "s2", 2)
+    store = ChatStore(table=conversations_table)
+
+    windows, cursor = [], None
+    while True:
+        page = store.get_messages("s1", limit=3, cursor=cursor)
+        windows.append([m.body.split(":")[0].rstrip("?") for m in page.messages])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert windows == [
+        ["Question 4", "Answer 5", "Question 6"],
+        ["Answer 1", "Question 2", "Answer 3"],
+        ["Question 0"],
+    ]
+    with pytest.raises(ValueError):
+        store.get_messages("s2", cursor=store.get_messages("s1", limit=1).next_cursor)
+
+
+def test_messages_route_can_omit_response_parts(conversations_table):
+    _put_messages(conversations_table, "s1", 4)
+
+    full = conversation_handler(_messages_event("s1"), None)
+    light = conversation_handler(_messages_event("s1", include_response_parts="false"), None)
+
+    assert [m["body"] for m in json.loads(light["body"])] == [m["body"] for m in json.loads(full["body"])]
+    assert all("response_parts" not in m for m in json.loads(light["body"]))
+    assert json.loads(full["body"])[1]["response_parts"][0]["references"]
+    page = ChatStore(table=conversations_table).get_messages("s1", include_response_parts=False)
+    assert [m.response_parts for m in page.messages if m.role == "ai"] == [[], []]
+
+
+def test_benchmark_1000_message_session_payload_and_latency(conversations_table):
+    _put_messages(conversations_table, "long", 1000)
+
+    def fetch_all():
+        # what the route used to return: every message, with every reference text, in one body
+        bodies, cursor = [], None
+        while True:
+            query = {"limit": "500", **({"cursor": cursor} if cursor else {})}
+            response = conversation_handler(_messages_event("long", **query), None)
+            bodies += json.loads(response["body"])
+            cursor = response["headers"].get("X-Next-Cursor")
+            if not cursor:
+                return json.dumps(bodies)
+
+    started = time.perf_counter()
+    full_body = fetch_all()
+    full_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    window = conversation_handler(_messages_event("long", limit="50", include_response_parts="false"), None)
+    window_ms = (time.perf_counter() - started) * 1000
+
+    print(
+        f"\n1000-message session: full {len(full_body) / 1024:.0f} KB {full_ms:.0f} ms, "
+        f"latest 50 without response_parts {len(window['body']) / 1024:.1f} KB {window_ms:.0f} ms"
+    )
+    assert len(json.loads(full_body)) == 1000
+    assert len(json.loads(window["body"])) == 50
+    assert len(window["body"]) < len(full_body) / 50
+    assert window_ms < full_ms
+
+
+def test_benchmark_context_fetch_projection_vs_full_items(conversations_table):
+    store = ChatStore(table=conversations_table)
+    session_id = store.create_session(user_id="alice")
+    for i in range(10):
+        store.save_message(role="user", body=f"Question {i}?", session_id=session_id)
+        answer = _answer(session_id, i)
+        store.save_message(role="ai", body=answer.body, session_id=session_id, response_parts=answer.response_parts * 3)
+
+    full = store.get_latest_messages(user_id="alice", session_id=session_id, n=5)
+    light = store.get_context(session_id=session_id, n=5)
+    assert [str(m) for m in light] == [str(m) for m in full]
+
+    raw = conversations_table.query(
+        KeyConditionExpression=Key("session_id").eq(f"SESSION#{session_id}") & Key("created_at_message_id").begins_with("MESSAGE#"),
+        ScanIndexForward=False, Limit=5,
+    )["Items"]
+    full_bytes = sum(_item_size(item) for item in raw)
+    light_bytes = sum(_item_size(m._asdict()) for m in light)
+
+    def per_call_ms(fetch, rounds=200):
+        started, cpu = time.perf_counter(), time.process_time()
+        for _ in range(rounds):
+            fetch()
+        return (time.perf_counter() - started) * 1000 / rounds, (time.process_time() - cpu) * 1000 / rounds
+
+    full_ms, full_cpu = per_call_ms(lambda: store.get_latest_messages(user_id="alice", session_id=session_id, n=5))
+    light_ms, light_cpu = per_call_ms(lambda: store.get_context(session_id=session_id, n=5))
+
+    # Query is billed on the full size of the items it reads, projected or not
+    print(
+        f"\ncontext fetch (n=5): full items {full_bytes / 1024:.1f} KB {full_ms:.2f} ms ({full_cpu:.2f} ms CPU), "
+        f"projection {light_bytes} B {light_ms:.2f} ms ({light_cpu:.2f} ms CPU), "
+        f"{_read_units(full_bytes):.1f} RCU either way"
+    )
+    assert light_bytes < full_bytes / 20
+    assert light_cpu < full_cpu
+
+
+# ---------- bedrock_handler I/O ----------
+def _chat_event(user_id: str, content: str, session_id: str | None = None):
+    return {
+        "path": "/rag/bedrock",
+        "httpMethod": "POST",
+        "body": json.dumps({
+            "message_id": str(uuid4()),
+            "content": content,
+            "created_at": "2025-01-01T00:00:00Z",
+            **({"session_id": session_id} if session_id else {}),
+        }),
+        "requestContext": {"authorizer": {"claims": {"sub": user_id}}},
+    }
+
+
+def _stub_bedrock(latency: float = 0.0, answer: str = "Open the Releases tab.") -> MagicMock:
+    """RetrieveAndGenerate stand-in; `client.live` holds the sessionIds it still knows."""
+    client = MagicMock()
+    client.live = set()
+
+    def retrieve_and_generate(**kwargs):
+        time.sleep(latency)
+        session_id = kwargs.get("sessionId")
+        if session_id and session_id not in client.live:
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "Session expired"}}, "RetrieveAndGenerate")
+        if not session_id:
+            session_id = f"kb-{uuid4()}"
+            client.live.add(session_id)
+        return {"output": {"text": answer}, "sessionId": session_id, "citations": []}
+
+    client.retrieve_and_generate.side_effect = retrieve_and_generate
+    return client
+
+
+def _sent(client: MagicMock) -> list[tuple[str, str | None]]:
+    return [(c.kwargs["input"]["text"], c.kwargs.get("sessionId")) for c in client.retrieve_and_generate.call_args_list]
+
+
+@pytest.fixture
+def chat_turn(monkeypatch, conversations_table):
+    """bedrock_handler wired to the moto table and a stub Bedrock client."""
+    client = _stub_bedrock()
+    monkeypatch.setattr(handler, "get_chat_store", lambda: ChatStore(table=conversations_table))
+    monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=client, rag_config={}))
+
+    def turn(content: str, session_id: str | None = None) -> str:
+        response = bedrock_handler(_chat_event("alice", content, session_id), None)
+        assert response["statusCode"] == 200, response["body"]
+        return json.loads(response["body"])["session_id"]
+
+    turn.bedrock = client
+    return turn
+
+
+def test_chat_turns_persist_messages_summary_and_continue_the_bedrock_session(chat_turn, conversations_table):
+    session_id = chat_turn("How do I download a release?")
+    for i in range(3):
+        assert chat_turn(f"Follow-up {i}?", session_id=session_id) == session_id
+
+    store = ChatStore(table=conversations_table)
+    messages = store.get_messages(session_id).messages
+    assert [m.role for m in messages] == ["user", "ai"] * 4
+    [conversation] = store.get_conversations("alice").conversations
+    assert conversation.title == "How do I download a release?"
+    assert conversation.message_count == 8
+    assert conversation.last_updated == messages[-1].created_at
+
+    # Bedrock keeps the conversation: after the first turn only the question is sent
+    [kb_session] = chat_turn.bedrock.live
+    assert _sent(chat_turn.bedrock) == [("How do I download a release?", None)] + [
+        (f"Follow-up {i}?", kb_session) for i in range(3)
+    ]
+    assert store.get_bedrock_session_id(session_id) == kb_session
+    assert "bedrock_session_id" not in conversation.model_dump()
+
+
+def test_expired_bedrock_session_falls_back_to_recent_messages(chat_turn, conversations_table):
+    session_id = chat_turn("How do I download a release?")
+    for i in range(3):
+        chat_turn(f"Follow-up {i}?", session_id=session_id)
+    chat_turn.bedrock.live.clear()  # Bedrock expired the session
+
+    chat_turn("And the previous one?", session_id=session_id)
+
+    store = ChatStore(table=conversations_table)
+    messages = store.get_messages(session_id).messages
+    (_, expired), (prompt, fresh) = _sent(chat_turn.bedrock)[-2:]
+    # the 4 messages before the question, then the question, exactly once
+    history = "\n".join(str(m) for m in messages[-6:-2])
+    assert expired is not None and fresh is None
+    assert prompt == f"Conversation so far:\n{history}\n\nQuery: And the previous one?"
+    # the new Bedrock session is kept for the next turn
+    assert store.get_bedrock_session_id(session_id) in chat_turn.bedrock.live
+
+
+def test_benchmark_bedrock_input_per_turn_session_vs_resent_context(monkeypatch, conversations_table):
+    store = ChatStore(table=conversations_table)
+    monkeypatch.setattr(handler, "get_chat_store", lambda: store)
+    questions = [f"Question {i}: how do I publish version {i} of my API?" for i in range(8)]
+    answer = "Open the API in the portal, choose Versions and then Publish. " * 4
+
+    def input_chars(keep_session: bool) -> list[int]:
+        client = _stub_bedrock(answer=answer)
+        if not keep_session:
+            # the previous behaviour: the sessionId Bedrock returned was never passed back
+            monkeypatch.setattr(store, "get_bedrock_session_id", lambda session_id: None)
+        monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=client, rag_config={}))
+        session_id = None
+        for question in questions:
+            response = bedrock_handler(_chat_event("alice", question, session_id), None)
+            session_id = json.loads(response["body"])["session_id"]
+        return [len(text) for text, _ in _sent(client)]
+
+    native = input_chars(keep_session=True)
+    resent = input_chars(keep_session=False)
+
+    print(f"\nBedrock input chars per turn: session {native}, resent context {resent}")
+    assert native == [len(q) for q in questions]
+    assert sum(resent) > 5 * sum(native)
+
+
+def test_first_turn_writes_session_and_message_in_one_transaction(chat_turn, conversations_table):
+    client = conversations_table.meta.client
+    with patch.object(client, "transact_write_items", wraps=client.transact_write_items) as transact, \
+            patch.object(conversations_table, "query", wraps=conversations_table.query) as query:
+        chat_turn("How do I download a release?")
+    assert transact.call_count == 2  # session + question, then answer + summary
+    assert query.call_count == 0
+
+
+def test_benchmark_chat_turn_overlapped_vs_sequential_io(monkeypatch, conversations_table):
+    ddb_latency, bedrock_latency, rounds = 0.05, 0.2, 5
+    # every DynamoDB request, on any thread, pays the injected round-trip latency
+    conversations_table.meta.client.meta.events.register(
+        "before-call.dynamodb", lambda **kwargs: time.sleep(ddb_latency)
+    )
+    store = ChatStore(table=conversations_table)
+    bedrock = Bedrock(client=_stub_bedrock(bedrock_latency), rag_config={})
+    monkeypatch.setattr(handler, "get_chat_store", lambda: store)
+    monkeypatch.setattr(handler, "get_bedrock", lambda: bedrock)
+
+    def sequential(content: str, session_id: str | None = None) -> str:
+        # the previous flow: every request waits for the one before it
+        session_id = session_id or store.create_session(user_id="alice")
+        store.save_message(role="user", body=content, session_id=session_id)
+        context = store.get_context(session_id=session_id, n=5)
+        response = bedrock.parse_response(bedrock.generate_response(content, context))
+        store.save_message(role="ai", body=response.content, session_id=session_id, response_parts=response.response_parts)
+        return session_id
+
+    def overlapped(content: str, session_id: str | None = None) -> str:
+        return json.loads(bedrock_handler(_chat_event("alice", content, session_id), None)["body"])["session_id"]
+
+    def per_turn_ms(chat):
+        first, follow_up = [], []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            session_id = chat("How do I download a release?")
+            first.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            chat("And an older one?", session_id=session_id)
+            follow_up.append(time.perf_counter() - started)
+        return sorted(first)[rounds // 2] * 1000, sorted(follow_up)[rounds // 2] * 1000
+
+    seq_first, seq_follow = per_turn_ms(sequential)
+    ovl_first, ovl_follow = per_turn_ms(overlapped)
+
+    print(
+        f"\nchat turn, {ddb_latency * 1000:.0f} ms DynamoDB / {bedrock_latency * 1000:.0f} ms Bedrock: "
+        f"new session {seq_first:.0f} -> {ovl_first:.0f} ms, follow-up {seq_follow:.0f} -> {ovl_follow:.0f} ms"
+    )
+    # critical path: 4 -> 2 DynamoDB round trips for a new session, 3 -> 2 for a follow-up
+    assert seq_first - ovl_first > 1.5 * ddb_latency * 1000
+    assert seq_follow - ovl_follow > 0.5 * ddb_latency * 1000
+
+
+# ---------- Benchmark: Scan vs GSI Query at 10k users ----------
+def _item_size(item) -> int:
+    """DynamoDB item size: attribute names plus UTF-8 values (nested lists/maps approximated)."""
+    def value_size(value) -> int:
+        if isinstance(value, str):
+            return len(value.encode())
+        if isinstance(value, dict):
+            return 3 + sum(len(k.encode()) + value_size(v) for k, v in value.items())
+        if isinstance(value, list):
+            return 3 + sum(1 + value_size(v) for v in value)
+        return 21 if value is not None else 1
+    return sum(len(name.encode()) + value_size(value) for name, value in item.items())
+
+
+def _read_units(nbytes: int) -> float:
+    # eventually consistent: 0.5 RCU per 4 KB read, Query/Scan round the page total up
+    return max(1, math.ceil(nbytes / 4096)) * 0.5
+
+
+@pytest.mark.benchmark
+def test_benchmark_read_units_scan_vs_gsi_query(conversations_table):
+    users, target = 10_000, "user-04242"
+    total_bytes = 0
+    with conversations_table.batch_writer() as batch:
+        for u in range(users):
+            session = _session(f"user-{u:05d}", u % 60)
+            question = UserMessage(session_id=session.session_id, body="How do I download a release from the content portal?")
+            answer = AiMessage(
+                session_id=session.session_id,
+                body="You can download releases from the Releases tab. " * 10,
+                response_parts=[ResponsePart(
+                    text="Open the Releases tab and choose Download.",
+                    references=[Chunk(text="Releases can be downloaded from the portal. " * 8, url="https://example.com/docs")],
+                )],
+            )
+            for item in (session.model_dump(mode="json"), question.model_dump(mode="json"), answer.model_dump(mode="json")):
+                batch.put_item(Item=item)
+                total_bytes += _item_size(item)
+
+    store = ChatStore(table=conversations_table)
+
+    # what the old implementation did: one Scan call, LastEvaluatedKey ignored
+    legacy = conversations_table.scan(
+        FilterExpression=Key("user_id").eq(target) & Key("created_at_message_id").eq("METADATA")
+    )
+    assert "LastEvaluatedKey" in legacy  # stopped at 1 MB: other users' sessions were silently dropped
+
+    # a correct Scan has to read every item of every user
+    started = time.perf_counter()
+    scanned, kwargs = [], {}
+    while True:
+        page = conversations_table.scan(
+            FilterExpression=Key("user_id").eq(target) & Key("created_at_message_id").eq("METADATA"), **kwargs
+        )
+        scanned += page["Items"]
+        if "LastEvaluatedKey" not in page:
+            break
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    scan_ms = (time.perf_counter() - started) * 1000
+    scan_rcu = _read_units(total_bytes)
+
+    started = time.perf_counter()
+    page = store.get_conversations(target)
+    query_ms = (time.perf_counter() - started) * 1000
+    raw = boto3.client("dynamodb").query(
+        TableName=CONVERSATIONS_TABLE, IndexName="UserConversationsIndex",
+        KeyConditionExpression="user_id = :u", ExpressionAttributeValues={":u": {"S": target}},
+    )
+    query_rcu = _read_units(sum(_item_size({k: list(v.values())[0] for k, v in item.items()}) for item in raw["Items"]))
+
+    print(
+        f"\nlist conversations, {users} users / {total_bytes / 1e6:.1f} MB table: "
+        f"scan {scan_rcu:.1f} RCU {scan_ms:.0f} ms, GSI query {query_rcu:.1f} RCU {query_ms:.1f} ms"
+    )
+    assert [s.session_id for s in page.conversations] == [i["session_id"] for i in scanned]
+    assert query_rcu == 0.5
+    assert scan_rcu > 1000 * query_rcu
@@ -0,0 +1,180 @@
+import http.client
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+from botocore.exceptions import ClientError
+
+from bedrock_impl import handler
+from bedrock_impl.bedrock import Bedrock
+from bedrock_impl.handler import bedrock_handler
+from bedrock_impl.models import RAGRequest
+from bedrock_impl.store import ChatStore
+from bedrock_impl.stream_server import STREAM_PATH, StreamHandler, chat_events
+
+from tests.test_store import _chat_event
+
+CHUNKS = ["Open the ", "Releases tab ", "and choose ", "Download."]
+CITATION = {
+    "generatedResponsePart": {"textResponsePart": {"text": "Open the Releases tab and choose Download."}},
+    "retrievedReferences": [{
+        "content": {"text": "Releases can be downloaded from the portal."},
+        "location": {"type": "WEB", "webLocation": {"url": "https://example.com/docs"}},
+    }],
+}
+
+
+def _stub_stream_bedrock(chunk_delay: float = 0.0) -> MagicMock:
+    """RetrieveAndGenerateStream stand-in: CHUNKS one `chunk_delay` apart, then a citation."""
+    client = MagicMock()
+    client.live = set()
+
+    def session(kwargs) -> str:
+        session_id = kwargs.get("sessionId")
+        if session_id and session_id not in client.live:
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "Session expired"}}, "RetrieveAndGenerateStream")
+        if not session_id:
+            session_id = f"kb-{uuid4()}"
+            client.live.add(session_id)
+        return session_id
+
+    def events():
+        for chunk in CHUNKS:
+            time.sleep(chunk_delay)
+            yield {"output": {"text": chunk}}
+        yield {"citation": {"citation": CITATION}}
+
+    def retrieve_and_generate_stream(**kwargs):
+        return {"sessionId": session(kwargs), "stream": events()}
+
+    def retrieve_and_generate(**kwargs):
+        # the blocking call returns once the whole answer has been generated
+        session_id = session(kwargs)
+        time.sleep(chunk_delay * len(CHUNKS))
+        return {"output": {"text": "".join(CHUNKS)}, "sessionId": session_id, "citations": [CITATION]}
+
+    client.retrieve_and_generate_stream.side_effect = retrieve_and_generate_stream
+    client.retrieve_and_generate.side_effect = retrieve_and_generate
+    return client
+
+
+def _request(content: str, session_id: str | None = None) -> RAGRequest:
+    return RAGRequest(message_id=str(uuid4()), content=content, created_at="2025-01-01T00:00:00Z", session_id=session_id)
+
+
+def _parse(events: list[str]) -> list[tuple[str, dict]]:
+    parsed = []
+    for event in events:
+        name, data = event.strip().split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def test_streamed_turn_forwards_chunks_and_stores_the_answer_with_citations(conversations_table):
+    store = ChatStore(table=conversations_table)
+    client = _stub_stream_bedrock()
+    bedrock = Bedrock(client=client, rag_config={})
+
+    first = _parse(list(chat_events(bedrock, store, "alice", _request("How do I download a release?"))))
+    assert [name for name, _ in first] == ["token"] * len(CHUNKS) + ["end"]
+    assert [data["text"] for _, data in first[:-1]] == CHUNKS
+    end = first[-1][1]
+    assert end["content"] == "".join(CHUNKS)
+    assert end["response_parts"][0]["references"][0]["url"] == "https://example.com/docs"
+
+    session_id = end["session_id"]
+    [kb_session] = client.live
+    assert store.get_bedrock_session_id(session_id) == kb_session
+
+    # the follow-up continues the Bedrock session; once expired, recent messages are resent
+    _parse(list(chat_events(bedrock, store, "alice", _request("And the source?", session_id))))
+    client.live.clear()
+    last = _parse(list(chat_events(bedrock, store, "alice", _request("Anything else?", session_id))))
+    assert last[-1][0] == "end"
+    sent = [(c.kwargs["input"]["text"], c.kwargs.get("sessionId")) for c in client.retrieve_and_generate_stream.call_args_list]
+    assert sent[1] == ("And the source?", kb_session)
+    assert sent[-1][1] is None and sent[-1][0].startswith("Conversation so far:")
+
+    messages = store.get_messages(session_id).messages
+    assert [m.role for m in messages] == ["user", "ai"] * 3
+    assert messages[1].body == "".join(CHUNKS)
+    assert str(messages[1].response_parts[0].references[0].url) == "https://example.com/docs"
+    assert store.get_conversations("alice").conversations[0].message_count == 6
+
+
+def test_failed_stream_ends_with_an_error_event(conversations_table):
+    store = ChatStore(table=conversations_table)
+    client = _stub_stream_bedrock()
+    client.retrieve_and_generate_stream.side_effect = lambda **kwargs: {
+        "sessionId": "kb", "stream": iter([{"output": {"text": "Open"}}, {"throttlingException": {"message": "slow down"}}])
+    }
+
+    events = _parse(list(chat_events(Bedrock(client=client, rag_config={}), store, "alice", _request("Hello?"))))
+
+    assert [name for name, _ in events] == ["token", "error"]
+    [session] = store.get_conversations("alice").conversations
+    assert session.message_count == 1  # the question is kept, no partial answer
+
+
+@pytest.fixture
+def stream_server(monkeypatch, conversations_table):
+    client = _stub_stream_bedrock(chunk_delay=0.1)
+    monkeypatch.setattr(handler, "get_chat_store", lambda: ChatStore(table=conversations_table))
+    monkeypatch.setattr(handler, "get_bedrock", lambda: Bedrock(client=client, rag_config={}))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _post(port: int, user_id: str | None, body: str) -> http.client.HTTPResponse:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    if user_id:
+        headers["x-amzn-request-context"] = json.dumps({"authorizer": {"claims": {"sub": user_id}}})
+    connection.request("POST", STREAM_PATH, body=body, headers=headers)
+    return connection.getresponse()
+
+
+def test_stream_route_validates_the_request(stream_server):
+    body = _request("Hello?").model_dump_json()
+    assert _post(stream_server, None, body).status == 400
+    assert _post(stream_server, "alice", "").status == 400
+    assert _post(stream_server, "alice", '{"content": 1}').status == 400
+
+
+def test_benchmark_time_to_first_byte_streamed_vs_blocking(stream_server):
+    rounds = 3
+
+    def streamed() -> tuple[float, float]:
+        started = time.perf_counter()
+        response = _post(stream_server, "alice", _request("How do I download a release?").model_dump_json())
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "text/event-stream"
+        first = response.read1()
+        first_byte = time.perf_counter() - started
+        body = first + response.read()
+        assert first.startswith(b"event: token") and b"event: end" in body
+        return first_byte, time.perf_counter() - started
+
+    def blocking() -> float:
+        started = time.perf_counter()
+        response = bedrock_handler(_chat_event("alice", "How do I download a release?"), None)
+        assert response["statusCode"] == 200
+        return time.perf_counter() - started
+
+    stream_times = [streamed() for _ in range(rounds)]
+    blocking_ms = min(blocking() for _ in range(rounds)) * 1000
+    ttfb_ms = min(t for t, _ in stream_times) * 1000
+    total_ms = min(t for _, t in stream_times) * 1000
+
+    print(
+        f"\ntime to first byte: streamed {ttfb_ms:.0f} ms (complete after {total_ms:.0f} ms), "
+        f"blocking {blocking_ms:.0f} ms"
+    )
+    assert ttfb_ms < blocking_ms / 2
@@ -0,0 +1,126 @@
+"""
+Admission control for the chat endpoints.
+
+At most `max_concurrency` turns run at once; up to `max_queue` more wait (for at
+most `queue_timeout` seconds) for a slot. Anything beyond that is rejected
+straight away so a burst degrades into fast 429/503s instead of every request
+hitting OpenAI rate limits (and their retries) at the same time.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+from langchain_impl.metrics import REGISTRY, Registry
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; maps directly onto an HTTP error."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: float = 1.0,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self._inflight_gauge = registry.gauge("chat_inflight_requests", "Chat turns currently running")
+        self._queue_gauge = registry.gauge("chat_queue_depth", "Chat requests waiting for a slot")
+        self._wait_hist = registry.histogram("chat_queue_wait_seconds", "Time admitted requests spent queued")
+        self._rejected = registry.counter("chat_admission_rejected_total", "Chat requests rejected by admission control")
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("CHAT_MAX_QUEUE", "16")),
+            queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT_S", "10")),
+            retry_after=float(os.getenv("CHAT_RETRY_AFTER_S", "2")),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _publish(self) -> None:
+        self._inflight_gauge.set(self._in_flight)
+        self._queue_gauge.set(len(self._waiters))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self._rejected.inc(reason=reason)
+        return AdmissionRejected(status_code, reason, self.retry_after)
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the bounded queue if needed. Raises AdmissionRejected."""
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            self._wait_hist.observe(0.0)
+            self._publish()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue_full")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "queue_timeout") from None
+
+        self._wait_hist.observe(time.perf_counter() - started)
+        self._publish()
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest waiter if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot transferred; in-flight count unchanged
+                self._publish()
+                return
+        self._in_flight = max(0, self._in_flight - 1)
+        self._publish()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,15 +1,23 @@
-from langchain_openai import ChatOpenAI
-from langchain_openai.embeddings import OpenAIEmbeddings
+from typing import TYPE_CHECKING
 
-def build_llm_client() -> ChatOpenAI:
+# langchain_openai pulls in openai/tiktoken; import it only when a client is built
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langchain_openai.embeddings import OpenAIEmbeddings
+
+def build_llm_client() -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
     return ChatOpenAI(
         model="gpt-4o-mini",
         temperature=0,
         timeout=None,
         max_retries=2,
+        # token usage on streamed replies too (see usage)
+        stream_usage=True,
     )
 
-def build_embeddings_client() -> OpenAIEmbeddings:
+def build_embeddings_client() -> "OpenAIEmbeddings":
+    from langchain_openai.embeddings import OpenAIEmbeddings
     return OpenAIEmbeddings(
         model="text-embedding-3-large",
     )
\ No newline at end of file
@@ -1,40 +1,84 @@
-from http.client import NO_CONTENT
+import logging
 import os
+import threading
 import uuid
-from langgraph.checkpoint.memory import MemorySaver
-from botocore.exceptions import NoCredentialsError
-from langchain_openai import ChatOpenAI
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from langchain_core.tools import tool
 from langchain_core.messages import BaseMessage, SystemMessage, AIMessage, ToolMessage, AnyMessage
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 
 from langgraph.prebuilt import ToolNode, tools_condition, InjectedStore
 from langgraph.graph import StateGraph, MessagesState, END
 from langgraph.graph.state import CompiledStateGraph
-
-from langgraph_checkpoint_dynamodb.saver import (
-    DynamoDBSaver,
-)
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from typing_extensions import Annotated
-from typing import List, Dict, Any
-from dotenv import load_dotenv, find_dotenv
+from typing import List, Dict, Any, Iterator, Tuple
 
-from langchain_impl.vector_stores import InMemoryStore, BaseVectorStore
+from langchain_impl.vector_stores import BaseVectorStore
+from langchain_impl.snapshots import InMemorySnapshotBuilder, SharedSnapshotBuilder, SnapshotStore
 from langchain_impl.apis import build_llm_client, build_embeddings_client
-from langchain_impl.web_scrape import fetch_documentation, split_document
+from langchain_impl.checkpointers import build_checkpointer
+from langchain_impl import deadline
 from langchain_impl.history import show_history_menu
+from langchain_impl.tracing import TimedCheckpointSaver, TimedEmbeddings, log_event, span, timed
+from langchain_impl.usage import MeteredEmbeddings, add_usage, metered, starts_turn
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 # ---------------- Env ----------------
-load_dotenv(find_dotenv(usecwd=True))
-_ = os.getenv("OPENAI_API_KEY")  # just to ensure it's loaded
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Load the repo-root .env once, on first use instead of at import."""
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv(usecwd=True))
 
 # ---------------- Clients & store ----------------
-llm: ChatOpenAI = build_llm_client()
-embeddings: OpenAIEmbeddings = build_embeddings_client()
-vector_store: BaseVectorStore = InMemoryStore(embeddings)
+# Built lazily by the get_* accessors below so importing this module (tests, CLI,
+# cold starts) does not construct OpenAI clients. Tests may still patch these names.
+llm: "ChatOpenAI | None" = None
+embeddings: "TimedEmbeddings | None" = None
+vector_store: BaseVectorStore | None = None
+_clients_lock = threading.Lock()
+
+def get_llm() -> "ChatOpenAI":
+    global llm
+    if llm is None:
+        with _clients_lock:
+            if llm is None:
+                load_env()
+                llm = build_llm_client()
+    return llm
+
+def get_embeddings() -> TimedEmbeddings:
+    global embeddings
+    if embeddings is None:
+        with _clients_lock:
+            if embeddings is None:
+                load_env()
+                embeddings = TimedEmbeddings(MeteredEmbeddings(deadline.DeadlineEmbeddings(build_embeddings_client())))
+    return embeddings
+
+def get_vector_store() -> BaseVectorStore:
+    """
+    Snapshot store (hot-swappable, see snapshots) over a per-process InMemoryStore,
+    or with VECTOR_INDEX_PATH set, over the mmapped index every worker shares.
+    """
+    global vector_store
+    if vector_store is None:
+        index_path = os.getenv("VECTOR_INDEX_PATH")
+        if index_path:
+            builder = SharedSnapshotBuilder(index_path, get_embeddings())
+        else:
+            builder = InMemorySnapshotBuilder(get_embeddings())
+        store = SnapshotStore(builder)
+        with _clients_lock:
+            if vector_store is None:
+                vector_store = store
+    return vector_store
 
 # ---------------- Utilities ----------------
 # - Removes tool messages that don’t have a matching call (avoids 400 errors).
@@ -72,13 +116,30 @@ def sanitize_messages(msgs: List[AnyMessage]) -> List[AnyMessage]:
     return clean
 
 # ---------------- Graph ----------------
-def build_graph() -> CompiledStateGraph:
-    graph_builder = StateGraph(MessagesState)
-    tools_node = ToolNode([retrieve])
+class RagState(MessagesState):
+    # token ledger, one record per node run (see usage); checkpointed with the messages
+    usage: Annotated[List[Dict[str, Any]], add_usage]
+    # turns run on this thread; query_or_respond advances it (see usage.starts_turn)
+    turn: int
+
+
+def build_graph(checkpointer: BaseCheckpointSaver | None = None) -> CompiledStateGraph:
+    graph_builder = StateGraph(RagState)
+    tool_node = ToolNode([retrieve])
 
-    graph_builder.add_node(query_or_respond)
-    graph_builder.add_node(tools_node)
-    graph_builder.add_node(generate)
+    # each node runs inside a `node.<name>` span (see tracing) and records its token usage
+    @timed("node.tools")
+    @metered("tools")
+    def tools(state: RagState, config: RunnableConfig):
+        # ToolNode still injects the store: it reads it from `config` at invoke time
+        return tool_node.invoke(state, config)
+
+    graph_builder.add_node(
+        "query_or_respond",
+        starts_turn(timed("node.query_or_respond")(metered("query_or_respond")(query_or_respond))),
+    )
+    graph_builder.add_node("tools", tools)
+    graph_builder.add_node("generate", timed("node.generate")(metered("generate")(generate)))
 
     graph_builder.set_entry_point("query_or_respond")
     graph_builder.add_conditional_edges(
@@ -89,32 +150,19 @@ def build_graph() -> CompiledStateGraph:
     graph_builder.add_edge("tools", "generate")
     graph_builder.add_edge("generate", END)
 
-        # ---- DynamoDB checkpointer (no auto-create in app runtime) ----
-    AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-    CHECKPOINTS_TABLE = os.getenv("CHECKPOINTS_TABLE", "No table in env")
-    WRITES_TABLE = os.getenv("WRITES_TABLE", "No table in env")
+    # Backend picked by CHECKPOINTER_BACKEND (memory | dynamodb | dynamodb-buffered | sqlite) unless given
+    if checkpointer is None:
+        checkpointer = build_checkpointer()
+    if not isinstance(checkpointer, TimedCheckpointSaver):
+        checkpointer = TimedCheckpointSaver(checkpointer)
 
-    backend = os.getenv("CHECKPOINTER_BACKEND", "dynamodb").lower()
-
-    if backend == "memory":
-        checkpointer = MemorySaver()
-    else:
-        try:
-            # Require the table to already exist; do not create from app code.
-            checkpointer = DynamoDBSaver(writes_table_name=WRITES_TABLE, checkpoints_table_name=CHECKPOINTS_TABLE)
-        except Exception as e:
-            raise RuntimeError(
-                f"DynamoDB table '{CHECKPOINTS_TABLE}' is missing or not accessible in region "
-                f"{AWS_REGION}. Create it via IaC (CDK/Terraform/CFN) or run a dev bootstrap "
-                f"script, then set CHECKPOINTS_TABLE accordingly."
-            ) from e
-
-    return graph_builder.compile(checkpointer=checkpointer, store=vector_store)
+    return graph_builder.compile(checkpointer=checkpointer, store=get_vector_store())
 
 
 def _retrieve_core(query: str, vector_store: BaseVectorStore) -> tuple[str, list]:
     """Core retrieval logic that can be tested independently."""
-    retrieved_docs = vector_store.similarity_search(query, k=2)
+    with span("vector.similarity_search"):
+        retrieved_docs = vector_store.similarity_search(query, k=deadline.retrieval_k(2))
     serialized = "\n\n".join(
         (f"Source: {doc.metadata}\nContent: {doc.page_content}")
         for doc in retrieved_docs
@@ -133,6 +181,22 @@ CONTEXT:
 "{DOCS_CONTENT}"
 """.strip()
 
+def turn_sources(messages: List[AnyMessage]) -> List[Dict[str, Any]]:
+    """
+    Metadata of the documents retrieved for the latest answer, i.e. the artifacts
+    of the ToolMessages directly preceding the final AI message.
+    """
+    sources: List[Dict[str, Any]] = []
+    for m in reversed(messages[:-1]):
+        if not isinstance(m, ToolMessage):
+            break
+        for doc in (getattr(m, "artifact", None) or []):
+            metadata = getattr(doc, "metadata", None)
+            if metadata is not None and metadata not in sources:
+                sources.append(metadata)
+    return sources
+
+
 def _last_human_text(state: MessagesState) -> str:
     """Return the most recent human message text ('' if none)."""
     for m in reversed(state["messages"]):
@@ -145,13 +209,14 @@ def _fallback_docs(query: str, k: int = 5) -> str:
     if not query:
         return ""
     try:
-        docs = vector_store.similarity_search(query, k=k)
+        with span("vector.similarity_search"):
+            docs = get_vector_store().similarity_search(query, k=k)
         return "\n\n".join(
             f"Source: {d.metadata}\nContent: {d.page_content}" for d in docs
         )
     except Exception as e:
         # Keep failures invisible to the model; just return empty
-        print(f"[fallback_docs] error: {e}")
+        log_event("fallback_docs.error", level=logging.WARNING, error=f"{type(e).__name__}: {e}")
         return ""
 
 
@@ -177,10 +242,9 @@ def build_system_message(state: MessagesState, allow_fallback: bool = False) ->
         # helper functions you already added:
         # _last_human_text(state), _fallback_docs(query, k=5)
         q = _last_human_text(state)
-        fallback = _fallback_docs(q, k=5)
+        fallback = _fallback_docs(q, k=deadline.retrieval_k(5))
         if fallback:
-            # comment this out if you don’t want the console log
-            print("[system] using fallback docs injection (no ToolMessage present)")
+            log_event("fallback_docs.injected", level=logging.DEBUG)
             docs_content = fallback
 
     system_message_content = LM_SYSTEM_PROMPT_TEMPLATE.replace(
@@ -189,9 +253,15 @@ def build_system_message(state: MessagesState, allow_fallback: bool = False) ->
     return SystemMessage(system_message_content)
 
 
-def query_or_respond(state: MessagesState):
+def query_or_respond(state: RagState):
+    # Not enough time left to route and still generate: answer from _fallback_docs instead
+    budget = deadline.router_budget()
+    if budget < deadline.ROUTER_MIN_S:
+        deadline.degrade("skip_router")
+        return {"messages": []}
+
     # Force the model to pick a tool when appropriate
-    llm_with_tools = llm.bind_tools([retrieve], tool_choice="required")
+    llm_with_tools = get_llm().bind_tools([retrieve], tool_choice="required")
 
     sysmsg = build_system_message(state, allow_fallback=False)
     step_nudge = SystemMessage("You are a helpful AI Assistant.")
@@ -205,10 +275,16 @@ def query_or_respond(state: MessagesState):
         or (m.type == "ai" and not m.tool_calls)
     ]
 
-    response = llm_with_tools.invoke([sysmsg, step_nudge] + convo_msgs)
+    try:
+        response = deadline.with_timeout(llm_with_tools, budget).invoke([sysmsg, step_nudge] + convo_msgs)
+    except Exception as e:
+        if not deadline.timed_out(e):
+            raise
+        deadline.degrade("router_timeout")
+        return {"messages": []}
     return {"messages": [response]}
 
-def generate(state: MessagesState):
+def generate(state: RagState):
     sysmsg = build_system_message(state, allow_fallback=True)  # fallback allowed only here
     msgs = sanitize_messages(state["messages"])
     conversation_messages = [
@@ -217,18 +293,45 @@ def generate(state: MessagesState):
         or (m.type == "ai" and not m.tool_calls)
 ]
 
-    prompt = [sysmsg] + conversation_messages
-    response = llm.invoke(prompt)
+    prompt = [sysmsg] + deadline.trim_context(conversation_messages)
+    response = deadline.with_timeout(get_llm()).invoke(prompt)
     return {"messages": [response]}
 
 
+# ---------------- Streaming ----------------
+def stream_answer(app: CompiledStateGraph, inputs: Dict[str, Any], config: RunnableConfig | None = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Run one turn and yield ("token", text) for every chunk produced by `generate`,
+    followed by a single ("final", state) once the graph has finished.
+    Router/tool output is not forwarded; only the answer is streamed.
+    """
+    final_state = None
+    for mode, payload in app.stream(inputs, config=config, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") == "generate" and isinstance(chunk.content, str) and chunk.content:
+                yield "token", chunk.content
+        else:
+            final_state = payload
+    yield "final", final_state
+
+
 # ---------------- CLI runner ----------------
 def main():
     print("\n================================================================================")
+    from langchain_impl.web_scrape import fetch_documentation, split_document
+
     # Load & index docs into the vector store (dev-only)
-    doc = fetch_documentation("https://api.content.lesmills.com/docs/v1/content-portal-api.yaml")
-    splits = split_document(doc)
-    vector_store.add_documents(splits)
+    def load_documents():
+        doc = fetch_documentation("https://api.content.lesmills.com/docs/v1/content-portal-api.yaml")
+        return split_document(doc)
+
+    store = get_vector_store()
+    if isinstance(store, SnapshotStore):
+        # max_age=inf: an existing shared index (VECTOR_INDEX_PATH) is attached to, not rebuilt
+        store.rebuild(load_documents, max_age=float("inf"))
+    else:
+        store.add_documents(load_documents())
 
     app = build_graph().with_config({"configurable": {"thread_id": uuid.uuid4()}})
 
@@ -241,12 +344,12 @@ def main():
             show_history_menu()
             continue
 
-        final_msg = None
-        for step in app.stream(
-            {"messages": [{"role": "user", "content": raw_input_text}]},
-            stream_mode="values",
-        ):
-            step["messages"][-1].pretty_print()
+        # Print the answer as it is generated instead of waiting for the whole message
+        print()
+        for kind, payload in stream_answer(app, {"messages": [{"role": "user", "content": raw_input_text}]}):
+            if kind == "token":
+                print(payload, end="", flush=True)
+        print()
 
 if __name__ == "__main__":
     main()
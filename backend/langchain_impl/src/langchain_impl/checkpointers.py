@@ -0,0 +1,619 @@
+"""
+Checkpointer selection and wrappers for the LangGraph graph.
+
+CHECKPOINTER_BACKEND picks the store:
+  memory             - in-process MemorySaver (lost on restart; tests/dev)
+  dynamodb           - DynamoDBSaver, one write per graph step (default)
+  dynamodb-buffered  - DynamoDBSaver behind BufferedCheckpointSaver: one write per turn
+  sqlite             - local SqliteCheckpointSaver at SQLITE_CHECKPOINT_PATH (single node)
+
+CHECKPOINT_CACHE_SIZE > 0 puts a CachedCheckpointSaver (read-through LRU of
+that many checkpoints) in front of DynamoDB for both DynamoDB backends.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from langchain_impl.metrics import REGISTRY
+from langchain_impl.tracing import TimedCheckpointSaver, forward_task_path
+
+
+def build_checkpointer(backend: Optional[str] = None) -> BaseCheckpointSaver:
+    backend = (backend or os.getenv("CHECKPOINTER_BACKEND", "dynamodb")).lower()
+
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "dynamodb":
+        return with_cache(build_dynamodb_saver())
+    if backend == "dynamodb-buffered":
+        return BufferedCheckpointSaver(with_cache(build_dynamodb_saver()))
+    if backend == "sqlite":
+        from langchain_impl.sqlite_saver import SqliteCheckpointSaver
+
+        return SqliteCheckpointSaver(
+            os.getenv("SQLITE_CHECKPOINT_PATH", "checkpoints.sqlite"),
+            pool_size=int(os.getenv("SQLITE_POOL_SIZE", "4")),
+        )
+    raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {backend}")
+
+
+def with_cache(saver: BaseCheckpointSaver, max_entries: Optional[int] = None) -> BaseCheckpointSaver:
+    """Wrap `saver` in a CachedCheckpointSaver when CHECKPOINT_CACHE_SIZE (or `max_entries`) > 0."""
+    if max_entries is None:
+        max_entries = int(os.getenv("CHECKPOINT_CACHE_SIZE", "0"))
+    if max_entries <= 0:
+        return saver
+    return CachedCheckpointSaver(saver, max_entries=max_entries, probe=dynamodb_latest_probe(saver))
+
+
+def build_dynamodb_saver() -> BaseCheckpointSaver:
+    # ---- DynamoDB checkpointer (no auto-create in app runtime) ----
+    # Imported here so boto3 is only loaded when the DynamoDB backend is used
+    from langgraph_checkpoint_dynamodb.saver import DynamoDBSaver
+
+    AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+    CHECKPOINTS_TABLE = os.getenv("CHECKPOINTS_TABLE", "No table in env")
+    WRITES_TABLE = os.getenv("WRITES_TABLE", "No table in env")
+
+    try:
+        # Require the table to already exist; do not create from app code.
+        return DynamoDBSaver(writes_table_name=WRITES_TABLE, checkpoints_table_name=CHECKPOINTS_TABLE)
+    except Exception as e:
+        raise RuntimeError(
+            f"DynamoDB table '{CHECKPOINTS_TABLE}' is missing or not accessible in region "
+            f"{AWS_REGION}. Create it via IaC (CDK/Terraform/CFN) or run a dev bootstrap "
+            f"script, then set CHECKPOINTS_TABLE accordingly."
+        ) from e
+
+
+def flush_checkpoints(checkpointer: Optional[BaseCheckpointSaver], config: RunnableConfig) -> int:
+    """Persist a thread's buffered turn if the checkpointer buffers; returns the writes issued."""
+    if isinstance(checkpointer, (BufferedCheckpointSaver, TimedCheckpointSaver)):
+        return checkpointer.flush(config)
+    return 0
+
+
+# ---------------- Write coalescing ----------------
+@dataclass
+class _BufferedTurn:
+    # config of the last *persisted* checkpoint; parent of whatever we flush
+    parent_config: RunnableConfig
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    new_versions: ChannelVersions = field(default_factory=dict)
+    # task_id -> writes recorded against the latest checkpoint
+    writes: Dict[str, List[Tuple[str, Any]]] = field(default_factory=dict)
+    # task_id -> task_path, passed on with the task's writes
+    task_paths: Dict[str, str] = field(default_factory=dict)
+    # ids of every checkpoint buffered this turn (superseded ones are never persisted)
+    checkpoint_ids: Set[str] = field(default_factory=set)
+    # a flush is writing this turn; it stays readable here until the writes succeed
+    flushing: bool = False
+
+
+def _thread_key(config: RunnableConfig) -> Tuple[str, str]:
+    configurable = config.get("configurable", {})
+    return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+
+class BufferedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Keeps every checkpoint LangGraph produces during a turn in memory and writes
+    only the last one (plus any pending writes against it) to the wrapped saver
+    when `flush` is called at the end of the turn. The persisted checkpoint's
+    parent is the previously persisted one, so the stored chain stays intact;
+    the intermediate per-node checkpoints are simply never stored.
+
+    Reads of a thread with a buffered turn are served from the buffer, so the
+    same worker always sees its own writes, even before the flush.
+
+    A turn stays in the buffer, marked as flushing, until the wrapped saver has
+    stored it, so reads never fall through to a store that does not have it yet;
+    a failed flush leaves it buffered for the next one.
+
+    Crash safety: a buffered turn exists only in this process until `flush`
+    returns. If the worker dies before that, the thread resumes from the last
+    persisted turn. With the server's async flush (CHECKPOINT_FLUSH=async) this
+    window extends past the response being sent, so a client may have seen a
+    reply that is not persisted. Another worker reading the thread during the
+    window also sees the previous turn.
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver) -> None:
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self._put_writes = forward_task_path(inner.put_writes)
+        self._aput_writes = forward_task_path(inner.aput_writes)
+        self._turns: Dict[Tuple[str, str], _BufferedTurn] = {}
+        self._lock = threading.Lock()
+        self._buffered_puts = REGISTRY.counter("checkpoint_puts_buffered_total", "Checkpoints kept in memory instead of written")
+        self._flushed_puts = REGISTRY.counter("checkpoint_puts_flushed_total", "Checkpoints written to the backing store")
+        self._flushed_writes = REGISTRY.counter("checkpoint_writes_flushed_total", "Pending writes written to the backing store")
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    def has_pending(self, config: RunnableConfig) -> bool:
+        return _thread_key(config) in self._turns
+
+    # ---- writes (buffered) ----
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key = _thread_key(config)
+        with self._lock:
+            turn = self._turns.get(key)
+            if turn is None:
+                turn = _BufferedTurn(parent_config=config, checkpoint=checkpoint, metadata=metadata)
+                self._turns[key] = turn
+            else:
+                turn.checkpoint, turn.metadata = checkpoint, metadata
+                turn.writes, turn.task_paths = {}, {}  # superseded: already folded into the new checkpoint
+            turn.checkpoint_ids.add(checkpoint["id"])
+            # Union of versions, so savers that store channel values per version get every change
+            turn.new_versions = {**turn.new_versions, **new_versions}
+        self._buffered_puts.inc()
+
+        return {
+            "configurable": {
+                "thread_id": key[0],
+                "checkpoint_ns": key[1],
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not self._buffer_writes(config, writes, task_id, task_path):
+            self._put_writes(config, writes, task_id, task_path)
+
+    def _buffer_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str) -> bool:
+        """Record writes against a buffered checkpoint; False when they belong to the wrapped saver."""
+        key = _thread_key(config)
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        with self._lock:
+            turn = self._turns.get(key)
+            if turn is None or checkpoint_id not in turn.checkpoint_ids:
+                # Writes against an already-persisted checkpoint: nothing to coalesce
+                return False
+            if checkpoint_id == turn.checkpoint["id"]:
+                turn.writes.setdefault(task_id, []).extend(writes)
+                turn.task_paths[task_id] = task_path
+            # else: LangGraph saves writes in the background, so they can arrive after the
+            # next checkpoint (which already includes them) has been buffered
+            return True
+
+    def _begin_flush(self, key: Tuple[str, str]) -> Optional[Tuple[_BufferedTurn, _BufferedTurn]]:
+        """Mark the thread's turn as flushing; returns it and a snapshot of what to write."""
+        with self._lock:
+            turn = self._turns.get(key)
+            if turn is None or turn.flushing:
+                return None  # nothing buffered, or another flush is already writing it
+            turn.flushing = True
+            return turn, replace(
+                turn,
+                writes=dict(turn.writes),
+                task_paths=dict(turn.task_paths),
+                checkpoint_ids=set(turn.checkpoint_ids),
+            )
+
+    def _end_flush(self, key: Tuple[str, str], turn: _BufferedTurn, flushed: _BufferedTurn, saved_config: Optional[RunnableConfig]) -> None:
+        with self._lock:
+            turn.flushing = False
+            if saved_config is None:
+                return  # failed: the turn stays buffered for the next flush
+            if turn.checkpoint["id"] == flushed.checkpoint["id"]:
+                if self._turns.get(key) is turn:
+                    del self._turns[key]
+            else:
+                # The thread moved on while we wrote: what is buffered now follows the stored checkpoint
+                turn.parent_config = saved_config
+                turn.checkpoint_ids -= flushed.checkpoint_ids
+
+    def flush(self, config: RunnableConfig) -> int:
+        """Write the thread's buffered turn to the backing saver. Returns the writes issued."""
+        key = _thread_key(config)
+        begun = self._begin_flush(key)
+        if begun is None:
+            return 0
+        turn, flushed = begun
+
+        saved_config = None
+        try:
+            saved = self.inner.put(flushed.parent_config, flushed.checkpoint, flushed.metadata, flushed.new_versions)
+            self._flushed_puts.inc()
+            for task_id, writes in flushed.writes.items():
+                self._put_writes(saved, writes, task_id, flushed.task_paths.get(task_id, ""))
+                self._flushed_writes.inc()
+            saved_config = saved
+        finally:
+            self._end_flush(key, turn, flushed, saved_config)
+        return 1 + len(flushed.writes)
+
+    async def aflush(self, config: RunnableConfig) -> int:
+        key = _thread_key(config)
+        begun = self._begin_flush(key)
+        if begun is None:
+            return 0
+        turn, flushed = begun
+
+        saved_config = None
+        try:
+            saved = await self.inner.aput(flushed.parent_config, flushed.checkpoint, flushed.metadata, flushed.new_versions)
+            self._flushed_puts.inc()
+            for task_id, writes in flushed.writes.items():
+                await self._aput_writes(saved, writes, task_id, flushed.task_paths.get(task_id, ""))
+                self._flushed_writes.inc()
+            saved_config = saved
+        finally:
+            self._end_flush(key, turn, flushed, saved_config)
+        return 1 + len(flushed.writes)
+
+    def discard(self, config: RunnableConfig) -> None:
+        with self._lock:
+            self._turns.pop(_thread_key(config), None)
+
+    # ---- reads (buffer first) ----
+    def _buffered_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        turn = self._turns.get(_thread_key(config))
+        if turn is None:
+            return None
+        checkpoint_id = config.get("configurable", {}).get("checkpoint_id")
+        if checkpoint_id and checkpoint_id != turn.checkpoint["id"]:
+            return None
+
+        thread_id, checkpoint_ns = _thread_key(config)
+        parent_id = turn.parent_config.get("configurable", {}).get("checkpoint_id")
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": turn.checkpoint["id"]}},
+            checkpoint=turn.checkpoint,
+            metadata=turn.metadata,
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, value)
+                for task_id, writes in turn.writes.items()
+                for channel, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._buffered_tuple(config) or self.inner.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        buffered = self._buffered_tuple(config) if config and not before and not filter else None
+        if buffered:
+            yield buffered
+            if limit is not None:
+                limit -= 1
+                if limit <= 0:
+                    return
+        yield from self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._turns if k[0] == thread_id]:
+                del self._turns[key]
+        self.inner.delete_thread(thread_id)
+
+    # ---- async: buffering is in memory, only the wrapped saver's I/O is awaited ----
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._buffered_tuple(config) or await self.inner.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        buffered = self._buffered_tuple(config) if config and not before and not filter else None
+        if buffered:
+            yield buffered
+            if limit is not None:
+                limit -= 1
+                if limit <= 0:
+                    return
+        async for tup in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield tup
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not self._buffer_writes(config, writes, task_id, task_path):
+            await self._aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._turns if k[0] == thread_id]:
+                del self._turns[key]
+        await self.inner.adelete_thread(thread_id)
+
+
+# ---------------- Read-through cache ----------------
+CacheKey = Tuple[str, str, str]  # thread_id, checkpoint_ns, checkpoint_id
+
+
+def dynamodb_latest_probe(saver: BaseCheckpointSaver) -> Optional[Callable[[str], Optional[str]]]:
+    """
+    Reads a thread's newest checkpoint id from a DynamoDBSaver table: a Limit=1
+    query projected to checkpoint_id. DynamoDB still bills the read on the full
+    item, so this costs as many RCUs as reading the checkpoint; what it saves is
+    the transfer and deserialization of the blob and the pending-writes query.
+    Returns None for savers it does not know how to probe.
+    """
+    table = getattr(saver, "checkpoints_table", None)
+    if table is None:
+        return None
+
+    def probe(thread_id: str) -> Optional[str]:
+        from boto3.dynamodb.conditions import Key
+
+        items = table.query(
+            KeyConditionExpression=Key("thread_id").eq(thread_id),
+            ProjectionExpression="checkpoint_id",
+            ScanIndexForward=False,
+            Limit=1,
+            ConsistentRead=True,
+        ).get("Items", [])
+        return items[0]["checkpoint_id"] if items else None
+
+    return probe
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Bounded LRU of checkpoint tuples in front of another saver, filled on `put`
+    (and on read misses). A checkpoint id never changes content, so reads by id
+    are served from the cache as-is. Its pending writes do change: `put_writes`
+    evicts the entry, so the next read loads them from the store.
+
+    Reads of the *latest* checkpoint must not trust a local entry, because
+    another worker may have written a newer checkpoint for the thread since. They
+    first ask `probe(thread_id)` for the newest checkpoint id in the store; only
+    if that id is cached is the full read skipped. Without a probe, latest reads
+    always go to the wrapped saver.
+
+    Entries are stored serialized, so callers never share mutable state.
+    """
+
+    def __init__(
+        self,
+        inner: BaseCheckpointSaver,
+        max_entries: int = 256,
+        probe: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> None:
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.max_entries = max_entries
+        self.probe = probe
+        self._put_writes = forward_task_path(inner.put_writes)
+        self._aput_writes = forward_task_path(inner.aput_writes)
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._lookups = REGISTRY.counter("checkpoint_cache_lookups_total", "Checkpoint cache lookups by kind and result")
+        self._size = REGISTRY.gauge("checkpoint_cache_entries", "Checkpoints held in the read-through cache")
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    # ---- cache plumbing ----
+    def _store(self, tup: CheckpointTuple) -> None:
+        configurable = tup.config["configurable"]
+        key = (configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        entry = (
+            tup.config,
+            self.serde.dumps_typed(tup.checkpoint),
+            self.serde.dumps_typed(tup.metadata),
+            tup.parent_config,
+            [(task_id, channel, self.serde.dumps_typed(value)) for task_id, channel, value in tup.pending_writes or []],
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._size.set(len(self._entries))
+
+    def _load(self, key: CacheKey) -> Optional[CheckpointTuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        config, checkpoint, metadata, parent_config, writes = entry
+        return CheckpointTuple(
+            config=config,
+            checkpoint=self.serde.loads_typed(checkpoint),
+            metadata=self.serde.loads_typed(metadata),
+            parent_config=parent_config,
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value in writes],
+        )
+
+    # ---- reads ----
+    def _lookup(self, config: RunnableConfig) -> Tuple[bool, Optional[CheckpointTuple]]:
+        """(True, tuple) when the cache (or probe) answers the read, (False, None) on a miss."""
+        thread_id, checkpoint_ns = _thread_key(config)
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        kind = "by_id" if checkpoint_id else "latest"
+
+        if not checkpoint_id and self.probe is not None and not checkpoint_ns:
+            checkpoint_id = self.probe(thread_id)
+            if checkpoint_id is None:
+                self._lookups.inc(kind=kind, result="empty")
+                return True, None
+
+        if checkpoint_id:
+            cached = self._load((thread_id, checkpoint_ns, checkpoint_id))
+            if cached is not None:
+                self._lookups.inc(kind=kind, result="hit")
+                return True, cached
+
+        self._lookups.inc(kind=kind, result="miss")
+        return False, None
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        answered, tup = self._lookup(config)
+        if not answered:
+            tup = self.inner.get_tuple(config)
+            if tup is not None:
+                self._store(tup)
+        return tup
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    # ---- writes (write-through) ----
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = self.inner.put(config, checkpoint, metadata, new_versions)
+        self._store_put(config, saved, checkpoint, metadata)
+        return saved
+
+    def _store_put(self, config: RunnableConfig, saved: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> None:
+        parent_id = config.get("configurable", {}).get("checkpoint_id")
+        self._store(CheckpointTuple(
+            config=saved,
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=config if parent_id else None,
+            pending_writes=[],
+        ))
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._put_writes(config, writes, task_id, task_path)
+        self._evict(config)
+
+    def _evict(self, config: RunnableConfig) -> None:
+        thread_id, checkpoint_ns = _thread_key(config)
+        key = (thread_id, checkpoint_ns, config["configurable"].get("checkpoint_id"))
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._size.set(len(self._entries))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._forget_thread(thread_id)
+        self.inner.delete_thread(thread_id)
+
+    def _forget_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == thread_id]:
+                del self._entries[key]
+            self._size.set(len(self._entries))
+
+    # ---- async ----
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        # the probe is a blocking DynamoDB read
+        answered, tup = await asyncio.to_thread(self._lookup, config) if self.probe is not None else self._lookup(config)
+        if not answered:
+            tup = await self.inner.aget_tuple(config)
+            if tup is not None:
+                self._store(tup)
+        return tup
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for tup in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield tup
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = await self.inner.aput(config, checkpoint, metadata, new_versions)
+        self._store_put(config, saved, checkpoint, metadata)
+        return saved
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._aput_writes(config, writes, task_id, task_path)
+        self._evict(config)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._forget_thread(thread_id)
+        await self.inner.adelete_thread(thread_id)
@@ -0,0 +1,58 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers that ask for the same key share one execution: the first
+caller (the leader) runs the work, everyone arriving while it is in flight
+awaits the same result. Nothing is cached once the leader finishes.
+"""
+import asyncio
+import re
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from langchain_impl.metrics import REGISTRY, Registry
+
+T = TypeVar("T")
+
+
+def normalize_question(text: str) -> str:
+    """Case/whitespace-insensitive form of a question, used as the coalescing key."""
+    collapsed = re.sub(r"\s+", " ", text).strip().casefold()
+    return collapsed.rstrip("?!. ")
+
+
+def _consume_exception(fut: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" warnings when nobody was left waiting
+    if not fut.cancelled():
+        fut.exception()
+
+
+class SingleFlight:
+    def __init__(self, registry: Registry = REGISTRY) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leaders = registry.counter("chat_singleflight_leaders_total", "Coalescable requests that ran the graph")
+        self._coalesced = registry.counter("chat_coalesced_requests_total", "Requests served by another request's graph run")
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return (result, shared); `shared` is True when another caller did the work."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self._coalesced.inc()
+        else:
+            async def run() -> T:
+                try:
+                    return await fn()
+                finally:
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+
+            # the work is a task of its own, not part of the leader's request
+            task = asyncio.ensure_future(run())
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+            self._leaders.inc()
+        # shield: any caller giving up, the leader included, leaves the run to the others
+        return await asyncio.shield(task), shared
@@ -0,0 +1,350 @@
+"""
+Retention and compaction for the DynamoDB checkpoint tables.
+
+DynamoDBSaver never deletes anything: every step of every turn leaves a full
+checkpoint (and its pending writes) behind. This keeps the newest `keep_last`
+checkpoints of each thread/namespace and
+
+  * deletes the older ones, or with `ttl_seconds` sets a TTL attribute on them
+    so DynamoDB expires them (TTL must be enabled on that attribute in IaC);
+  * deletes/expires the pending writes of those checkpoints;
+  * deletes orphaned writes, i.e. writes whose checkpoint no longer exists
+    (a paged scan of the writes table, at most --orphan-scan-limit items per
+    run; the report says where the next run should resume).
+
+Run it as a job:
+
+    python -m langchain_impl.compaction --keep-last 5 [--thread-id ID] [--ttl-seconds 86400] [--dry-run]
+        [--orphan-scan-limit 10000] [--orphan-scan-from '<resume key JSON>']
+
+Table names default to CHECKPOINTS_TABLE / WRITES_TABLE.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+SEPARATOR = ":::"  # langgraph_checkpoint_dynamodb.write.Write.separator
+WRITES_PK = "thread_id_checkpoint_id_checkpoint_ns"
+WRITES_SK = "task_id_idx"
+ORPHAN_SCAN_PAGE = 500
+BATCH_GET_MAX_KEYS = 100
+
+
+@dataclass
+class CompactionStats:
+    threads: int = 0
+    checkpoints_scanned: int = 0
+    checkpoints_deleted: int = 0
+    checkpoints_expiring: int = 0
+    writes_deleted: int = 0
+    writes_expiring: int = 0
+    orphaned_writes_deleted: int = 0
+    bytes_reclaimed: int = 0
+    bytes_expiring: int = 0
+    orphan_writes_scanned: int = 0
+    # LastEvaluatedKey to pass as `start_key` to the next orphan scan; None once the table was covered
+    orphan_scan_resume_key: Optional[Dict[str, Any]] = None
+    # thread_id -> {"latest_ms": ..., "history_ms": ...}
+    hydration_before: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    hydration_after: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    """Approximate DynamoDB item size: attribute names plus values, as DynamoDB bills them."""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode())
+        if isinstance(value, str):
+            size += len(value.encode())
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif hasattr(value, "value") and isinstance(value.value, (bytes, bytearray)):  # boto3 Binary
+            size += len(value.value)
+        elif isinstance(value, (int, float, Decimal)):
+            size += len(str(value)) // 2 + 1
+        else:
+            size += len(str(value).encode())
+    return size
+
+
+def writes_partition_key(thread_id: str, checkpoint_id: str, checkpoint_ns: str) -> str:
+    return SEPARATOR.join([thread_id, checkpoint_id, checkpoint_ns])
+
+
+def _paginate(call, **kwargs) -> Iterator[Dict[str, Any]]:
+    while True:
+        page = call(**kwargs)
+        yield from page.get("Items", [])
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+class CheckpointCompactor:
+    def __init__(
+        self,
+        checkpoints_table: str,
+        writes_table: str,
+        keep_last: int = 5,
+        ttl_seconds: Optional[int] = None,
+        ttl_attribute: str = "expires_at",
+        dry_run: bool = False,
+        dynamodb=None,
+    ) -> None:
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        dynamodb = dynamodb or boto3.resource("dynamodb")
+        self.dynamodb = dynamodb
+        self.checkpoints = dynamodb.Table(checkpoints_table)
+        self.writes = dynamodb.Table(writes_table)
+        self.keep_last = keep_last
+        self.ttl_seconds = ttl_seconds
+        self.ttl_attribute = ttl_attribute
+        self.dry_run = dry_run
+
+    # ---- discovery ----
+    def thread_ids(self) -> List[str]:
+        seen: Set[str] = set()
+        for item in _paginate(self.checkpoints.scan, ProjectionExpression="thread_id"):
+            seen.add(item["thread_id"])
+        return sorted(seen)
+
+    def _thread_checkpoints(self, thread_id: str) -> List[Dict[str, Any]]:
+        # Full items: we need their size, and this is a batch job
+        return list(_paginate(
+            self.checkpoints.query,
+            KeyConditionExpression=Key("thread_id").eq(thread_id),
+            ScanIndexForward=False,
+        ))
+
+    def _checkpoint_writes(self, thread_id: str, checkpoint_id: str, checkpoint_ns: str) -> List[Dict[str, Any]]:
+        return list(_paginate(
+            self.writes.query,
+            KeyConditionExpression=Key(WRITES_PK).eq(writes_partition_key(thread_id, checkpoint_id, checkpoint_ns)),
+        ))
+
+    # ---- hydration timing ----
+    def measure_hydration(self, thread_id: str, repeats: int = 3) -> Dict[str, float]:
+        """Median ms to load the latest checkpoint (what a turn does) and the thread's whole history."""
+        latest, history = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            self.checkpoints.query(
+                KeyConditionExpression=Key("thread_id").eq(thread_id),
+                ScanIndexForward=False,
+                Limit=1,
+                ConsistentRead=True,
+            )
+            latest.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            self._thread_checkpoints(thread_id)
+            history.append((time.perf_counter() - started) * 1000)
+        return {"latest_ms": statistics.median(latest), "history_ms": statistics.median(history)}
+
+    # ---- compaction ----
+    def _retire(self, table, key: Dict[str, Any], batch) -> bool:
+        """Delete or expire one item; returns True if it was deleted."""
+        if self.dry_run:
+            return self.ttl_seconds is None
+        if self.ttl_seconds is None:
+            batch.delete_item(Key=key)
+            return True
+        table.update_item(
+            Key=key,
+            UpdateExpression="SET #ttl = :expires",
+            ExpressionAttributeNames={"#ttl": self.ttl_attribute},
+            ExpressionAttributeValues={":expires": int(time.time()) + self.ttl_seconds},
+        )
+        return False
+
+    def compact_thread(self, thread_id: str, stats: Optional[CompactionStats] = None) -> CompactionStats:
+        stats = stats or CompactionStats()
+        stats.threads += 1
+
+        items = self._thread_checkpoints(thread_id)
+        stats.checkpoints_scanned += len(items)
+
+        by_ns: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            by_ns.setdefault(item.get("checkpoint_ns", ""), []).append(item)
+
+        superseded: List[Dict[str, Any]] = []
+        for ns_items in by_ns.values():
+            # checkpoint ids are time-ordered (uuid6), newest first
+            ns_items.sort(key=lambda it: it["checkpoint_id"], reverse=True)
+            superseded.extend(
+                it for it in ns_items[self.keep_last:]
+                if self.ttl_seconds is None or self.ttl_attribute not in it
+            )
+
+        with self.checkpoints.batch_writer() as cp_batch, self.writes.batch_writer() as w_batch:
+            for item in superseded:
+                ns = item.get("checkpoint_ns", "")
+                for write in self._checkpoint_writes(thread_id, item["checkpoint_id"], ns):
+                    key = {WRITES_PK: write[WRITES_PK], WRITES_SK: write[WRITES_SK]}
+                    if self._retire(self.writes, key, w_batch):
+                        stats.writes_deleted += 1
+                        stats.bytes_reclaimed += item_size(write)
+                    else:
+                        stats.writes_expiring += 1
+                        stats.bytes_expiring += item_size(write)
+
+                key = {"thread_id": thread_id, "checkpoint_id": item["checkpoint_id"]}
+                if self._retire(self.checkpoints, key, cp_batch):
+                    stats.checkpoints_deleted += 1
+                    stats.bytes_reclaimed += item_size(item)
+                else:
+                    stats.checkpoints_expiring += 1
+                    stats.bytes_expiring += item_size(item)
+        return stats
+
+    def _existing_checkpoints(self, keys: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """Which (thread_id, checkpoint_id) exist right now: consistent BatchGetItem, 100 keys a call."""
+        found: Set[Tuple[str, str]] = set()
+        for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+            request: Optional[Dict[str, Any]] = {self.checkpoints.name: {
+                "Keys": [{"thread_id": t, "checkpoint_id": c} for t, c in keys[start:start + BATCH_GET_MAX_KEYS]],
+                "ProjectionExpression": "thread_id, checkpoint_id",
+                "ConsistentRead": True,
+            }}
+            while request:
+                resp = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in resp["Responses"].get(self.checkpoints.name, []):
+                    found.add((item["thread_id"], item["checkpoint_id"]))
+                request = resp.get("UnprocessedKeys") or None
+        return found
+
+    def prune_orphaned_writes(
+        self,
+        thread_ids: Iterable[str],
+        stats: Optional[CompactionStats] = None,
+        max_scanned: Optional[int] = None,
+        start_key: Optional[Dict[str, Any]] = None,
+    ) -> CompactionStats:
+        """
+        Delete writes of `thread_ids` whose checkpoint is gone.
+
+        Pages through the writes table (from `start_key`, at most `max_scanned`
+        items) and, per page, re-reads the checkpoints of the candidate writes
+        before deleting them. A write is only stored once its checkpoint is, so
+        a checkpoint missing at that point is gone for good: writes of
+        checkpoints created while the scan runs are never taken for orphans.
+        """
+        stats = stats or CompactionStats()
+        thread_ids = set(thread_ids)
+        kwargs: Dict[str, Any] = {"ExclusiveStartKey": start_key} if start_key else {}
+        scanned = 0
+        resume_key = None
+
+        with self.writes.batch_writer() as batch:
+            while max_scanned is None or scanned < max_scanned:
+                limit = ORPHAN_SCAN_PAGE if max_scanned is None else min(ORPHAN_SCAN_PAGE, max_scanned - scanned)
+                page = self.writes.scan(Limit=limit, **kwargs)
+                items = page.get("Items", [])
+                scanned += len(items)
+
+                candidates: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+                for write in items:
+                    thread_id, checkpoint_id, _ = write[WRITES_PK].split(SEPARATOR, 2)
+                    if thread_id in thread_ids:
+                        candidates.setdefault((thread_id, checkpoint_id), []).append(write)
+                live = self._existing_checkpoints(list(candidates))
+                for checkpoint, writes in candidates.items():
+                    if checkpoint in live:
+                        continue
+                    for write in writes:
+                        if not self.dry_run:
+                            batch.delete_item(Key={WRITES_PK: write[WRITES_PK], WRITES_SK: write[WRITES_SK]})
+                        stats.orphaned_writes_deleted += 1
+                        stats.bytes_reclaimed += item_size(write)
+
+                resume_key = page.get("LastEvaluatedKey")
+                if resume_key is None:
+                    break
+                kwargs["ExclusiveStartKey"] = resume_key
+
+        stats.orphan_writes_scanned += scanned
+        stats.orphan_scan_resume_key = resume_key
+        return stats
+
+    def run(
+        self,
+        thread_ids: Optional[List[str]] = None,
+        prune_orphans: bool = True,
+        measure_threads: int = 3,
+        orphan_scan_limit: Optional[int] = None,
+        orphan_scan_from: Optional[Dict[str, Any]] = None,
+    ) -> CompactionStats:
+        thread_ids = thread_ids or self.thread_ids()
+        sample = thread_ids[:measure_threads]
+
+        stats = CompactionStats()
+        stats.hydration_before = {t: self.measure_hydration(t) for t in sample}
+        for thread_id in thread_ids:
+            self.compact_thread(thread_id, stats)
+        if prune_orphans:
+            self.prune_orphaned_writes(thread_ids, stats, max_scanned=orphan_scan_limit, start_key=orphan_scan_from)
+        stats.hydration_after = {t: self.measure_hydration(t) for t in sample}
+        return stats
+
+
+def format_report(stats: CompactionStats) -> str:
+    lines = [f"{k}: {v}" for k, v in asdict(stats).items() if not k.startswith("hydration_")]
+    for thread_id, before in stats.hydration_before.items():
+        after = stats.hydration_after.get(thread_id, {})
+        lines.append(
+            f"hydration[{thread_id}]: latest {before['latest_ms']:.1f} -> {after.get('latest_ms', 0):.1f} ms, "
+            f"history {before['history_ms']:.1f} -> {after.get('history_ms', 0):.1f} ms"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Prune old LangGraph checkpoints from DynamoDB.")
+    parser.add_argument("--checkpoints-table", default=os.getenv("CHECKPOINTS_TABLE"))
+    parser.add_argument("--writes-table", default=os.getenv("WRITES_TABLE"))
+    parser.add_argument("--keep-last", type=int, default=int(os.getenv("CHECKPOINT_KEEP_LAST", "5")))
+    parser.add_argument("--thread-id", action="append", help="Compact only these threads (repeatable)")
+    parser.add_argument("--ttl-seconds", type=int, help="Expire superseded items via TTL instead of deleting")
+    parser.add_argument("--ttl-attribute", default=os.getenv("CHECKPOINT_TTL_ATTRIBUTE", "expires_at"))
+    parser.add_argument("--no-orphans", action="store_true", help="Skip the orphaned-writes scan")
+    parser.add_argument("--orphan-scan-limit", type=int, help="Scan at most this many writes for orphans per run")
+    parser.add_argument("--orphan-scan-from", type=json.loads, help="Resume key printed by the previous run (JSON)")
+    parser.add_argument("--measure-threads", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.checkpoints_table or not args.writes_table:
+        parser.error("set --checkpoints-table/--writes-table or CHECKPOINTS_TABLE/WRITES_TABLE")
+
+    compactor = CheckpointCompactor(
+        args.checkpoints_table,
+        args.writes_table,
+        keep_last=args.keep_last,
+        ttl_seconds=args.ttl_seconds,
+        ttl_attribute=args.ttl_attribute,
+        dry_run=args.dry_run,
+    )
+    stats = compactor.run(
+        args.thread_id,
+        prune_orphans=not args.no_orphans,
+        measure_threads=args.measure_threads,
+        orphan_scan_limit=args.orphan_scan_limit,
+        orphan_scan_from=args.orphan_scan_from,
+    )
+    print(format_report(stats))
+    if stats.orphan_scan_resume_key:
+        print(f"orphan scan incomplete, resume with --orphan-scan-from '{json.dumps(stats.orphan_scan_resume_key)}'")
+
+
+if __name__ == "__main__":
+    main()
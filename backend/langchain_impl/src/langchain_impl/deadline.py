@@ -0,0 +1,145 @@
+"""
+Per-request deadline and latency-budget-aware degradation.
+
+The server stamps every turn with an absolute deadline (`with_deadline`,
+CHAT_DEADLINE_S from the start of the request, queueing included). It travels
+in `config["configurable"]["__deadline"]` (the dunder keeps it out of the
+checkpoint metadata), so graph nodes and tools read the time left with
+`remaining()` without any change to their signatures.
+
+Stage budgets are derived from what is left:
+
+  router     remaining - GENERATE_RESERVE_S. Below ROUTER_MIN_S the router is
+             skipped (generate answers from `_fallback_docs`); a router call
+             that times out is dropped the same way.
+  retrieval  below LOW_BUDGET_S, `k` is halved. The query embedding times out
+             with the deadline (`DeadlineEmbeddings`).
+  generate   below LOW_BUDGET_S, only the last LOW_BUDGET_MESSAGES messages of
+             the conversation are sent. The call times out with the deadline.
+
+Timeouts are passed to the OpenAI client as the request `timeout` (`with_timeout`),
+so a call that runs out of budget is cancelled rather than left running. The
+client's own retries (max_retries) each get that timeout again.
+
+Every degradation increments `chat_degradations_total{kind=...}`.
+"""
+import inspect
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, TypeVar
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from langchain_impl.metrics import REGISTRY
+
+T = TypeVar("T")
+
+DEADLINE_KEY = "__deadline"
+
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "30"))
+GENERATE_RESERVE_S = float(os.getenv("GENERATE_RESERVE_S", "8"))
+ROUTER_MIN_S = float(os.getenv("ROUTER_MIN_S", "1"))
+LOW_BUDGET_S = float(os.getenv("LOW_BUDGET_S", "10"))
+LOW_BUDGET_MESSAGES = int(os.getenv("LOW_BUDGET_MESSAGES", "4"))
+# floor for a call's timeout, so a spent budget fails fast instead of sending timeout=0
+MIN_TIMEOUT_S = 0.05
+
+DEGRADATIONS = REGISTRY.counter("chat_degradations_total", "Turns degraded to meet their deadline, by kind")
+
+
+def with_deadline(config: RunnableConfig, seconds: Optional[float] = None) -> RunnableConfig:
+    """Copy of `config` carrying a deadline `seconds` from now (CHAT_DEADLINE_S; <= 0 disables)."""
+    seconds = CHAT_DEADLINE_S if seconds is None else seconds
+    if seconds <= 0:
+        return config
+    configurable = {**config.get("configurable", {}), DEADLINE_KEY: time.monotonic() + seconds}
+    return RunnableConfig({**config, "configurable": configurable})
+
+
+def remaining(config: Optional[RunnableConfig] = None) -> float:
+    """Seconds left before the deadline of `config` (default: the running graph's); inf without one."""
+    if config is None:
+        from langgraph.config import get_config
+
+        try:
+            config = get_config()
+        except RuntimeError:  # called outside a graph run
+            return math.inf
+    deadline = (config.get("configurable") or {}).get(DEADLINE_KEY)
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
+def degrade(kind: str) -> None:
+    DEGRADATIONS.inc(kind=kind)
+
+
+def router_budget() -> float:
+    """Time the router may take and still leave GENERATE_RESERVE_S for generate."""
+    return remaining() - GENERATE_RESERVE_S
+
+
+def low_budget() -> bool:
+    return remaining() < LOW_BUDGET_S
+
+
+def retrieval_k(k: int) -> int:
+    if low_budget() and k > 1:
+        degrade("reduced_k")
+        return max(1, k // 2)
+    return k
+
+
+def trim_context(messages: List[T]) -> List[T]:
+    if low_budget() and len(messages) > LOW_BUDGET_MESSAGES:
+        degrade("short_context")
+        return messages[-LOW_BUDGET_MESSAGES:]
+    return messages
+
+
+def timeout_kwargs(budget: Optional[float] = None) -> Dict[str, Any]:
+    """{"timeout": seconds} for a call that must finish within `budget` (default: what is left); {} without a deadline."""
+    budget = remaining() if budget is None else budget
+    return {} if math.isinf(budget) else {"timeout": max(budget, MIN_TIMEOUT_S)}
+
+
+def with_timeout(runnable: Runnable, budget: Optional[float] = None) -> Runnable:
+    """`runnable` with its request timeout bound to `budget` (ChatOpenAI passes it to the client)."""
+    kwargs = timeout_kwargs(budget)
+    return runnable.bind(**kwargs) if kwargs else runnable
+
+
+def timed_out(error: BaseException) -> bool:
+    """A TimeoutError, or the OpenAI client's APITimeoutError (openai is only imported with the client)."""
+    if isinstance(error, TimeoutError):
+        return True
+    try:
+        from openai import APITimeoutError
+    except ImportError:
+        return False
+    return isinstance(error, APITimeoutError)
+
+
+class DeadlineEmbeddings(Embeddings):
+    """Passes the time left before the running graph's deadline to the embedding client as its timeout."""
+
+    def __init__(self, inner: Embeddings) -> None:
+        self.inner = inner
+        parameters = inspect.signature(inner.embed_query).parameters.values()
+        self._takes_timeout = any(p.kind is p.VAR_KEYWORD or p.name == "timeout" for p in parameters)
+
+    def _kwargs(self) -> Dict[str, Any]:
+        return timeout_kwargs() if self._takes_timeout else {}
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text, **self._kwargs())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts, **self._kwargs())
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.inner.aembed_query(text, **self._kwargs())
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.aembed_documents(texts, **self._kwargs())
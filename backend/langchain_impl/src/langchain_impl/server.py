@@ -1,13 +1,19 @@
 import os
-from typing import List, Literal, Optional
+import asyncio
+import json
+import logging
+import math
+import secrets
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Tuple
 from uuid import uuid4
-import uvicorn
 
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, ValidationError
-from dotenv import load_dotenv, find_dotenv
-load_dotenv(find_dotenv(usecwd=True))  # loads the repo-root .env reliably
 
 from langchain_core.messages import (
     HumanMessage,
@@ -18,26 +24,36 @@ from langchain_core.messages import (
 )
 
 from langchain_core.runnables import RunnableConfig
-
-# ---- Local config (do NOT import these from app.py) ----
-AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-CHECKPOINTS_TABLE = os.getenv("CHECKPOINTS_TABLE", "lmai-checkpoints-langchain")
+from langgraph.graph.state import CompiledStateGraph
 
 # Import graph + shared components from app.py
 from langchain_impl.app import (
     build_graph,
-    vector_store,
+    get_vector_store,
+    load_env,
     sanitize_messages,   # orphan-tool cleaner
+    stream_answer,
+    turn_sources,
 )
 
-from langchain_impl.web_scrape import fetch_documentation, split_document
+from langchain_impl.admission import AdmissionController, AdmissionRejected
+from langchain_impl.checkpointers import flush_checkpoints
+from langchain_impl.coalesce import SingleFlight, normalize_question
+from langchain_impl.deadline import with_deadline
+from langchain_impl.metrics import REGISTRY
+from langchain_impl.snapshots import SnapshotStore
+from langchain_impl.tracing import configure_logging, log_event, sampled
+from langchain_impl.usage import request_usage
 
+load_env()  # loads the repo-root .env reliably
+configure_logging()
+
+# ---- Local config (do NOT import these from app.py) ----
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+CHECKPOINTS_TABLE = os.getenv("CHECKPOINTS_TABLE", "lmai-checkpoints-langchain")
 
-# ---------- Env ----------
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Set OPENAI_API_KEY in your environment.")
+# ---------- Env ----------
 
 # allow comma-separated CORS origins: "http://localhost:5173,https://app.example.com"
 _frontend_origins = os.getenv(
@@ -46,18 +62,116 @@ _frontend_origins = os.getenv(
 )
 ALLOWED_ORIGINS = [o.strip() for o in _frontend_origins.split(",") if o.strip()]
 
+DOCS_URL = "https://api.content.lesmills.com/docs/v1/content-portal-api.yaml"
+# Set INDEX_ON_STARTUP=false when the store is populated some other way
+INDEX_ON_STARTUP = os.getenv("INDEX_ON_STARTUP", "true").lower() == "true"
+
 
-# ---------- (DEV) Index docs at import ----------
+# ---------- (DEV) Index docs at startup ----------
 # For production, pre-index in your vector DB instead of doing this at startup.
-document = fetch_documentation(
-    "https://api.content.lesmills.com/docs/v1/content-portal-api.yaml"
-)
-splits = split_document(document)
-vector_store.add_documents(splits)
+def load_documentation() -> List[Any]:
+    # web_scrape pulls in langchain_community; only load it when we actually index
+    from langchain_impl.web_scrape import fetch_documentation, split_document
+
+    document = fetch_documentation(DOCS_URL)
+    return split_document(document)
+
+
+def index_documentation() -> None:
+    store = get_vector_store()
+    if isinstance(store, SnapshotStore):
+        # max_age=inf: with a shared index only the first worker builds, the rest attach
+        store.rebuild(load_documentation, max_age=float("inf"))
+    else:
+        store.add_documents(load_documentation())
+
+
+# ---------- Index refresh ----------
+# POST /admin/reindex (X-Admin-Token: $ADMIN_TOKEN) or every INDEX_REFRESH_INTERVAL_S
+# seconds: build a new index snapshot in the background and swap it in atomically.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+INDEX_REFRESH_INTERVAL_S = float(os.getenv("INDEX_REFRESH_INTERVAL_S", "0"))
+
+
+def index_version() -> Optional[str]:
+    store = get_vector_store()
+    return store.version if isinstance(store, SnapshotStore) else None
+
+
+def reindex_in_background() -> None:
+    try:
+        get_vector_store().rebuild(load_documentation)
+        log_event("reindex.done", index_version=index_version())
+    except Exception as e:
+        log_event("reindex.error", level=logging.ERROR, error=f"{type(e).__name__}: {e}")
+
+
+async def refresh_index_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # half the interval: the index is due on every tick, but not twice per tick across workers
+            await run_in_threadpool(get_vector_store().refresh, load_documentation, interval / 2)
+        except Exception as e:
+            log_event("refresh_index.error", level=logging.ERROR, error=f"{type(e).__name__}: {e}")
+
+
+# ---------- Admission control ----------
+# Bounds concurrent turns (CHAT_MAX_CONCURRENCY) with a bounded wait queue (CHAT_MAX_QUEUE,
+# CHAT_QUEUE_TIMEOUT_S); overflow is rejected fast with Retry-After (CHAT_RETRY_AFTER_S).
+admission = AdmissionController.from_env()
+
+
+def rejection_to_http(rejected: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=rejected.status_code,
+        detail="Server is busy, please retry shortly.",
+        headers={"Retry-After": str(math.ceil(rejected.retry_after))},
+    )
+
+
+# ---------- Request coalescing ----------
+# Identical first-turn questions arriving together share one graph run (CHAT_COALESCE=false disables)
+COALESCE_FIRST_TURNS = os.getenv("CHAT_COALESCE", "true").lower() == "true"
+flights = SingleFlight()
+
+
+# ---------- Checkpoint persistence ----------
+# With CHECKPOINTER_BACKEND=dynamodb-buffered a turn is persisted once, at its end:
+# "sync" before the response is returned, "async" after it has been sent
+# (see BufferedCheckpointSaver for what a crash in between means).
+CHECKPOINT_FLUSH = os.getenv("CHECKPOINT_FLUSH", "sync").lower()
 
 
 # ---------- Graph ----------
-graph = build_graph()  # compiled with DynamoDB checkpointer + shared store
+# Compiled on first use (or during startup) with the configured checkpointer + shared store
+graph: CompiledStateGraph | None = None
+
+
+def get_graph() -> CompiledStateGraph:
+    global graph
+    if graph is None:
+        graph = build_graph()
+    return graph
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Do the expensive setup once the worker starts, not when the module is imported."""
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("Set OPENAI_API_KEY in your environment.")
+    if INDEX_ON_STARTUP:
+        await run_in_threadpool(index_documentation)
+    get_graph()
+
+    refresher = None
+    if INDEX_REFRESH_INTERVAL_S > 0 and isinstance(get_vector_store(), SnapshotStore):
+        refresher = asyncio.create_task(refresh_index_periodically(INDEX_REFRESH_INTERVAL_S))
+    try:
+        yield
+    finally:
+        if refresher:
+            refresher.cancel()
 
 
 # We don’t use LangChain’s message objects here.
@@ -73,25 +187,32 @@ class Message(BaseModel):
     # Optional fields if you ever pass tool results from the client
     tool_call_id: Optional[str] = None
     name: Optional[str] = None
+    # Client-generated id; lets the server drop messages the session already has
+    id: Optional[str] = None
 
 
 class ChatRequest(BaseModel):
     # If client omits session_id, we create a fresh one (stateless by default)
     session_id: Optional[str] = None
     messages: List[Message]
+    # "full": messages is the whole conversation (legacy; the checkpoint grows with every resend)
+    # "delta": messages holds only what is new since the last turn of session_id
+    mode: Literal["full", "delta"] = "full"
+    # add {"usage": {"turn": ..., "session": ...}} (tokens and cost) to the reply
+    include_usage: bool = False
 
 
 # ---------- Helpers ----------
 def to_lc_message(m: Message) -> AnyMessage:
     if m.role == "user":
-        return HumanMessage(content=m.content)
+        return HumanMessage(content=m.content, id=m.id)
     if m.role == "assistant":
-        return AIMessage(content=m.content)
+        return AIMessage(content=m.content, id=m.id)
     if m.role == "system":
-        return SystemMessage(content=m.content)
+        return SystemMessage(content=m.content, id=m.id)
     if m.role == "tool":
         # Only meaningful if client ever sends tool outputs; harmless otherwise
-        return ToolMessage(content=m.content, tool_call_id=m.tool_call_id or "client_tool")
+        return ToolMessage(content=m.content, tool_call_id=m.tool_call_id or "client_tool", id=m.id)
     raise ValueError(f"Unsupported role: {m.role}")
 
 
@@ -99,8 +220,189 @@ def new_thread_id(prefix: str = "web") -> str:
     return f"{prefix}-{uuid4()}"
 
 
+# Fixed id: the add_messages reducer replaces a message with a known id in place,
+# so re-sending the nudge never stacks another copy onto the thread.
+ROUTING_NUDGE_ID = "routing-nudge"
+
+
+def routing_nudge() -> SystemMessage:
+    # Prepended so the first turn reliably calls `retrieve`
+    return SystemMessage(
+        "Routing: For questions about Les Mills, the Content Portal, APIs, integrations, "
+        "platform, engineering, or operations, you MUST call the `retrieve` tool first. "
+        "Only skip tools if clearly unrelated.",
+        id=ROUTING_NUDGE_ID,
+    )
+
+
+def prepare_turn(req: ChatRequest) -> Tuple[str, RunnableConfig, List[AnyMessage]]:
+    """
+    Resolve the session and build the message list handed to the graph.
+    In delta mode for an existing session, messages whose id is already in the
+    checkpoint are dropped and the routing nudge is only added to new threads.
+    Blocking (may read the checkpoint); call it from the threadpool.
+    """
+    # Fresh stateless session unless the client explicitly wants continuity
+    session_id = req.session_id or new_thread_id("web")
+    # CHAT_DEADLINE_S from now, queueing included; the graph degrades as it runs low (see deadline)
+    config = with_deadline(RunnableConfig({"configurable": {"thread_id": session_id}}))
+
+    # Convert inbound payload into LC messages and clean stray tool messages
+    lc_messages = [to_lc_message(m) for m in req.messages]
+    cleaned = sanitize_messages(lc_messages)
+
+    if req.mode == "delta" and req.session_id:
+        existing = get_graph().get_state(config).values.get("messages", [])
+        if existing:
+            known_ids = {m.id for m in existing}
+            new_messages = [m for m in cleaned if m.id is None or m.id not in known_ids]
+            if not new_messages:
+                raise HTTPException(status_code=409, detail="All messages were already processed for this session.")
+            return session_id, config, new_messages
+
+    return session_id, config, [routing_nudge()] + cleaned
+
+
+def request_fields(session_id: str, messages_for_graph: List[AnyMessage]) -> Dict[str, Any]:
+    last = messages_for_graph[-1] if messages_for_graph else None
+    return {
+        "thread_id": session_id,
+        "region": AWS_REGION,
+        "table": CHECKPOINTS_TABLE,
+        "messages": len(messages_for_graph),
+        "roles": [getattr(m, "type", None) for m in messages_for_graph],
+        "last_preview": str(getattr(last, "content", "") or "")[:120],
+    }
+
+
+def run_turn(config: RunnableConfig, messages_for_graph: List[AnyMessage]) -> Dict[str, Any]:
+    """Run one turn to completion (blocking) and return the thread's final state values."""
+    state: Dict[str, Any] = {"messages": []}
+
+    # Stream using the full message list; checkpointer will hydrate prior state (if any)
+    for step in get_graph().stream(
+        {"messages": messages_for_graph},
+        stream_mode="values",
+        config=config,
+    ):
+        state = step
+    return state
+
+
+async def admitted_turn(config: RunnableConfig, messages_for_graph: List[AnyMessage]) -> Dict[str, Any]:
+    # The graph is blocking; run it off the event loop so admitted turns overlap
+    async with admission.admit():
+        return await run_in_threadpool(run_turn, config, messages_for_graph)
+
+
+def coalescing_key(req: ChatRequest) -> Optional[str]:
+    """Key for stateless first turns (no session, a single user message); None otherwise."""
+    if not COALESCE_FIRST_TURNS or req.session_id:
+        return None
+    if len(req.messages) != 1 or req.messages[0].role != "user":
+        return None
+    return normalize_question(req.messages[0].content) or None
+
+
+def adopt_turn(config: RunnableConfig, messages_for_graph: List[AnyMessage], leader_state: Dict[str, Any]) -> List[AnyMessage]:
+    """
+    Write a checkpoint for a coalesced request's own thread: its own input followed by
+    the messages the leader's run produced, and the leader's usage records and turn
+    counter, as if this thread had run the turn itself. (Only first turns coalesce:
+    the leader's whole ledger is that one turn.)
+    """
+    produced = leader_state["messages"][len(messages_for_graph):]
+    messages = messages_for_graph + produced
+    get_graph().update_state(
+        config,
+        {"messages": messages, "usage": leader_state.get("usage", []), "turn": leader_state.get("turn", 1)},
+        as_node="generate",
+    )
+    return messages
+
+
+def session_usage(config: RunnableConfig) -> Dict[str, Any]:
+    """Token usage of the thread's latest turn and of the whole session, from its checkpoint."""
+    return request_usage(get_graph().get_state(config).values.get("usage", []))
+
+
+def persist_turn(config: RunnableConfig) -> None:
+    """Write the thread's buffered checkpoint (no-op for unbuffered checkpointers)."""
+    flush_checkpoints(get_graph().checkpointer, config)
+
+
+def persist_turn_in_background(config: RunnableConfig) -> None:
+    try:
+        persist_turn(config)
+    except Exception as e:
+        log_event(
+            "persist_turn.error", level=logging.ERROR,
+            thread_id=config["configurable"]["thread_id"], error=f"{type(e).__name__}: {e}",
+        )
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse holding an admission slot. The body releases it when it ends;
+    this releases it too when the body never starts (the client went away first).
+    """
+
+    def __init__(self, content: Any, release: Callable[[], None], **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_chat_events(
+    session_id: str,
+    config: RunnableConfig,
+    messages_for_graph: List[AnyMessage],
+    include_usage: bool = False,
+) -> Iterator[str]:
+    """
+    SSE body for /api/chat/stream: one `token` event per generated chunk, then a
+    closing `end` event carrying the session id, the full reply and its sources
+    (and the token usage with `include_usage`).
+    """
+    try:
+        final_state = None
+        for kind, payload in stream_answer(get_graph(), {"messages": messages_for_graph}, config=config):
+            if kind == "token":
+                yield sse_event("token", {"text": payload})
+            else:
+                final_state = payload
+
+        messages = (final_state or {}).get("messages", [])
+        last = messages[-1] if messages else None
+        if getattr(last, "type", None) not in ("ai", "assistant") or not last.content:
+            yield sse_event("error", {"detail": "No assistant message generated."})
+            return
+
+        end = {
+            "session_id": session_id,
+            "reply": last.content,
+            "sources": turn_sources(messages),
+        }
+        if include_usage:
+            end["usage"] = request_usage(final_state.get("usage", []))
+        yield sse_event("end", end)
+    except Exception as e:
+        log_event("chat_stream.error", level=logging.ERROR, thread_id=session_id, error=f"{type(e).__name__}: {e}")
+        yield sse_event("error", {"detail": "An internal error occurred. Please try again later."})
+
+
 # ---------- FastAPI ----------
-api = FastAPI(title="Les Mills RAG API")
+api = FastAPI(title="Les Mills RAG API", lifespan=lifespan)
 
 api.add_middleware(
     CORSMiddleware,
@@ -113,66 +415,133 @@ api.add_middleware(
 
 @api.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "index_version": index_version()}
+
+
+@api.post("/admin/reindex", status_code=202)
+async def admin_reindex(background_tasks: BackgroundTasks, x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    store = get_vector_store()
+    if not isinstance(store, SnapshotStore):
+        raise HTTPException(status_code=409, detail="The vector store does not support reindexing")
+    if store.rebuilding:
+        return {"status": "already_running", "index_version": store.version}
+
+    # Searches keep using the current snapshot until the new one is swapped in
+    background_tasks.add_task(reindex_in_background)
+    return {"status": "started", "index_version": store.version}
+
+
+@api.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @api.post("/api/chat")
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, background_tasks: BackgroundTasks):
     try:
         if not req.messages:
             raise HTTPException(status_code=400, detail="messages must be a non-empty list")
 
-        # Fresh stateless session unless the client explicitly wants continuity
-        session_id = req.session_id or new_thread_id("web")
-        config = RunnableConfig({"configurable": {"thread_id": session_id}})
-
-        # Convert inbound payload into LC messages and clean stray tool messages
-        lc_messages = [to_lc_message(m) for m in req.messages]
-        cleaned = sanitize_messages(lc_messages)
-
-        # Prepend a routing nudge so first turn reliably calls `retrieve`
-        routing_nudge = SystemMessage(
-            "Routing: For questions about Les Mills, the Content Portal, APIs, integrations, "
-            "platform, engineering, or operations, you MUST call the `retrieve` tool first. "
-            "Only skip tools if clearly unrelated."
-        )
-        messages_for_graph = [routing_nudge] + cleaned
-
-        # Helpful logs
-        print(f"[server] thread_id={session_id}  region={AWS_REGION}  table={CHECKPOINTS_TABLE}")
-        for i, m in enumerate(messages_for_graph):
-            role = getattr(m, "type", None)
-            preview = (getattr(m, "content", "") or "")[:120].replace("\n", " ")
-            print(f"[server] in[{i}] {role}: {preview!r}")
-
-        assistant_response = None
-
-        # Stream using the full message list; checkpointer will hydrate prior state (if any)
-        for step in graph.stream(
-            {"messages": messages_for_graph},
-            stream_mode="values",
-            config=config,
-        ):
-            last = step["messages"][-1]
-            if isinstance(last, AIMessage) and getattr(last, "tool_calls", None):
-                print(f"[server] tool_calls: {len(last.tool_calls)}")
-            if getattr(last, "type", None) in ("ai", "assistant"):
-                assistant_response = last.content
+        session_id, config, messages_for_graph = await run_in_threadpool(prepare_turn, req)
+
+        # One structured line per sampled request instead of a line per message
+        sample = sampled()
+        started = time.perf_counter()
+        log_event("chat.request", sample, **request_fields(session_id, messages_for_graph))
+
+        key = coalescing_key(req)
+        shared = False
+        try:
+            if key is None:
+                messages = (await admitted_turn(config, messages_for_graph))["messages"]
+            else:
+                state, shared = await flights.do(key, lambda: admitted_turn(config, messages_for_graph))
+                if shared:
+                    messages = await run_in_threadpool(adopt_turn, config, messages_for_graph, state)
+                else:
+                    messages = state["messages"]
+        except Exception:
+            # keep whatever progress a failed turn made, as the per-step checkpointer would
+            await run_in_threadpool(persist_turn_in_background, config)
+            raise
+
+        if CHECKPOINT_FLUSH == "async":
+            background_tasks.add_task(persist_turn_in_background, config)
+        else:
+            await run_in_threadpool(persist_turn, config)
+
+        last = messages[-1] if messages else None
+        assistant_response = last.content if getattr(last, "type", None) in ("ai", "assistant") else None
 
         if not assistant_response:
             raise HTTPException(status_code=500, detail="No assistant message generated.")
 
-        return {"reply": assistant_response, "session_id": session_id}
+        log_event(
+            "chat.response", sample, thread_id=session_id, coalesced=shared,
+            messages=len(messages), duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        response = {"reply": assistant_response, "session_id": session_id}
+        if req.include_usage:
+            response["usage"] = await run_in_threadpool(session_usage, config)
+        return response
 
+    except AdmissionRejected as rejected:
+        raise rejection_to_http(rejected) from None
     except ValidationError as ve:
         raise HTTPException(status_code=400, detail=str(ve)) from ve
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[server.chat] {type(e).__name__}: {e}")
+        log_event("chat.error", level=logging.ERROR, error=f"{type(e).__name__}: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again later.")
 
 
+@api.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Same contract as /api/chat, but the reply is pushed token by token as SSE."""
+    if not req.messages:
+        raise HTTPException(status_code=400, detail="messages must be a non-empty list")
+
+    session_id, config, messages_for_graph = await run_in_threadpool(prepare_turn, req)
+    log_event("chat_stream.request", sampled(), **request_fields(session_id, messages_for_graph))
+
+    try:
+        await admission.acquire()
+    except AdmissionRejected as rejected:
+        raise rejection_to_http(rejected) from None
+
+    released = False
+
+    def release_slot() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    async def body():
+        # Hold the slot for the whole stream
+        try:
+            async for event in iterate_in_threadpool(stream_chat_events(session_id, config, messages_for_graph, req.include_usage)):
+                yield event
+        finally:
+            # Free the slot before anything that awaits: a disconnect cancels this block
+            release_slot()
+            # The client already has the `end` event, so this is always after the response;
+            # shielded so a disconnect doesn't drop the turn's checkpoint
+            await asyncio.shield(run_in_threadpool(persist_turn_in_background, config))
+
+    return AdmittedStreamingResponse(
+        body(),
+        release_slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Dev server entry point
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("server:api", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,221 @@
+"""
+Read-only vector index shared by every worker process through mmapped files.
+
+`build_index` embeds the corpus once and writes a directory:
+
+    manifest.json      count, dim
+    vectors.npy        float32 [count, dim], L2-normalised (dot product == cosine)
+    texts.bin          utf-8 page_content of every document, concatenated
+    text_offsets.npy   int64 [count + 1] byte offsets into texts.bin
+    meta.bin           JSON metadata of every document, concatenated
+    meta_offsets.npy   int64 [count + 1] byte offsets into meta.bin
+
+`MmapVectorStore` maps those files read-only. The pages live in the OS page
+cache once and are shared by all processes that map them, so N uvicorn workers
+hold one copy of the index instead of N. Documents are decoded only for the
+top-k hits.
+
+With uvicorn --workers there is no parent hook, so `ensure_index` lets the first
+worker build the index under a file lock while the others wait and attach.
+
+`publish_index` keeps versions side by side (`<path>/<version>/...`) and points
+`<path>/CURRENT` at the newest one with an atomic rename, so a rebuild never
+disturbs processes still searching the previous version. Older versions are
+removed once superseded twice; on Linux a process that still has them mapped
+keeps reading the unlinked files until it re-attaches.
+"""
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from langchain_impl.vector_stores import BaseVectorStore
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _write_blob(path: str, items: List[bytes]) -> np.ndarray:
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for i, item in enumerate(items):
+            f.write(item)
+            offsets[i + 1] = offsets[i] + len(item)
+    return offsets
+
+
+def _map_bytes(path: str) -> np.ndarray:
+    # np.memmap refuses empty files
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def build_index(path: str, documents: List[Document], embeddings) -> str:
+    """Embed `documents` and write the index to `path` (replaced atomically). Returns `path`."""
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    vectors = _normalise(vectors.reshape(len(documents), -1))
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "vectors.npy"), vectors)
+    np.save(
+        os.path.join(tmp, "text_offsets.npy"),
+        _write_blob(os.path.join(tmp, "texts.bin"), [d.page_content.encode() for d in documents]),
+    )
+    np.save(
+        os.path.join(tmp, "meta_offsets.npy"),
+        _write_blob(os.path.join(tmp, "meta.bin"), [json.dumps(d.metadata, default=str).encode() for d in documents]),
+    )
+    # manifest last: its presence marks a complete index
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump({"count": int(vectors.shape[0]), "dim": int(vectors.shape[1])}, f)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.rename(tmp, path)
+    return path
+
+
+def current_version(path: str) -> Optional[str]:
+    """Version CURRENT points at, "" for a single unversioned index, None if there is none."""
+    if os.path.isfile(os.path.join(path, MANIFEST)):
+        return ""
+    try:
+        with open(os.path.join(path, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def index_exists(path: str) -> bool:
+    return current_version(path) is not None
+
+
+def index_age(path: str) -> float:
+    """Seconds since the current version was published (inf if there is none)."""
+    version = current_version(path)
+    if version is None:
+        return float("inf")
+    marker = os.path.join(path, MANIFEST if version == "" else CURRENT)
+    return time.time() - os.path.getmtime(marker)
+
+
+def publish_index(path: str, documents: List[Document], embeddings) -> str:
+    """Build a new version under `path`, point CURRENT at it and prune old versions. Returns the version."""
+    os.makedirs(path, exist_ok=True)
+    previous = current_version(path)
+    version = f"v{time.time_ns()}"
+    build_index(os.path.join(path, version), documents, embeddings)
+
+    pointer = os.path.join(path, f"{CURRENT}.tmp-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, CURRENT))
+
+    # keep the version just superseded for readers that have not re-attached yet
+    for name in os.listdir(path):
+        if name.startswith("v") and name not in (version, previous) and os.path.isdir(os.path.join(path, name)):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    return version
+
+
+class MmapVectorStore(BaseVectorStore):
+    """Zero-copy, read-only view of an index written by `build_index`."""
+
+    def __init__(self, path: str, embeddings) -> None:
+        if not index_exists(path):
+            raise RuntimeError(
+                f"No vector index at '{path}'. Build it with `python -m langchain_impl.shared_index` "
+                f"or let the server build it on startup (INDEX_ON_STARTUP=true)."
+            )
+        self.path = path
+        self.embeddings = embeddings
+        self.version = current_version(path)
+        root = os.path.join(path, self.version) if self.version else path
+        with open(os.path.join(root, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.count, self.dim = manifest["count"], manifest["dim"]
+        self.vectors = np.load(os.path.join(root, "vectors.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(root, "text_offsets.npy"), mmap_mode="r")
+        self.meta_offsets = np.load(os.path.join(root, "meta_offsets.npy"), mmap_mode="r")
+        self.texts = _map_bytes(os.path.join(root, "texts.bin"))
+        self.meta = _map_bytes(os.path.join(root, "meta.bin"))
+
+    def add_documents(self, documents: List[Document]):
+        raise TypeError("MmapVectorStore is read-only; rebuild the index with build_index()")
+
+    def document(self, i: int) -> Document:
+        text = bytes(self.texts[self.text_offsets[i]:self.text_offsets[i + 1]]).decode()
+        metadata = json.loads(bytes(self.meta[self.meta_offsets[i]:self.meta_offsets[i + 1]]))
+        return Document(page_content=text, metadata=metadata)
+
+    def search_by_vector(self, vector, k: int = 2) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the k nearest rows, best first."""
+        if self.count == 0:
+            return []
+        query = _normalise(np.asarray(vector, dtype=np.float32))
+        scores = self.vectors @ query
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def similarity_search(self, query: str, k: int = 2) -> List[Document]:
+        vector = self.embeddings.embed_query(query)
+        return [self.document(i) for i, _ in self.search_by_vector(vector, k)]
+
+
+@contextmanager
+def build_lock(path: str) -> Iterator[None]:
+    """Cross-process lock serialising builds of the index at `path`."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows: single-worker dev setups only
+            yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ensure_index(path: str, embeddings, load_documents: Callable[[], List[Document]]) -> MmapVectorStore:
+    """Attach to the index at `path`, building it first if no process has yet."""
+    if not index_exists(path):
+        with build_lock(path):
+            if not index_exists(path):  # another worker may have built it while we waited
+                publish_index(path, load_documents(), embeddings)
+    return MmapVectorStore(path, embeddings)
+
+
+def main() -> None:
+    """Ingest step: build the index at VECTOR_INDEX_PATH from the documentation."""
+    from langchain_impl.apis import build_embeddings_client
+    from langchain_impl.app import load_env
+    from langchain_impl.web_scrape import fetch_documentation, split_document
+
+    load_env()
+    path = os.getenv("VECTOR_INDEX_PATH", "vector_index")
+    splits = split_document(fetch_documentation("https://api.content.lesmills.com/docs/v1/content-portal-api.yaml"))
+    with build_lock(path):
+        version = publish_index(path, splits, build_embeddings_client())
+    print(f"Indexed {len(splits)} chunks into {path} ({version})")
+
+
+if __name__ == "__main__":
+    main()
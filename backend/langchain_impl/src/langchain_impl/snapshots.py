@@ -0,0 +1,214 @@
+"""
+Immutable, versioned vector index snapshots with an atomic swap.
+
+Searches read `SnapshotStore._snapshot` once (a single reference load, atomic
+under the GIL) and run against that snapshot without taking any lock, so a
+rebuild never blocks or disturbs them. A rebuild constructs a complete new
+snapshot off to the side and publishes it by replacing that one reference. A
+search that started before the swap finishes on the old snapshot, which is
+freed when its last reader drops it.
+
+Builders decide where a snapshot lives:
+  InMemorySnapshotBuilder   - a fresh per-process InMemoryStore (a rebuild re-embeds the
+                              documents; add_documents embeds only the new ones)
+  SharedSnapshotBuilder     - a new version of the mmapped shared index (see shared_index);
+                              other workers attach to it through `sync()`, which searches
+                              run at most every SNAPSHOT_SYNC_INTERVAL_S seconds
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from langchain_impl.metrics import REGISTRY
+from langchain_impl.vector_stores import BaseVectorStore, InMemoryStore
+
+logger = logging.getLogger("langchain_impl")
+SYNC_INTERVAL_S = float(os.getenv("SNAPSHOT_SYNC_INTERVAL_S", "1"))
+
+
+@dataclass(frozen=True, eq=False)
+class IndexSnapshot:
+    version: str
+    store: Optional[BaseVectorStore]
+    # kept only when the builder needs them to extend the snapshot (add_documents)
+    documents: Optional[Tuple[Document, ...]] = None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+EMPTY = IndexSnapshot(version="empty", store=None, documents=())
+
+
+class InMemorySnapshotBuilder:
+    def __init__(self, embeddings) -> None:
+        self.embeddings = embeddings
+        self._builds = 0
+
+    def current_version(self) -> Optional[str]:
+        return None  # nothing is published outside this process
+
+    def latest(self) -> Optional[IndexSnapshot]:
+        return None
+
+    def build(self, load_documents: Callable[[], List[Document]], max_age: Optional[float] = None) -> IndexSnapshot:
+        documents = tuple(load_documents())
+        store = InMemoryStore(self.embeddings)
+        if documents:
+            store.add_documents(list(documents))
+        self._builds += 1
+        return IndexSnapshot(version=str(self._builds), store=store, documents=documents)
+
+    def extend(self, snapshot: IndexSnapshot, documents: List[Document]) -> IndexSnapshot:
+        """`snapshot` plus `documents`: copies its vectors and embeds only the new documents."""
+        store = snapshot.store.copy() if isinstance(snapshot.store, InMemoryStore) else InMemoryStore(self.embeddings)
+        if documents:
+            store.add_documents(list(documents))
+        self._builds += 1
+        return IndexSnapshot(version=str(self._builds), store=store, documents=(snapshot.documents or ()) + tuple(documents))
+
+
+class SharedSnapshotBuilder:
+    def __init__(self, path: str, embeddings) -> None:
+        self.path = path
+        self.embeddings = embeddings
+
+    def current_version(self) -> Optional[str]:
+        from langchain_impl.shared_index import current_version
+
+        version = current_version(self.path)
+        return None if version is None else version or "unversioned"
+
+    def latest(self) -> Optional[IndexSnapshot]:
+        from langchain_impl.shared_index import MmapVectorStore, index_age, index_exists
+
+        if not index_exists(self.path):
+            return None
+        store = MmapVectorStore(self.path, self.embeddings)
+        return IndexSnapshot(
+            version=store.version or "unversioned",
+            store=store,
+            created_at=time.time() - index_age(self.path),
+        )
+
+    def build(self, load_documents: Callable[[], List[Document]], max_age: Optional[float] = None) -> IndexSnapshot:
+        from langchain_impl.shared_index import build_lock, index_age, publish_index
+
+        with build_lock(self.path):
+            # another worker may have published a fresh version while we waited for the lock
+            if max_age is None or index_age(self.path) >= max_age:
+                publish_index(self.path, load_documents(), self.embeddings)
+        return self.latest()
+
+
+class SnapshotStore(BaseVectorStore):
+    def __init__(self, builder, sync_interval: float = SYNC_INTERVAL_S) -> None:
+        self.builder = builder
+        self.sync_interval = sync_interval
+        self._rebuild_lock = threading.Lock()  # serialises rebuilds only; searches never take it
+        self._sync_lock = threading.Lock()  # searches only try it: one of them checks the version
+        self._next_sync = time.monotonic() + sync_interval
+        self._live: "weakref.WeakSet[IndexSnapshot]" = weakref.WeakSet()
+        self._swaps = REGISTRY.counter("index_snapshot_swaps_total", "Vector index snapshots published")
+        self._live_gauge = REGISTRY.gauge("index_snapshots_live", "Vector index snapshots still referenced")
+        self._rebuild_hist = REGISTRY.histogram("index_rebuild_seconds", "Time to build a vector index snapshot")
+        self._snapshot: IndexSnapshot = builder.latest() or EMPTY
+        if self._snapshot is not EMPTY:
+            self._track(self._snapshot)
+
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_lock.locked()
+
+    def live_snapshots(self) -> int:
+        """Snapshots still referenced by this store or an in-flight search."""
+        return len(self._live)
+
+    # ---- reads (lock-free) ----
+    def similarity_search(self, query: str, k: int = 2) -> List[Document]:
+        self._maybe_sync()
+        snapshot = self._snapshot
+        if snapshot.store is None:
+            return []
+        return snapshot.store.similarity_search(query, k=k)
+
+    def _maybe_sync(self) -> None:
+        """sync() from the search path: at most every `sync_interval` s, and never waiting on another search."""
+        now = time.monotonic()
+        if now < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sync = now + self.sync_interval
+            self.sync()
+        except Exception:
+            # a failed version check must not fail the search: keep serving the current snapshot
+            logger.warning("index snapshot sync failed", exc_info=True)
+        finally:
+            self._sync_lock.release()
+
+    # ---- publishing ----
+    def _track(self, snapshot: IndexSnapshot) -> None:
+        self._live.add(snapshot)
+        self._live_gauge.inc()
+        weakref.finalize(snapshot, self._live_gauge.dec)
+
+    def _publish(self, snapshot: IndexSnapshot) -> None:
+        self._snapshot = snapshot
+        self._track(snapshot)
+        self._swaps.inc()
+
+    def rebuild(self, load_documents: Callable[[], List[Document]], max_age: Optional[float] = None) -> bool:
+        """Build and publish a new snapshot. Returns False if a rebuild was already running."""
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        try:
+            started = time.perf_counter()
+            snapshot = self.builder.build(load_documents, max_age=max_age)
+            self._rebuild_hist.observe(time.perf_counter() - started)
+            if snapshot is not None and snapshot.version != self._snapshot.version:
+                self._publish(snapshot)
+            return True
+        finally:
+            self._rebuild_lock.release()
+
+    def sync(self) -> bool:
+        """Attach to a newer snapshot published by another process, if any."""
+        version = self.builder.current_version()
+        if version is None or version == self._snapshot.version:
+            return False
+        latest = self.builder.latest()
+        if latest is None:
+            return False
+        self._publish(latest)
+        return True
+
+    def refresh(self, load_documents: Callable[[], List[Document]], max_age: float) -> bool:
+        """Timer hook: pick up other workers' versions, rebuild if the index is older than `max_age`."""
+        self.sync()
+        if self._snapshot.age < max_age:
+            return False
+        return self.rebuild(load_documents, max_age=max_age)
+
+    def add_documents(self, documents: List[Document]):
+        """Copy-on-write: publishes a new snapshot holding the current documents plus `documents`."""
+        with self._rebuild_lock:
+            current = self._snapshot
+            if current.documents is None or not hasattr(self.builder, "extend"):
+                raise TypeError("This snapshot does not keep its documents; rebuild() it instead")
+            self._publish(self.builder.extend(current, documents))
@@ -0,0 +1,332 @@
+"""
+SQLite checkpointer for single-node and edge deployments (CHECKPOINTER_BACKEND=sqlite).
+
+One database file in WAL mode, so readers never block the writer. Connections
+come from a small pool shared by the worker threads. Statements are fixed SQL
+strings (`list` picks one of a few by the filters it gets), which sqlite3 keeps
+compiled in each connection's statement cache.
+
+Writes are batched per call: a checkpoint is one INSERT and a task's pending
+writes are one executemany, each in its own transaction. A turn still makes one
+transaction per step; wrap the saver in BufferedCheckpointSaver to write a turn
+at once. With synchronous=NORMAL, WAL commits are not fsynced individually.
+"""
+import asyncio
+import functools
+import queue
+import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+INSERT_CHECKPOINT = f"INSERT OR REPLACE INTO checkpoints ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_CHECKPOINT = f"SELECT {COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+SELECT_LATEST = (
+    f"SELECT {COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+    "ORDER BY checkpoint_id DESC LIMIT 1"
+)
+SELECT_WRITES = (
+    "SELECT task_id, channel, type, value FROM writes "
+    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx"
+)
+# the writes of every checkpoint a `list` page returns, in one primary-key range read
+SELECT_WRITES_RANGE = (
+    "SELECT checkpoint_id, task_id, channel, type, value FROM writes "
+    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id BETWEEN ? AND ? "
+    "ORDER BY checkpoint_id, task_id, idx"
+)
+UPSERT_WRITES = (
+    "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_WRITES = UPSERT_WRITES.replace("INSERT OR REPLACE", "INSERT OR IGNORE")
+DELETE_CHECKPOINTS = "DELETE FROM checkpoints WHERE thread_id = ?"
+DELETE_WRITES = "DELETE FROM writes WHERE thread_id = ?"
+
+
+@functools.lru_cache(maxsize=None)
+def list_sql(thread: bool, ns: bool, checkpoint: bool, before: bool, limit: bool) -> str:
+    """The SELECT for one combination of `list` filters: at most 32 distinct strings."""
+    clauses = [
+        clause for present, clause in (
+            (thread, "thread_id = ?"),
+            (ns, "checkpoint_ns = ?"),
+            (checkpoint, "checkpoint_id = ?"),
+            (before, "checkpoint_id < ?"),
+        ) if present
+    ]
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    return f"SELECT {COLUMNS} FROM checkpoints {where}ORDER BY checkpoint_id DESC" + (" LIMIT ?" if limit else "")
+
+
+class ConnectionPool:
+    """Fixed-size pool of sqlite3 connections that may be used from any thread (one at a time)."""
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 5.0) -> None:
+        self.path = path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+            conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    def __init__(self, path: str, pool_size: int = 4, serde=None) -> None:
+        super().__init__(serde=serde)
+        # every ":memory:" connection is its own database
+        self.pool = ConnectionPool(path, size=1 if path == ":memory:" else pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.pool.close()
+
+    # ---- row <-> tuple ----
+    def _to_tuple(
+        self,
+        row: Tuple[Any, ...],
+        writes: List[Tuple[Any, ...]],
+        metadata: Optional[CheckpointMetadata] = None,
+    ) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, serialized_metadata = row
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=metadata if metadata is not None else self.serde.loads_typed((metadata_type, serialized_metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    # ---- sync interface ----
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable.get("checkpoint_id")
+        with self.pool.connection() as conn:
+            if checkpoint_id:
+                row = conn.execute(SELECT_CHECKPOINT, (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = conn.execute(SELECT_LATEST, (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+            writes = conn.execute(SELECT_WRITES, row[:3]).fetchall()
+        return self._to_tuple(row, writes)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        configurable = config["configurable"] if config else {}
+        before_id = before["configurable"].get("checkpoint_id") if before else None
+        # metadata is serialized, so a filter is applied here and the limit can only go to SQL without one
+        sql_limit = limit is not None and not filter
+        present = (
+            bool(config),
+            configurable.get("checkpoint_ns") is not None,
+            bool(configurable.get("checkpoint_id")),
+            bool(before_id),
+        )
+        params = [
+            value for value, used in zip(
+                (configurable.get("thread_id"), configurable.get("checkpoint_ns"), configurable.get("checkpoint_id"), before_id),
+                present,
+            ) if used
+        ] + ([limit] if sql_limit else [])
+
+        with self.pool.connection() as conn:
+            cursor = conn.execute(list_sql(*present, sql_limit), params)
+            rows: List[Tuple[Tuple[Any, ...], Optional[CheckpointMetadata]]] = []
+            for row in cursor:
+                metadata = None
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if any(metadata.get(k) != v for k, v in filter.items()):
+                        continue
+                rows.append((row, metadata))
+                if limit is not None and len(rows) >= limit:
+                    break
+            cursor.close()
+
+            # pending writes of the whole page: one range read per thread/namespace instead of one per checkpoint
+            ids: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+            for row, _ in rows:
+                ids[(row[0], row[1])].append(row[2])
+            writes: Dict[Tuple[str, str, str], List[Tuple[Any, ...]]] = defaultdict(list)
+            for (thread_id, checkpoint_ns), checkpoint_ids in ids.items():
+                wanted = set(checkpoint_ids)
+                for checkpoint_id, *write in conn.execute(
+                    SELECT_WRITES_RANGE, (thread_id, checkpoint_ns, min(checkpoint_ids), max(checkpoint_ids))
+                ):
+                    if checkpoint_id in wanted:
+                        writes[(thread_id, checkpoint_ns, checkpoint_id)].append(tuple(write))
+
+        yield from [self._to_tuple(row, writes[row[:3]], metadata) for row, metadata in rows]
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self.pool.transaction() as conn:
+            conn.execute(INSERT_CHECKPOINT, (
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                configurable.get("checkpoint_id"),
+                type_,
+                serialized,
+                metadata_type,
+                serialized_metadata,
+            ))
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+        # Special writes (errors, interrupts...) replace earlier ones; regular writes are idempotent
+        sql = UPSERT_WRITES if all(channel in WRITES_IDX_MAP for channel, _ in writes) else INSERT_WRITES
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                type_,
+                serialized,
+                task_path,
+            ))
+        with self.pool.transaction() as conn:
+            conn.executemany(sql, rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.pool.transaction() as conn:
+            conn.execute(DELETE_CHECKPOINTS, (thread_id,))
+            conn.execute(DELETE_WRITES, (thread_id,))
+
+    # ---- async interface (the pool's connections are used from worker threads) ----
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for tup in tuples:
+            yield tup
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
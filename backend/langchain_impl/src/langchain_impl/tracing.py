@@ -0,0 +1,222 @@
+"""
+Per-stage timing and sampled structured logs.
+
+Every instrumented stage lands in one histogram, `stage_duration_seconds{stage=...}`
+(plus `stage_errors_total{stage=...}`), served at /metrics:
+
+  node.<name>                graph nodes (query_or_respond, tools, generate)
+  embeddings.embed_query     embedding calls
+  embeddings.embed_documents
+  vector.similarity_search   vector search (includes the query embedding)
+  checkpoint.<op>            checkpointer reads/writes (get_tuple, put, put_writes, list, flush)
+
+`log_event` writes one JSON line per event through the `langchain_impl` logger,
+for a LOG_SAMPLE_RATE fraction of requests (errors are always logged).
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from langchain_impl.metrics import REGISTRY
+
+STAGE_SECONDS = REGISTRY.histogram("stage_duration_seconds", "Latency of each pipeline stage")
+STAGE_ERRORS = REGISTRY.counter("stage_errors_total", "Pipeline stages that raised")
+
+logger = logging.getLogger("langchain_impl")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+
+# ---------------- Spans ----------------
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of `span`. Keeps the signature, so LangGraph still sees `config`/`store` params."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ---------------- Structured logs ----------------
+def sampled(rate: Optional[float] = None) -> bool:
+    """Decide once per request whether its log lines are emitted."""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Send `langchain_impl` log lines to stderr (LOG_LEVEL, default INFO) unless already configured."""
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def log_event(event: str, sample: bool = True, level: int = logging.INFO, **fields: Any) -> None:
+    if not sample and level < logging.WARNING:
+        return
+    logger.log(level, json.dumps({"event": event, **fields}, default=str))
+
+
+# ---------------- Wrappers ----------------
+class TimedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings) -> None:
+        self.inner = inner
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embeddings.embed_query"):
+            return self.inner.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embeddings.embed_documents"):
+            return self.inner.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with span("embeddings.embed_query"):
+            return await self.inner.aembed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embeddings.embed_documents"):
+            return await self.inner.aembed_documents(texts)
+
+
+def forward_task_path(put_writes: Callable) -> Callable:
+    """
+    `put_writes`/`aput_writes` of a wrapped saver as (config, writes, task_id, task_path).
+    task_path is dropped for savers that predate it (DynamoDBSaver), as LangGraph does.
+    """
+    if "task_path" in inspect.signature(put_writes).parameters:
+        return put_writes
+    return lambda config, writes, task_id, task_path="": put_writes(config, writes, task_id)
+
+
+class TimedCheckpointSaver(BaseCheckpointSaver):
+    """Times every call into the wrapped checkpointer as `checkpoint.<op>`."""
+
+    def __init__(self, inner: BaseCheckpointSaver) -> None:
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self._put_writes = forward_task_path(inner.put_writes)
+        self._aput_writes = forward_task_path(inner.aput_writes)
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with span("checkpoint.get_tuple"):
+            return self.inner.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with span("checkpoint.list"):
+            tuples = list(self.inner.list(config, filter=filter, before=before, limit=limit))
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with span("checkpoint.put"):
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with span("checkpoint.put_writes"):
+            self._put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with span("checkpoint.delete_thread"):
+            self.inner.delete_thread(thread_id)
+
+    def flush(self, config: RunnableConfig) -> int:
+        from langchain_impl.checkpointers import flush_checkpoints
+
+        with span("checkpoint.flush"):
+            return flush_checkpoints(self.inner, config)
+
+    # async callers (graph.ainvoke) go through the same spans
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with span("checkpoint.get_tuple"):
+            return await self.inner.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        with span("checkpoint.list"):
+            tuples = [t async for t in self.inner.alist(config, filter=filter, before=before, limit=limit)]
+        for t in tuples:
+            yield t
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with span("checkpoint.put"):
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with span("checkpoint.put_writes"):
+            await self._aput_writes(config, writes, task_id, task_path)
@@ -0,0 +1,242 @@
+"""
+Token and cost ledger.
+
+Every metered graph node appends one record to the `usage` channel of the
+thread state, so the ledger is checkpointed with the conversation:
+
+    {"turn": 3, "node": "generate", "model": "gpt-4o-mini",
+     "prompt_tokens": 812, "completion_tokens": 95, "embedding_tokens": 0}
+
+"turn" is the thread's `turn` counter, advanced once per run by the graph's entry
+node (`starts_turn`). Counting user messages instead would break on clients that
+send several messages in one request.
+
+Prompt/completion tokens come from the `usage_metadata` of the AI messages a
+node returns (ChatOpenAI fills it in, also when streaming with
+`stream_usage=True`). Embedding tokens are counted by `MeteredEmbeddings`
+while a node runs; OpenAI does not return them through LangChain, so they are
+counted locally with tiktoken (or estimated at ~4 characters per token when
+the encoding is not available).
+
+Report the per-turn token growth of stored threads with:
+
+    python -m langchain_impl.usage THREAD_ID [THREAD_ID ...] [--json]
+"""
+import argparse
+import contextvars
+import functools
+import json
+import os
+from collections import Counter as Tally
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+from langchain_impl.metrics import REGISTRY
+
+TOKENS = REGISTRY.counter("llm_tokens_total", "Tokens consumed, by node and kind (prompt|completion|embedding)")
+
+LLM_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-large"
+# USD per 1M tokens; override with e.g. TOKEN_PRICES='{"gpt-4o-mini": {"prompt": 0.15, "completion": 0.6}}'
+PRICES: Dict[str, Dict[str, float]] = {
+    LLM_MODEL: {"prompt": 0.15, "completion": 0.60},
+    EMBEDDING_MODEL: {"embedding": 0.13},
+}
+PRICES.update(json.loads(os.getenv("TOKEN_PRICES", "{}")))
+
+FIELDS = ("prompt_tokens", "completion_tokens", "embedding_tokens")
+
+Record = Dict[str, Any]
+
+
+def add_usage(left: Optional[List[Record]], right: Optional[List[Record]]) -> List[Record]:
+    """Reducer for the `usage` state channel: records are only ever appended."""
+    return list(left or []) + list(right or [])
+
+
+# ---------------- Embedding tokens ----------------
+_embedding_tokens: contextvars.ContextVar[Optional[Tally]] = contextvars.ContextVar("embedding_tokens", default=None)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(EMBEDDING_MODEL)
+    except Exception:  # not installed, or the BPE file cannot be fetched
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4) if text else 0
+
+
+class MeteredEmbeddings(Embeddings):
+    """Counts the tokens sent to the embedding model while a node is being metered."""
+
+    def __init__(self, inner: Embeddings) -> None:
+        self.inner = inner
+
+    def _count(self, texts: List[str]) -> None:
+        tally = _embedding_tokens.get()
+        if tally is not None:
+            tally["embedding_tokens"] += sum(count_tokens(t) for t in texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._count([text])
+        return self.inner.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(texts)
+        return self.inner.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self._count([text])
+        return await self.inner.aembed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(texts)
+        return await self.inner.aembed_documents(texts)
+
+
+@contextmanager
+def embedding_meter() -> Iterator[Tally]:
+    # the tally is shared with the threads ToolNode runs tools in (they copy the context)
+    tally = Tally()
+    token = _embedding_tokens.set(tally)
+    try:
+        yield tally
+    finally:
+        _embedding_tokens.reset(token)
+
+
+# ---------------- Node metering ----------------
+def next_turn(state: Dict[str, Any]) -> int:
+    """The number of the turn starting now. Threads from before the counter continue from their ledger."""
+    previous = state.get("turn")
+    if previous is None:
+        previous = max((r["turn"] for r in state.get("usage") or []), default=0)
+    return previous + 1
+
+
+def starts_turn(fn: Callable) -> Callable:
+    """Decorator for the graph's entry node: advances the thread's `turn` counter."""
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        turn = next_turn(state)
+        update = fn({**state, "turn": turn}, *args, **kwargs)
+        return {**update, "turn": turn}
+    return wrapper
+
+
+def node_record(node: str, turn: int, update: Dict[str, Any], embedding_tokens: int) -> Record:
+    record = {"turn": turn, "node": node, "model": None, "prompt_tokens": 0, "completion_tokens": 0,
+              "embedding_tokens": embedding_tokens}
+    for m in update.get("messages", []):
+        usage = getattr(m, "usage_metadata", None) if isinstance(m, AIMessage) else None
+        if usage:
+            record["prompt_tokens"] += usage.get("input_tokens", 0)
+            record["completion_tokens"] += usage.get("output_tokens", 0)
+            record["model"] = (m.response_metadata or {}).get("model_name") or LLM_MODEL
+    return record
+
+
+def metered(node: str) -> Callable:
+    """Decorator for graph nodes: appends the node's token usage to the `usage` channel."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            with embedding_meter() as tally:
+                update = fn(state, *args, **kwargs)
+            record = node_record(node, state.get("turn", 0), update, tally["embedding_tokens"])
+            for field in FIELDS:
+                if record[field]:
+                    TOKENS.inc(record[field], node=node, kind=field[: -len("_tokens")])
+            return {**update, "usage": [record]}
+        return wrapper
+    return decorate
+
+
+# ---------------- Aggregation ----------------
+def cost_usd(record: Record) -> float:
+    llm = PRICES.get(record.get("model") or LLM_MODEL, {})
+    emb = PRICES.get(EMBEDDING_MODEL, {})
+    return (
+        record.get("prompt_tokens", 0) * llm.get("prompt", 0.0)
+        + record.get("completion_tokens", 0) * llm.get("completion", 0.0)
+        + record.get("embedding_tokens", 0) * emb.get("embedding", 0.0)
+    ) / 1_000_000
+
+
+def summarize(records: List[Record]) -> Dict[str, Any]:
+    totals = {field: sum(r.get(field, 0) for r in records) for field in FIELDS}
+    totals["total_tokens"] = sum(totals.values())
+    totals["cost_usd"] = round(sum(cost_usd(r) for r in records), 6)
+    return totals
+
+
+def request_usage(records: List[Record]) -> Dict[str, Any]:
+    """Usage of the latest turn and of the whole session, as returned by /api/chat."""
+    last_turn = max((r["turn"] for r in records), default=0)
+    return {
+        "turn": summarize([r for r in records if r["turn"] == last_turn]),
+        "session": summarize(records),
+    }
+
+
+def per_turn(records: List[Record]) -> List[Dict[str, Any]]:
+    """Token growth curve: one row per turn with its usage and the running session total."""
+    rows, cumulative = [], 0
+    for turn in sorted({r["turn"] for r in records}):
+        row = {"turn": turn, **summarize([r for r in records if r["turn"] == turn])}
+        cumulative += row["total_tokens"]
+        row["cumulative_tokens"] = cumulative
+        rows.append(row)
+    return rows
+
+
+def format_report(thread_id: str, rows: List[Dict[str, Any]]) -> str:
+    lines = [f"thread {thread_id}", "  turn   prompt  completion  embedding    total  cumulative   cost_usd"]
+    for r in rows:
+        lines.append(
+            f"  {r['turn']:>4} {r['prompt_tokens']:>8} {r['completion_tokens']:>11} {r['embedding_tokens']:>10}"
+            f" {r['total_tokens']:>8} {r['cumulative_tokens']:>11} {r['cost_usd']:>10.6f}"
+        )
+    if not rows:
+        lines.append("  (no usage recorded)")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from langchain_impl.app import load_env
+    from langchain_impl.checkpointers import build_checkpointer
+
+    parser = argparse.ArgumentParser(description="Per-turn token usage of stored conversation threads")
+    parser.add_argument("thread_ids", nargs="+")
+    parser.add_argument("--backend", default=None, help="CHECKPOINTER_BACKEND override")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    load_env()
+    checkpointer = build_checkpointer(args.backend)
+    report = {}
+    for thread_id in args.thread_ids:
+        tup = checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        records = tup.checkpoint["channel_values"].get("usage", []) if tup else []
+        report[thread_id] = per_turn(records)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("\n\n".join(format_report(t, rows) for t, rows in report.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -21,4 +21,10 @@ class InMemoryStore(BaseVectorStore):
         self.store.add_documents(documents)
 
     def similarity_search(self, query: str, k: int = 2) -> List[Document]:
-        return self.store.similarity_search(query, k=k)
\ No newline at end of file
+        return self.store.similarity_search(query, k=k)
+
+    def copy(self) -> "InMemoryStore":
+        """A new store with the same vectors, without embedding anything again."""
+        clone = InMemoryStore(self.embeddings)
+        clone.store.store = dict(self.store.store)
+        return clone
@@ -4,3 +4,142 @@ os.environ.setdefault("CHECKPOINTER_BACKEND", "memory")
 os.environ.setdefault("DEPLOY_DDB", "false")
 os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
 os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Local stand-in for ChatOpenAI. Replies are served round-robin, so one stub
+    can play both the router (`query_or_respond`) and `generate`.
+    Every prompt is recorded in `calls`; `latency` simulates a slow provider
+    (a list gives each reply its own latency, e.g. a slow router only). A bound
+    `timeout` is recorded in `timeouts` and, like the OpenAI client, cuts a slower
+    reply short with a timeout error.
+    """
+
+    replies: List[AIMessage]
+    latency: float | List[float] = 0.0
+    calls: List[Any] = []
+    timeouts: List[Optional[float]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_reply(self, messages: List[BaseMessage], timeout: Optional[float] = None) -> AIMessage:
+        self.calls.append(messages)
+        self.timeouts.append(timeout)
+        i = (len(self.calls) - 1) % len(self.replies)
+        latency = self.latency[i] if isinstance(self.latency, list) else self.latency
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub reply timed out after {timeout:.2f}s")
+        if latency:
+            time.sleep(latency)
+        # fresh copy: the add_messages reducer assigns ids to messages in place
+        return self.replies[i].model_copy()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next_reply(messages, kwargs.get("timeout")))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        reply = self._next_reply(messages, kwargs.get("timeout"))
+        if reply.tool_calls:
+            tool_call_chunks = [
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(reply.tool_calls)
+            ]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks))
+            return
+        for i, word in enumerate(str(reply.content).split(" ")):
+            token = word if i == 0 else f" {word}"
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def tool_call_reply(query: str, call_id: str = "call-1") -> AIMessage:
+    """Router reply asking for the `retrieve` tool."""
+    return AIMessage(content="", tool_calls=[{"name": "retrieve", "args": {"query": query}, "id": call_id}])
+
+
+class RandomEmbeddings:
+    """Cheap deterministic-size embeddings for building big test indexes."""
+
+    def __init__(self, size: int = 384) -> None:
+        self.size = size
+
+    def embed_documents(self, texts):
+        return np.random.default_rng(0).random((len(texts), self.size), dtype=np.float32)
+
+    def embed_query(self, text):
+        return np.random.default_rng(abs(hash(text)) % 2**32).random(self.size, dtype=np.float32)
+
+
+@pytest.fixture
+def fake_embeddings():
+    return FakeEmbeddings(size=16)
+
+
+@pytest.fixture
+def stub_llm_factory():
+    def _make(*replies: AIMessage, latency: float | List[float] = 0.0) -> StubChatModel:
+        return StubChatModel(replies=list(replies), latency=latency, calls=[], timeouts=[])
+    return _make
+
+
+CHECKPOINTS_TABLE = "test-checkpoints"
+WRITES_TABLE = "test-writes"
+
+
+@pytest.fixture
+def dynamodb_tables(monkeypatch):
+    """moto-backed checkpoint tables with the key schema DynamoDBSaver expects."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("CHECKPOINTS_TABLE", CHECKPOINTS_TABLE)
+    monkeypatch.setenv("WRITES_TABLE", WRITES_TABLE)
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        ddb = boto3.client("dynamodb", region_name="us-east-1")
+        ddb.create_table(
+            TableName=CHECKPOINTS_TABLE,
+            KeySchema=[
+                {"AttributeName": "thread_id", "KeyType": "HASH"},
+                {"AttributeName": "checkpoint_id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "thread_id", "AttributeType": "S"},
+                {"AttributeName": "checkpoint_id", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        ddb.create_table(
+            TableName=WRITES_TABLE,
+            KeySchema=[
+                {"AttributeName": "thread_id_checkpoint_id_checkpoint_ns", "KeyType": "HASH"},
+                {"AttributeName": "task_id_idx", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "thread_id_checkpoint_id_checkpoint_ns", "AttributeType": "S"},
+                {"AttributeName": "task_id_idx", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield ddb
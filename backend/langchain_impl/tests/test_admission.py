@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from langchain_impl.admission import AdmissionController, AdmissionRejected
+from langchain_impl.metrics import Registry
+
+
+def make_controller(**kwargs) -> AdmissionController:
+    defaults = dict(max_concurrency=2, max_queue=2, queue_timeout=1.0, retry_after=3, registry=Registry())
+    defaults.update(kwargs)
+    return AdmissionController(**defaults)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_never_exceeds_limit():
+    controller = make_controller(max_concurrency=2, max_queue=10)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with controller.admit():
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work() for _ in range(8)))
+
+    assert peak == 2
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_immediately_with_429():
+    controller = make_controller(max_concurrency=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.admit():
+            await release.wait()
+
+    holders = [asyncio.create_task(hold()) for _ in range(2)]  # one running, one queued
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    with pytest.raises(AdmissionRejected) as exc:
+        await controller.acquire()
+    assert exc.value.status_code == 429 and exc.value.retry_after == 3
+    assert time.perf_counter() - started < 0.05
+
+    release.set()
+    await asyncio.gather(*holders)
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_is_rejected_with_503_and_counted():
+    registry = Registry()
+    controller = make_controller(max_concurrency=1, max_queue=5, queue_timeout=0.05, registry=registry)
+
+    await controller.acquire()
+    with pytest.raises(AdmissionRejected) as exc:
+        await controller.acquire()
+    controller.release()
+
+    assert exc.value.status_code == 503
+    assert controller.queue_depth == 0 and controller.in_flight == 0
+    assert registry.counter("chat_admission_rejected_total", "").value(reason="queue_timeout") == 1
+
+
+@pytest.mark.asyncio
+async def test_admitted_latency_stays_flat_under_overload():
+    # 50 simultaneous requests against capacity 4 + queue 4: the excess is shed, and
+    # the worst admitted request waits at most one service time in the queue.
+    registry = Registry()
+    controller = make_controller(max_concurrency=4, max_queue=4, queue_timeout=1.0, registry=registry)
+    service_time = 0.05
+    latencies, rejected = [], 0
+
+    async def request():
+        nonlocal rejected
+        started = time.perf_counter()
+        try:
+            async with controller.admit():
+                await asyncio.sleep(service_time)
+        except AdmissionRejected:
+            rejected += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(request() for _ in range(50)))
+
+    assert len(latencies) == 8 and rejected == 42
+    assert max(latencies) < service_time * 2 + 0.05
+    wait = registry.histogram("chat_queue_wait_seconds", "")
+    assert wait.count() == 8
@@ -0,0 +1,265 @@
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+pytest.importorskip("moto")
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+
+from langchain_impl import app
+from langchain_impl.checkpointers import (
+    BufferedCheckpointSaver,
+    CachedCheckpointSaver,
+    build_checkpointer,
+    build_dynamodb_saver,
+    flush_checkpoints,
+    with_cache,
+)
+from langchain_impl.metrics import REGISTRY
+from langchain_impl.tracing import TimedCheckpointSaver
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import WRITES_TABLE, tool_call_reply
+
+def _count_writes(saver):
+    """Count PutItem/BatchWriteItem calls made by a DynamoDBSaver."""
+    calls = {"PutItem": 0, "BatchWriteItem": 0}
+
+    def _record(event_name, **kwargs):
+        op = event_name.split(".")[-1]
+        if op in calls:
+            calls[op] += 1
+
+    for client in (saver.client, saver.dynamodb.meta.client):
+        client.meta.events.register("before-call.dynamodb", _record)
+    return calls
+
+
+def _run_tool_turn(stub_llm_factory, fake_embeddings, checkpointer, thread_id):
+    store = InMemoryStore(fake_embeddings)
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    llm = stub_llm_factory(tool_call_reply("portal"), AIMessage(content="answer"))
+    config = {"configurable": {"thread_id": thread_id}}
+    with patch("langchain_impl.app.llm", llm), patch("langchain_impl.app.vector_store", store):
+        graph = app.build_graph(checkpointer=checkpointer)
+        graph.invoke({"messages": [HumanMessage(content="What is the portal?")]}, config=config)
+    return graph, config
+
+
+def test_buffered_saver_writes_once_per_turn(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    plain = build_checkpointer("dynamodb")
+    plain_calls = _count_writes(plain)
+    _run_tool_turn(stub_llm_factory, fake_embeddings, plain, "plain")
+
+    buffered = build_checkpointer("dynamodb-buffered")
+    assert isinstance(buffered, BufferedCheckpointSaver)
+    buffered_calls = _count_writes(buffered.inner)
+    _, config = _run_tool_turn(stub_llm_factory, fake_embeddings, buffered, "buffered")
+
+    assert buffered_calls == {"PutItem": 0, "BatchWriteItem": 0}  # nothing written mid-turn
+    flush_checkpoints(buffered, config)
+
+    plain_total = sum(plain_calls.values())
+    buffered_total = sum(buffered_calls.values())
+    print(f"\nDynamoDB writes per tool turn: DynamoDBSaver={plain_calls} buffered={buffered_calls}")
+    assert buffered_calls["PutItem"] == 1
+    assert buffered_total < plain_total
+
+
+def test_buffered_saver_reads_its_own_writes_then_round_trips(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    buffered = build_checkpointer("dynamodb-buffered")
+
+    graph, config = _run_tool_turn(stub_llm_factory, fake_embeddings, buffered, "thread-1")
+    assert buffered.has_pending(config)
+    before_flush = graph.get_state(config).values["messages"]
+    assert before_flush[-1].content == "answer"
+
+    flush_checkpoints(buffered, config)
+    assert not buffered.has_pending(config)
+
+    # A fresh saver only sees what reached DynamoDB
+    restored = build_checkpointer("dynamodb").get_tuple(config)
+    assert [m.content for m in restored.checkpoint["channel_values"]["messages"]] == [m.content for m in before_flush]
+    assert restored.parent_config is None  # first persisted turn has no parent
+
+
+def test_second_turn_is_chained_to_the_previous_persisted_turn(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    buffered = build_checkpointer("dynamodb-buffered")
+
+    _, config = _run_tool_turn(stub_llm_factory, fake_embeddings, buffered, "thread-2")
+    flush_checkpoints(buffered, config)
+    first_id = buffered.get_tuple(config).config["configurable"]["checkpoint_id"]
+
+    _run_tool_turn(stub_llm_factory, fake_embeddings, buffered, "thread-2")
+    flush_checkpoints(buffered, config)
+
+    # Walk the stored chain with get_tuple (DynamoDBSaver.list is unusable with this serde)
+    fresh = build_checkpointer("dynamodb")
+    latest = fresh.get_tuple(config)
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first_id
+    assert len(latest.checkpoint["channel_values"]["messages"]) == 8
+    assert fresh.get_tuple(latest.parent_config).parent_config is None
+
+
+def _count_reads(saver):
+    """Count full checkpoint reads (GetItem / unprojected Query) and pending-write queries."""
+    calls = {"checkpoint_reads": 0, "probes": 0, "writes_queries": 0}
+
+    def _record(event_name, params, **kwargs):
+        op = event_name.split(".")[-1]
+        if op not in ("Query", "GetItem"):
+            return
+        if params["TableName"] == WRITES_TABLE:
+            calls["writes_queries"] += 1
+        elif params.get("ProjectionExpression") == "checkpoint_id":
+            calls["probes"] += 1
+        else:
+            calls["checkpoint_reads"] += 1
+
+    saver.dynamodb.meta.client.meta.events.register("provide-client-params.dynamodb", _record)
+    return calls
+
+
+def test_cached_saver_serves_warm_turns_without_reading_checkpoints(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    lookups = REGISTRY.counter("checkpoint_cache_lookups_total", "")
+    hits_before = lookups.value(kind="latest", result="hit")
+
+    cached = with_cache(build_dynamodb_saver(), max_entries=16)
+    assert isinstance(cached, CachedCheckpointSaver)
+    calls = _count_reads(cached.inner)
+
+    _run_tool_turn(stub_llm_factory, fake_embeddings, cached, "warm")
+    _run_tool_turn(stub_llm_factory, fake_embeddings, cached, "warm")
+
+    # Each turn starts with a latest read: first one finds nothing, second one hits the cache
+    assert calls["checkpoint_reads"] == 0
+    assert calls["writes_queries"] == 0
+    assert calls["probes"] == 2
+    assert lookups.value(kind="latest", result="hit") == hits_before + 1
+
+
+def test_cached_saver_never_serves_a_checkpoint_another_worker_superseded(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    worker_a = with_cache(build_dynamodb_saver(), max_entries=16)
+    worker_b = with_cache(build_dynamodb_saver(), max_entries=16)
+
+    graph_a, config = _run_tool_turn(stub_llm_factory, fake_embeddings, worker_a, "shared")
+    _run_tool_turn(stub_llm_factory, fake_embeddings, worker_b, "shared")  # B continues the thread
+
+    # A still has its own turn cached, but must see B's newer checkpoint
+    assert len(graph_a.get_state(config).values["messages"]) == 8
+
+
+def test_cached_saver_rereads_a_checkpoint_after_writes_against_it():
+    cached = CachedCheckpointSaver(MemorySaver(), max_entries=4)
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": ""}}
+    saved = cached.put(config, empty_checkpoint(), {}, {})
+    assert cached.get_tuple(saved).pending_writes == []
+
+    cached.inner.put_writes(saved, [("messages", "from another worker")], "task-0")
+    cached.put_writes(saved, [("messages", "hi")], "task-1")
+    assert sorted(cached.get_tuple(saved).pending_writes) == [
+        ("task-0", "messages", "from another worker"),
+        ("task-1", "messages", "hi"),
+    ]
+
+
+def test_cache_is_bounded():
+    saver = CachedCheckpointSaver(MemorySaver(), max_entries=2)
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": ""}}
+    for _ in range(3):
+        checkpoint = empty_checkpoint()
+        config = saver.put(config, checkpoint, {}, {})
+    assert len(saver._entries) == 2
+    assert saver.get_tuple(config).checkpoint["id"] == config["configurable"]["checkpoint_id"]
+
+
+class _FailingOnce(MemorySaver):
+    def __init__(self):
+        super().__init__()
+        self.failures = [RuntimeError("throttled")]
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        if self.failures:
+            raise self.failures.pop()
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+def test_failed_flush_keeps_the_turn_buffered(stub_llm_factory, fake_embeddings):
+    buffered = BufferedCheckpointSaver(_FailingOnce())
+    graph, config = _run_tool_turn(stub_llm_factory, fake_embeddings, buffered, "flaky")
+
+    with pytest.raises(RuntimeError):
+        flush_checkpoints(buffered, config)
+    assert buffered.has_pending(config)
+    assert graph.get_state(config).values["messages"][-1].content == "answer"
+
+    assert flush_checkpoints(buffered, config) > 0
+    assert not buffered.has_pending(config)
+    assert buffered.inner.get_tuple(config).checkpoint["channel_values"]["messages"][-1].content == "answer"
+
+
+@pytest.mark.asyncio
+async def test_buffered_saver_async_api():
+    buffered = BufferedCheckpointSaver(MemorySaver())
+    config = {"configurable": {"thread_id": "async", "checkpoint_ns": ""}}
+    saved = await buffered.aput(config, empty_checkpoint(), {}, {})
+    await buffered.aput_writes(saved, [("messages", "hi")], "task-1")
+
+    assert (await buffered.aget_tuple(config)).pending_writes == [("task-1", "messages", "hi")]
+    assert [t.config async for t in buffered.alist(config)] == [saved]
+    assert buffered.inner.get_tuple(config) is None
+
+    assert await buffered.aflush(config) == 2
+    stored = await buffered.inner.aget_tuple(config)
+    assert stored.config["configurable"]["checkpoint_id"] == saved["configurable"]["checkpoint_id"]
+    assert stored.pending_writes == [("task-1", "messages", "hi")]
+
+
+class _RecordingPaths(MemorySaver):
+    def __init__(self):
+        super().__init__()
+        self.task_paths = []
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.task_paths.append(task_path)
+        super().put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        self.put_writes(config, writes, task_id, task_path)
+
+
+@pytest.mark.parametrize("wrap", [
+    lambda inner: CachedCheckpointSaver(inner),
+    lambda inner: TimedCheckpointSaver(inner),
+    lambda inner: BufferedCheckpointSaver(inner),
+], ids=["cached", "timed", "buffered"])
+@pytest.mark.asyncio
+async def test_wrappers_forward_task_path(wrap):
+    inner = _RecordingPaths()
+    saver = wrap(inner)
+    config = {"configurable": {"thread_id": "paths", "checkpoint_ns": ""}}
+    saved = saver.put(config, empty_checkpoint(), {}, {})
+    saver.put_writes(saved, [("messages", "hi")], "task-1", "~__pregel_pull, agent")
+    await saver.aput_writes(saved, [("messages", "again")], "task-2", "~__pregel_pull, tools")
+    flush_checkpoints(saver, saved)
+
+    assert sorted(inner.task_paths) == ["~__pregel_pull, agent", "~__pregel_pull, tools"]
+
+
+@pytest.mark.asyncio
+async def test_cached_saver_async_api():
+    cached = CachedCheckpointSaver(MemorySaver(), max_entries=4)
+    config = {"configurable": {"thread_id": "async", "checkpoint_ns": ""}}
+    saved = await cached.aput(config, empty_checkpoint(), {}, {})
+    await cached.aput_writes(saved, [("messages", "hi")], "task-1")
+
+    hits = cached._lookups.value(kind="by_id", result="hit")
+    for _ in range(2):  # the writes evicted the entry: reloaded once, then served from the cache
+        assert (await cached.aget_tuple(saved)).pending_writes == [("task-1", "messages", "hi")]
+    assert cached._lookups.value(kind="by_id", result="hit") == hits + 1
+    assert [t.config async for t in cached.alist(config)] == [saved]
+
+    await cached.adelete_thread("async")
+    assert not cached._entries
+    assert await cached.aget_tuple(saved) is None
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from langchain_impl.coalesce import SingleFlight, normalize_question
+from langchain_impl.metrics import Registry
+
+
+def test_normalize_question_ignores_case_whitespace_and_trailing_punctuation():
+    assert normalize_question("  How do I get an   API key?") == "how do i get an api key"
+    assert normalize_question("how do I get an API key") == "how do i get an api key"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_execution():
+    registry = Registry()
+    flights = SingleFlight(registry)
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    results = await asyncio.gather(*(flights.do("q", work) for _ in range(5)))
+
+    assert runs == 1
+    assert [r for r, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert registry.counter("chat_coalesced_requests_total", "").value() == 4
+    assert not flights.in_flight("q")
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_followers_and_key_is_released():
+    flights = SingleFlight(Registry())
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    results = await asyncio.gather(flights.do("q", boom), flights.do("q", boom), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return 1
+
+    assert await flights.do("q", ok) == (1, False)  # not cached: next caller runs again
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation_leaves_followers_running():
+    flights = SingleFlight(Registry())
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    leader = asyncio.ensure_future(flights.do("q", work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do("q", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()  # e.g. the leader's client disconnected
+
+    assert await follower == ("answer", True)
+    assert leader.cancelled() and runs == 1
+    assert not flights.in_flight("q")
@@ -0,0 +1,143 @@
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+pytest.importorskip("moto")
+
+from langchain_impl import app
+from langchain_impl.checkpointers import build_checkpointer
+from langchain_impl.compaction import CheckpointCompactor, format_report, writes_partition_key
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import CHECKPOINTS_TABLE, WRITES_TABLE, tool_call_reply
+
+
+def _run_turns(stub_llm_factory, fake_embeddings, thread_id, turns):
+    store = InMemoryStore(fake_embeddings)
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    llm = stub_llm_factory(tool_call_reply("portal"), AIMessage(content="answer"))
+    config = {"configurable": {"thread_id": thread_id}}
+    with patch("langchain_impl.app.llm", llm), patch("langchain_impl.app.vector_store", store):
+        graph = app.build_graph(checkpointer=build_checkpointer("dynamodb"))
+        for i in range(turns):
+            graph.invoke({"messages": [HumanMessage(content=f"question {i}")]}, config=config)
+    return graph, config
+
+
+def _checkpoint_ids(ddb, thread_id):
+    resp = ddb.query(
+        TableName=CHECKPOINTS_TABLE,
+        KeyConditionExpression="thread_id = :t",
+        ExpressionAttributeValues={":t": {"S": thread_id}},
+    )
+    return sorted(item["checkpoint_id"]["S"] for item in resp["Items"])
+
+
+def _write_count(ddb):
+    return ddb.scan(TableName=WRITES_TABLE, Select="COUNT")["Count"]
+
+
+def test_compaction_keeps_last_n_and_thread_still_resumes(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    ddb = dynamodb_tables
+    graph, config = _run_turns(stub_llm_factory, fake_embeddings, "long-thread", turns=3)
+    before_ids = _checkpoint_ids(ddb, "long-thread")
+    messages_before = graph.get_state(config).values["messages"]
+    writes_before = _write_count(ddb)
+
+    stats = CheckpointCompactor(CHECKPOINTS_TABLE, WRITES_TABLE, keep_last=2).run()
+    print("\n" + format_report(stats))
+
+    after_ids = _checkpoint_ids(ddb, "long-thread")
+    assert after_ids == before_ids[-2:]
+    assert stats.checkpoints_deleted == len(before_ids) - 2
+    assert stats.writes_deleted > 0
+    assert _write_count(ddb) == writes_before - stats.writes_deleted
+    assert stats.bytes_reclaimed > 0
+    assert set(stats.hydration_after) == {"long-thread"}
+
+    # The latest state is untouched and the thread keeps working
+    with patch("langchain_impl.app.vector_store", InMemoryStore(fake_embeddings)):
+        fresh = app.build_graph(checkpointer=build_checkpointer("dynamodb"))
+    assert [m.content for m in fresh.get_state(config).values["messages"]] == [m.content for m in messages_before]
+
+
+def _put_write(ddb, thread_id, checkpoint_id, idx=0):
+    ddb.put_item(
+        TableName=WRITES_TABLE,
+        Item={
+            "thread_id_checkpoint_id_checkpoint_ns": {"S": writes_partition_key(thread_id, checkpoint_id, "")},
+            "task_id_idx": {"S": f"task:::{idx}"},
+            "channel": {"S": "messages"},
+            "type": {"S": "msgpack"},
+            "value": {"B": b"x" * 100},
+        },
+    )
+
+
+def test_orphaned_writes_are_pruned(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    ddb = dynamodb_tables
+    _run_turns(stub_llm_factory, fake_embeddings, "thread-o", turns=1)
+    _put_write(ddb, "thread-o", "missing")
+    writes_before = _write_count(ddb)
+
+    stats = CheckpointCompactor(CHECKPOINTS_TABLE, WRITES_TABLE, keep_last=100).run()
+
+    assert stats.checkpoints_deleted == 0
+    assert stats.orphaned_writes_deleted == 1
+    assert _write_count(ddb) == writes_before - 1
+
+
+def test_ttl_mode_marks_instead_of_deleting(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    ddb = dynamodb_tables
+    _run_turns(stub_llm_factory, fake_embeddings, "thread-t", turns=2)
+    ids = _checkpoint_ids(ddb, "thread-t")
+
+    compactor = CheckpointCompactor(CHECKPOINTS_TABLE, WRITES_TABLE, keep_last=1, ttl_seconds=3600)
+    stats = compactor.compact_thread("thread-t")
+
+    assert stats.checkpoints_deleted == 0
+    assert stats.checkpoints_expiring == len(ids) - 1
+    assert _checkpoint_ids(ddb, "thread-t") == ids
+    items = ddb.scan(TableName=CHECKPOINTS_TABLE)["Items"]
+    marked = {i["checkpoint_id"]["S"] for i in items if "expires_at" in i}
+    assert marked == set(ids[:-1])
+
+    # Already-marked checkpoints are not re-extended on the next run
+    assert compactor.compact_thread("thread-t").checkpoints_expiring == 0
+
+
+def test_writes_of_a_checkpoint_created_during_the_scan_are_kept(dynamodb_tables, stub_llm_factory, fake_embeddings):
+    ddb = dynamodb_tables
+    _run_turns(stub_llm_factory, fake_embeddings, "thread-r", turns=1)
+    compactor = CheckpointCompactor(CHECKPOINTS_TABLE, WRITES_TABLE, keep_last=100)
+    scan = compactor.writes.scan
+
+    def scan_while_a_turn_lands(**kwargs):
+        # another worker stores a checkpoint, then its writes, as the scan starts
+        ddb.put_item(TableName=CHECKPOINTS_TABLE, Item={"thread_id": {"S": "thread-r"}, "checkpoint_id": {"S": "new"}})
+        _put_write(ddb, "thread-r", "new")
+        return scan(**kwargs)
+
+    compactor.writes.scan = scan_while_a_turn_lands
+    writes_before = _write_count(ddb)
+    stats = compactor.prune_orphaned_writes(["thread-r"])
+
+    assert stats.orphaned_writes_deleted == 0
+    assert _write_count(ddb) == writes_before + 1  # the new write included
+
+
+def test_orphan_scan_is_bounded_and_resumable(dynamodb_tables):
+    ddb = dynamodb_tables
+    for idx in range(5):
+        _put_write(ddb, "thread-p", "missing", idx)
+    compactor = CheckpointCompactor(CHECKPOINTS_TABLE, WRITES_TABLE)
+
+    first = compactor.prune_orphaned_writes(["thread-p"], max_scanned=3)
+    assert first.orphan_writes_scanned == 3
+    assert first.orphaned_writes_deleted == 3
+    assert first.orphan_scan_resume_key is not None
+
+    rest = compactor.prune_orphaned_writes(["thread-p"], start_key=first.orphan_scan_resume_key)
+    assert rest.orphaned_writes_deleted == 2
+    assert rest.orphan_scan_resume_key is None
+    assert _write_count(ddb) == 0
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from langchain_impl import app, deadline
+from langchain_impl.deadline import DEGRADATIONS, with_deadline
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import tool_call_reply
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    # scaled down so the tests run in well under a second
+    monkeypatch.setattr(deadline, "GENERATE_RESERVE_S", 0.2)
+    monkeypatch.setattr(deadline, "ROUTER_MIN_S", 0.1)
+    monkeypatch.setattr(deadline, "LOW_BUDGET_S", 0.5)
+    monkeypatch.setattr(deadline, "LOW_BUDGET_MESSAGES", 2)
+
+
+@pytest.fixture
+def run_turn(monkeypatch, stub_llm_factory, fake_embeddings, budgets):
+    store = InMemoryStore(fake_embeddings)
+    store.add_documents([Document(page_content=f"Portal doc {i}", metadata={"i": i}) for i in range(6)])
+    monkeypatch.setattr(app, "vector_store", store)
+
+    def _run(seconds, *replies, latency=0.0, history=()):
+        llm = stub_llm_factory(*replies, latency=latency)
+        monkeypatch.setattr(app, "llm", llm)
+        config = with_deadline({"configurable": {"thread_id": f"d-{time.monotonic_ns()}"}}, seconds)
+        started = time.perf_counter()
+        state = app.build_graph().invoke({"messages": [*history, HumanMessage(content="portal?")]}, config=config)
+        return state["messages"], llm.calls, time.perf_counter() - started
+
+    return _run
+
+
+def _degradations():
+    return {kind: DEGRADATIONS.value(kind=kind) for kind in ("skip_router", "router_timeout", "reduced_k", "short_context")}
+
+
+def test_ample_budget_runs_the_full_graph(run_turn):
+    before = _degradations()
+    messages, calls, _ = run_turn(5.0, tool_call_reply("portal"), AIMessage(content="answer"))
+    assert len(calls) == 2
+    assert len(next(m for m in messages if isinstance(m, ToolMessage)).artifact) == 2
+    assert _degradations() == before
+
+
+def test_low_budget_skips_the_router_and_answers_from_fallback_docs(run_turn):
+    before = _degradations()
+    messages, calls, _ = run_turn(0.25, AIMessage(content="answer"))
+
+    assert len(calls) == 1  # generate only
+    assert not any(isinstance(m, ToolMessage) for m in messages)
+    system_prompt = calls[0][0].content
+    assert system_prompt.count("Content: Portal doc") == 2  # k=5 halved
+    assert messages[-1].content == "answer"
+    after = _degradations()
+    assert after["skip_router"] == before["skip_router"] + 1
+    assert after["reduced_k"] == before["reduced_k"] + 1
+
+
+def test_slow_router_is_abandoned_when_its_budget_runs_out(run_turn):
+    before = _degradations()
+    # router would take 2s; with a 0.6s deadline it gets 0.4s before generate's reserve
+    messages, calls, elapsed = run_turn(
+        0.6, tool_call_reply("portal"), AIMessage(content="answer"), latency=[2.0, 0.0],
+    )
+    assert elapsed < 1.0
+    assert messages[-1].content == "answer"
+    assert not any(isinstance(m, ToolMessage) for m in messages)
+    assert _degradations()["router_timeout"] == before["router_timeout"] + 1
+
+
+def test_low_budget_shortens_the_generate_context(run_turn):
+    history = [HumanMessage(content=f"earlier question {i}") for i in range(4)]
+    before = _degradations()
+    _, calls, _ = run_turn(0.45, tool_call_reply("portal"), AIMessage(content="answer"), history=history)
+
+    generate_prompt = calls[-1]
+    assert [m.content for m in generate_prompt[1:]] == ["earlier question 3", "portal?"]
+    assert _degradations()["short_context"] == before["short_context"] + 1
+
+
+class _RecordingEmbeddings(FakeEmbeddings):
+    timeouts: list = []
+
+    def embed_query(self, text, timeout=None):
+        self.timeouts.append(timeout)
+        return super().embed_query(text)
+
+
+def test_every_stage_times_out_with_the_deadline(run_turn, monkeypatch):
+    embeddings = _RecordingEmbeddings(size=16, timeouts=[])
+    store = InMemoryStore(deadline.DeadlineEmbeddings(embeddings))
+    store.add_documents([Document(page_content="Portal doc")])
+    monkeypatch.setattr(app, "vector_store", store)
+
+    run_turn(5.0, tool_call_reply("portal"), AIMessage(content="answer"))
+    router, generate = app.llm.timeouts
+    [embedding] = embeddings.timeouts
+
+    assert router <= 5.0 - deadline.GENERATE_RESERVE_S  # generate's reserve is held back
+    assert 5.0 > embedding > generate > 0  # later stages get what is left when they start
+
+
+def test_slow_generate_times_out(run_turn):
+    with pytest.raises(TimeoutError):
+        run_turn(0.3, AIMessage(content="answer"), latency=2.0)
+
+
+def test_no_timeout_without_a_deadline(stub_llm_factory):
+    llm = stub_llm_factory(AIMessage(content="answer"))
+    deadline.with_timeout(llm).invoke("hi")
+    assert llm.timeouts == [None]
+    assert deadline.DeadlineEmbeddings(FakeEmbeddings(size=4))._kwargs() == {}
+
+
+def test_no_deadline_outside_a_request():
+    assert deadline.remaining() == float("inf")
+    assert deadline.remaining(with_deadline({"configurable": {}}, 0)) == float("inf")
@@ -0,0 +1,39 @@
+from langchain_impl.metrics import Registry
+
+
+def test_counter_and_gauge_render_with_labels():
+    registry = Registry()
+    rejected = registry.counter("rejected_total", "Rejected requests")
+    depth = registry.gauge("queue_depth", "Queue depth")
+
+    rejected.inc(reason="queue_full")
+    rejected.inc(2, reason="queue_full")
+    depth.set(3)
+    depth.dec()
+
+    assert rejected.value(reason="queue_full") == 3
+    text = registry.render()
+    assert "# TYPE rejected_total counter" in text
+    assert 'rejected_total{reason="queue_full"} 3' in text
+    assert "queue_depth 2" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    wait = registry.histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 5.0):
+        wait.observe(value)
+
+    assert wait.count() == 3
+    assert wait.sum() == 5.55
+    text = registry.render()
+    assert 'wait_seconds_bucket{le="0.1"} 1' in text
+    assert 'wait_seconds_bucket{le="1"} 2' in text
+    assert 'wait_seconds_bucket{le="+Inf"} 3' in text
+    assert "wait_seconds_count 3" in text
+
+
+def test_registry_returns_same_metric_for_same_name():
+    registry = Registry()
+    assert registry.counter("hits_total", "Hits") is registry.counter("hits_total", "Hits")
@@ -1,7 +1,7 @@
 # test_your_module.py
 
 import pytest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 from langchain_core.documents import Document
 from langchain_impl.app import _retrieve_core
 
@@ -22,4 +22,30 @@ def test_retrieve_core_with_real_document():
         "Source: {'source': 'doc1'}\nContent: Content of document 1\n\n"
         "Source: {'source': 'doc2'}\nContent: Content of document 2"
     )
-    assert serialized == expected_serialized
\ No newline at end of file
+    assert serialized == expected_serialized
+
+def test_stream_answer_streams_generate_tokens_then_final_state(stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_impl import app
+    from langchain_impl.vector_stores import InMemoryStore
+    from tests.conftest import tool_call_reply
+
+    store = InMemoryStore(fake_embeddings)
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    llm = stub_llm_factory(tool_call_reply("portal"), AIMessage(content="The portal hosts videos"))
+
+    with patch("langchain_impl.app.llm", llm), patch("langchain_impl.app.vector_store", store):
+        graph = app.build_graph()
+        events = list(app.stream_answer(
+            graph,
+            {"messages": [HumanMessage(content="What is the portal?")]},
+            config={"configurable": {"thread_id": "stream-test"}},
+        ))
+
+    tokens = [payload for kind, payload in events if kind == "token"]
+    assert tokens == ["The", " portal", " hosts", " videos"]  # router tool call is not streamed
+
+    kind, final_state = events[-1]
+    assert kind == "final"
+    assert final_state["messages"][-1].content == "The portal hosts videos"
+    assert app.turn_sources(final_state["messages"]) == [{"source": "portal"}]
@@ -1,6 +1,9 @@
+import asyncio
+import json
 import pytest
 import httpx
 from langchain_impl.server import api  # FastAPI app
+from langchain_impl.vector_stores import InMemoryStore
 
 
 @pytest.mark.asyncio
@@ -35,3 +38,212 @@ async def test_chat_endpoint_with_empty_message():
 
     assert resp.status_code == 400, resp.text
     assert resp.json()["detail"] == "messages must be a non-empty list"
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_endpoint_sends_tokens_then_end_event(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+    from langchain_impl.vector_stores import InMemoryStore
+
+    monkeypatch.setattr(app, "llm", stub_llm_factory(AIMessage(content="Hello there")))
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+
+    payload = {"session_id": "stream-session-1", "messages": [{"role": "user", "content": "Hi"}]}
+
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        resp = await ac.post("/api/chat/stream", json=payload)
+
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in resp.text.strip().split("\n\n")
+    ]
+    assert [e for e, _ in events] == ["token", "token", "end"]
+    assert "".join(d["text"] for e, d in events if e == "token") == "Hello there"
+    assert events[-1][1] == {"session_id": "stream-session-1", "reply": "Hello there", "sources": []}
+
+
+@pytest.mark.asyncio
+async def test_chat_rejects_with_retry_after_when_saturated(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+    from langchain_impl.admission import AdmissionController
+    from langchain_impl.metrics import Registry
+
+    monkeypatch.setattr(app, "llm", stub_llm_factory(AIMessage(content="ok"), latency=0.2))
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+    monkeypatch.setattr(server, "admission", AdmissionController(
+        max_concurrency=1, max_queue=0, queue_timeout=1.0, retry_after=2, registry=Registry(),
+    ))
+
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        responses = await asyncio.gather(*(
+            ac.post("/api/chat", json={"messages": [{"role": "user", "content": f"Question {i}"}]})
+            for i in range(3)
+        ))
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200, 429, 429]
+    assert all(r.headers["Retry-After"] == "2" for r in responses if r.status_code == 429)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+async def test_chat_stream_releases_its_slot_when_the_client_leaves_before_the_body(
+    monkeypatch, stub_llm_factory, fake_embeddings, spec_version
+):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+    from langchain_impl.admission import AdmissionController
+    from langchain_impl.metrics import Registry
+
+    monkeypatch.setattr(app, "llm", stub_llm_factory(AIMessage(content="ok")))
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+    controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=1.0, registry=Registry())
+    monkeypatch.setattr(server, "admission", controller)
+
+    response = await server.chat_stream(server.ChatRequest(messages=[{"role": "user", "content": "Hi"}]))
+    assert controller.in_flight == 1
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    # 2.0: the disconnect cancels the response before its body starts; 2.4: the first send fails
+    try:
+        await response({"type": "http", "asgi": {"spec_version": spec_version}}, receive, send)
+    except Exception:
+        pass
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text():
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        resp = await ac.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE chat_queue_depth gauge" in resp.text
+
+
+@pytest.mark.asyncio
+async def test_identical_first_turns_share_one_graph_run(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+    from langchain_impl.coalesce import SingleFlight
+    from langchain_impl.metrics import Registry
+
+    llm = stub_llm_factory(AIMessage(content="Use the portal"), latency=0.2)
+    registry = Registry()
+    monkeypatch.setattr(app, "llm", llm)
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+    monkeypatch.setattr(server, "flights", SingleFlight(registry))
+
+    questions = ["How do I get an API key?", "how do i get an API key", "  How do I get an api key?"] * 2
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        responses = await asyncio.gather(*(
+            ac.post("/api/chat", json={"messages": [{"role": "user", "content": q}]}) for q in questions
+        ))
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    assert {r.json()["reply"] for r in responses} == {"Use the portal"}
+    assert len(llm.calls) == 2  # one router call + one generate call for all six requests
+    assert registry.counter("chat_coalesced_requests_total", "").value() == 5
+
+    # every request still owns a checkpointed thread with its own question in it
+    session_ids = {r.json()["session_id"] for r in responses}
+    assert len(session_ids) == len(questions)
+    for r, q in zip(responses, questions):
+        state = server.graph.get_state({"configurable": {"thread_id": r.json()["session_id"]}})
+        contents = [m.content for m in state.values["messages"]]
+        assert q in contents and contents[-1] == "Use the portal"
+        assert state.next == ()
+
+    # followers carry the leader's usage records: the ledger shows what their answer cost
+    ledgers = [
+        server.graph.get_state({"configurable": {"thread_id": r.json()["session_id"]}}).values.get("usage", [])
+        for r in responses
+    ]
+    assert ledgers[0] and all(ledger == ledgers[0] for ledger in ledgers)
+    # ... and its turn counter, so their next turn is turn 2
+    assert {
+        server.graph.get_state({"configurable": {"thread_id": r.json()["session_id"]}}).values.get("turn")
+        for r in responses
+    } == {1}
+
+
+async def _thread_sizes(mode: str, turns: int) -> list[int]:
+    """Run `turns` chat turns in the given protocol mode and record the thread length after each."""
+    from langchain_impl import server
+
+    transport = httpx.ASGITransport(app=api)
+    history, sizes, session_id = [], [], None
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        for turn in range(turns):
+            new = {"role": "user", "content": f"question {turn}"}
+            if mode == "delta":
+                new["id"] = f"user-{turn}"
+            history.append(new)
+            payload = {"session_id": session_id, "mode": mode, "messages": [new] if mode == "delta" else list(history)}
+            resp = await ac.post("/api/chat", json=payload)
+            assert resp.status_code == 200, resp.text
+            session_id = resp.json()["session_id"]
+            history.append({"role": "assistant", "content": resp.json()["reply"]})
+
+            state = server.get_graph().get_state({"configurable": {"thread_id": session_id}})
+            sizes.append(len(state.values["messages"]))
+    return sizes
+
+
+@pytest.mark.asyncio
+async def test_delta_mode_keeps_thread_state_linear_in_turns(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+
+    monkeypatch.setattr(app, "llm", stub_llm_factory(AIMessage(content="answer")))
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+    monkeypatch.setattr(server, "COALESCE_FIRST_TURNS", False)
+
+    delta = await _thread_sizes("delta", turns=6)
+    full = await _thread_sizes("full", turns=6)
+
+    # nudge once + (user, router reply, answer) per turn
+    assert delta == [1 + 3 * n for n in range(1, 7)]
+    # legacy clients resend the whole (id-less) conversation, which is re-appended every turn
+    growth = [b - a for a, b in zip(full, full[1:])]
+    assert growth == sorted(growth) and growth[-1] > growth[0]
+    assert full[-1] > 2 * delta[-1]
+
+
+@pytest.mark.asyncio
+async def test_delta_mode_rejects_already_processed_messages(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_core.messages import AIMessage
+    from langchain_impl import app, server
+
+    monkeypatch.setattr(app, "llm", stub_llm_factory(AIMessage(content="answer")))
+    monkeypatch.setattr(app, "vector_store", InMemoryStore(fake_embeddings))
+    monkeypatch.setattr(server, "graph", app.build_graph())
+
+    message = {"role": "user", "content": "hello", "id": "msg-1"}
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        first = await ac.post("/api/chat", json={"session_id": "delta-dup", "mode": "delta", "messages": [message]})
+        retry = await ac.post("/api/chat", json={"session_id": "delta-dup", "mode": "delta", "messages": [message]})
+
+    assert first.status_code == 200
+    assert retry.status_code == 409
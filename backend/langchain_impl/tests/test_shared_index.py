@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from langchain_impl.shared_index import MmapVectorStore, build_index, ensure_index
+from tests.conftest import RandomEmbeddings
+
+DIM = RandomEmbeddings().size
+DOCS = 20_000  # ~30 MB of float32 vectors
+
+
+def _memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def _worker(path, copy, barrier, results):
+    before = _memory_kb()
+    store = MmapVectorStore(path, RandomEmbeddings())
+    if copy:
+        store.vectors = np.array(store.vectors)  # what a per-process in-memory index costs
+    hits = store.search_by_vector(np.ones(DIM, dtype=np.float32), k=3)  # touches every vector page
+    barrier.wait()  # every worker has the index mapped before anyone measures
+    after = _memory_kb()
+    results.put({k: after[k] - before[k] for k in after} | {"hits": [i for i, _ in hits]})
+    barrier.wait()
+
+
+def _run_workers(path, copy, workers=4):
+    ctx = multiprocessing.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, copy, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    deltas = [results.get(timeout=60) for _ in procs]
+    for p in procs:
+        p.join(timeout=60)
+    return deltas
+
+
+def test_search_matches_cosine_ranking(tmp_path):
+    docs = [Document(page_content=f"doc {i}", metadata={"source": f"s{i}"}) for i in range(50)]
+    embeddings = RandomEmbeddings(size=8)
+    store = ensure_index(str(tmp_path / "idx"), embeddings, lambda: docs)
+
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]))
+    query = embeddings.embed_query("q")
+    cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = list(np.argsort(-cosine)[:3])
+
+    found = store.similarity_search("q", k=3)
+    assert [d.page_content for d in found] == [f"doc {i}" for i in expected]
+    assert found[0].metadata == {"source": f"s{expected[0]}"}
+    with pytest.raises(TypeError):
+        store.add_documents(docs)
+
+
+def test_ensure_index_builds_once(tmp_path):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return [Document(page_content="only")]
+
+    path = str(tmp_path / "idx")
+    ensure_index(path, RandomEmbeddings(size=4), load)
+    ensure_index(path, RandomEmbeddings(size=4), load)
+    assert len(calls) == 1
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux /proc smaps")
+def test_workers_share_one_copy_of_the_index(tmp_path):
+    path = str(tmp_path / "idx")
+    build_index(path, [Document(page_content=f"chunk {i}") for i in range(DOCS)], RandomEmbeddings())
+    index_kb = os.path.getsize(os.path.join(path, "vectors.npy")) // 1024
+
+    shared = _run_workers(path, copy=False)
+    copied = _run_workers(path, copy=True)
+
+    total_pss_shared = sum(d["pss"] for d in shared)
+    total_pss_copied = sum(d["pss"] for d in copied)
+    print(f"\nindex {index_kb} kB; 4 workers PSS growth: mmapped {total_pss_shared} kB, per-process copy {total_pss_copied} kB")
+
+    assert len({tuple(d["hits"]) for d in shared}) == 1
+    # mapped pages are shared: each worker's private memory barely moves, together they account for ~one copy
+    assert all(d["private"] < index_kb * 0.1 for d in shared)
+    assert total_pss_shared < index_kb * 1.5
+    # versus one private copy per worker
+    assert all(d["private"] > index_kb * 0.9 for d in copied)
+    assert total_pss_copied > index_kb * 3.5
@@ -0,0 +1,173 @@
+import gc
+import os
+import threading
+import time
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+from langchain_impl.metrics import REGISTRY
+from langchain_impl.snapshots import InMemorySnapshotBuilder, SharedSnapshotBuilder, SnapshotStore
+from tests.conftest import RandomEmbeddings
+
+
+def _docs(tag, n=3):
+    return [Document(page_content=f"{tag} {i}", metadata={"tag": tag}) for i in range(n)]
+
+
+def test_searches_never_block_while_a_rebuild_runs(fake_embeddings):
+    store = SnapshotStore(InMemorySnapshotBuilder(fake_embeddings))
+    store.rebuild(lambda: _docs("old"))
+    old_version = store.version
+
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait(5)
+        return _docs("new")
+
+    rebuild = threading.Thread(target=store.rebuild, args=(slow_load,))
+    rebuild.start()
+    assert loading.wait(5)
+
+    latencies = []
+    for _ in range(50):
+        started = time.perf_counter()
+        hits = store.similarity_search("anything", k=3)
+        latencies.append(time.perf_counter() - started)
+        assert {d.metadata["tag"] for d in hits} == {"old"}
+    assert store.rebuilding
+    assert store.rebuild(lambda: _docs("other")) is False  # one rebuild at a time
+    assert max(latencies) < 0.05
+
+    release.set()
+    rebuild.join(5)
+    assert store.version != old_version
+    assert {d.metadata["tag"] for d in store.similarity_search("anything", k=3)} == {"new"}
+
+
+def test_old_snapshot_is_freed_once_its_readers_finish(fake_embeddings):
+    store = SnapshotStore(InMemorySnapshotBuilder(fake_embeddings))
+    store.rebuild(lambda: _docs("v1"))
+    reader = store.snapshot  # an in-flight search holding the old snapshot
+
+    store.rebuild(lambda: _docs("v2"))
+    gc.collect()
+    assert store.live_snapshots() == 2
+    assert reader.store.similarity_search("x", k=1)[0].metadata["tag"] == "v1"
+
+    live = REGISTRY.gauge("index_snapshots_live", "").value()
+    del reader
+    gc.collect()
+    assert store.live_snapshots() == 1
+    assert REGISTRY.gauge("index_snapshots_live", "").value() == live - 1
+
+
+def test_add_documents_publishes_a_copy(fake_embeddings):
+    store = SnapshotStore(InMemorySnapshotBuilder(fake_embeddings))
+    before = store.snapshot
+    store.add_documents(_docs("a", 2))
+    store.add_documents(_docs("b", 2))
+    assert len(store.snapshot.documents) == 4
+    assert before.store is None  # earlier snapshots are untouched
+    assert {d.metadata["tag"] for d in store.similarity_search("q", k=4)} == {"a", "b"}
+
+
+def test_add_documents_embeds_only_the_new_documents(fake_embeddings):
+    embedded = []
+
+    class CountingEmbeddings(type(fake_embeddings)):
+        def embed_documents(self, texts):
+            embedded.append(len(texts))
+            return super().embed_documents(texts)
+
+    store = SnapshotStore(InMemorySnapshotBuilder(CountingEmbeddings(size=16)))
+    store.rebuild(lambda: _docs("base", 50))
+    base = store.snapshot
+    store.add_documents(_docs("new", 2))
+
+    assert embedded == [50, 2]
+    assert len(base.store.similarity_search("q", k=100)) == 50  # the previous snapshot is not extended
+    assert len(store.similarity_search("q", k=100)) == 52
+
+
+def test_shared_snapshots_reach_other_workers(tmp_path):
+    path = str(tmp_path / "index")
+    embeddings = RandomEmbeddings(size=8)
+    worker_a = SnapshotStore(SharedSnapshotBuilder(path, embeddings))
+    worker_b = SnapshotStore(SharedSnapshotBuilder(path, embeddings))
+
+    worker_a.rebuild(lambda: _docs("v1"), max_age=float("inf"))
+    worker_b.rebuild(lambda: _docs("never built"), max_age=float("inf"))  # already exists: just attaches
+    assert worker_b.version == worker_a.version
+    assert worker_b.similarity_search("q", k=1)[0].metadata["tag"] == "v1"
+
+    for tag in ("v2", "v3"):
+        worker_a.rebuild(lambda: _docs(tag))
+    assert worker_b.sync()
+    assert worker_b.version == worker_a.version
+    assert worker_b.similarity_search("q", k=1)[0].metadata["tag"] == "v3"
+    # current + the one just superseded are kept
+    assert len([n for n in os.listdir(path) if n.startswith("v")]) == 2
+
+
+def test_searches_attach_to_newer_shared_snapshots(tmp_path):
+    path = str(tmp_path / "index")
+    embeddings = RandomEmbeddings(size=8)
+    worker_a = SnapshotStore(SharedSnapshotBuilder(path, embeddings))
+    worker_b = SnapshotStore(SharedSnapshotBuilder(path, embeddings), sync_interval=0)
+    throttled = SnapshotStore(SharedSnapshotBuilder(path, embeddings), sync_interval=3600)
+
+    worker_a.rebuild(lambda: _docs("v1"))
+    # no refresh timer (INDEX_REFRESH_INTERVAL_S=0): the search itself picks up the new version
+    assert worker_b.similarity_search("q", k=1)[0].metadata["tag"] == "v1"
+    worker_a.rebuild(lambda: _docs("v2"))
+    assert worker_b.similarity_search("q", k=1)[0].metadata["tag"] == "v2"
+    assert worker_b.version == worker_a.version
+
+    assert throttled.similarity_search("q", k=1) == []  # checks the version at most once an hour
+
+
+def test_cli_indexes_through_the_snapshot_store(tmp_path, monkeypatch, stub_llm_factory):
+    from langchain_impl import app, web_scrape
+
+    monkeypatch.setenv("VECTOR_INDEX_PATH", str(tmp_path / "index"))
+    monkeypatch.setenv("CHECKPOINTER_BACKEND", "memory")
+    monkeypatch.setattr(app, "vector_store", None)
+    monkeypatch.setattr(app, "embeddings", RandomEmbeddings(size=8))
+    monkeypatch.setattr(app, "llm", stub_llm_factory())
+    monkeypatch.setattr(web_scrape, "fetch_documentation", lambda url: "docs")
+    monkeypatch.setattr(web_scrape, "split_document", lambda doc: _docs("cli"))
+    monkeypatch.setattr("builtins.input", lambda prompt="": "q")
+
+    app.main()  # used to call add_documents, which a shared index refuses
+    assert app.vector_store.similarity_search("q", k=1)[0].metadata["tag"] == "cli"
+
+
+@pytest.mark.asyncio
+async def test_admin_reindex_swaps_the_index_reported_by_health(monkeypatch, fake_embeddings):
+    from langchain_impl import app, server
+
+    store = SnapshotStore(InMemorySnapshotBuilder(fake_embeddings))
+    store.rebuild(lambda: _docs("v1"))
+    monkeypatch.setattr(app, "vector_store", store)
+    monkeypatch.setattr(server, "load_documentation", lambda: _docs("v2"))
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "s3cret")
+
+    transport = httpx.ASGITransport(app=server.api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        assert (await ac.get("/health")).json() == {"status": "ok", "index_version": "1"}
+        assert (await ac.post("/admin/reindex")).status_code == 403
+        assert (await ac.post("/admin/reindex", headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+        resp = await ac.post("/admin/reindex", headers={"X-Admin-Token": "s3cret"})
+        assert resp.status_code == 202
+        assert resp.json() == {"status": "started", "index_version": "1"}
+
+        # the rebuild runs as a background task after the response
+        health = (await ac.get("/health")).json()
+
+    assert health["index_version"] == "2"
+    assert store.similarity_search("q", k=1)[0].metadata["tag"] == "v2"
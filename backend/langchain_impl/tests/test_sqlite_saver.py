@@ -0,0 +1,120 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from langchain_impl import app
+from langchain_impl.checkpointers import build_checkpointer
+from langchain_impl.sqlite_saver import SqliteCheckpointSaver
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import tool_call_reply
+
+
+@pytest.fixture
+def graph_factory(stub_llm_factory, fake_embeddings):
+    store = InMemoryStore(fake_embeddings)
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    llm = stub_llm_factory(tool_call_reply("portal"), AIMessage(content="answer"))
+    with patch("langchain_impl.app.llm", llm), patch("langchain_impl.app.vector_store", store):
+        yield lambda checkpointer: app.build_graph(checkpointer=checkpointer)
+
+
+def _turn(graph, thread_id, text="What is the portal?"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return graph.invoke({"messages": [HumanMessage(content=text)]}, config=config), config
+
+
+def test_sqlite_backend_survives_restart(tmp_path, monkeypatch, graph_factory):
+    monkeypatch.setenv("SQLITE_CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite"))
+    saver = build_checkpointer("sqlite")
+    assert isinstance(saver, SqliteCheckpointSaver)
+    _turn(graph_factory(saver), "t1")
+    saver.close()
+
+    reopened = build_checkpointer("sqlite")
+    state, config = _turn(graph_factory(reopened), "t1", "and again?")
+    assert len(state["messages"]) == 8
+
+    history = list(reopened.list(config))
+    assert history[0].checkpoint["id"] == reopened.get_tuple(config).checkpoint["id"]
+    assert [t.checkpoint["id"] for t in history] == sorted((t.checkpoint["id"] for t in history), reverse=True)
+    assert history[0].parent_config["configurable"]["checkpoint_id"] == history[1].checkpoint["id"]
+    assert list(reopened.list(config, filter={"source": "input"}))
+    assert len(list(reopened.list(config, limit=2))) == 2
+
+    reopened.delete_thread("t1")
+    assert reopened.get_tuple(config) is None
+
+
+def test_sqlite_async_interface(tmp_path, graph_factory):
+    saver = SqliteCheckpointSaver(str(tmp_path / "async.sqlite"))
+    graph = graph_factory(saver)
+    config = {"configurable": {"thread_id": "a1"}}
+
+    async def run():
+        await graph.ainvoke({"messages": [HumanMessage(content="What is the portal?")]}, config=config)
+        tup = await saver.aget_tuple(config)
+        listed = [t async for t in saver.alist(config, limit=3)]
+        return tup, listed
+
+    tup, listed = asyncio.run(run())
+    assert tup.checkpoint["channel_values"]["messages"][-1].content == "answer"
+    assert len(listed) == 3 and listed[0].config == tup.config
+
+
+def test_sqlite_pool_handles_concurrent_threads(tmp_path, graph_factory):
+    saver = SqliteCheckpointSaver(str(tmp_path / "pool.sqlite"), pool_size=4)
+    graph = graph_factory(saver)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: _turn(graph, f"c{i}"), range(16)))
+
+    # the shared stub interleaves replies across threads, so compare against each thread's own result
+    for state, config in results:
+        stored = saver.get_tuple(config).checkpoint["channel_values"]["messages"]
+        assert [m.id for m in stored] == [m.id for m in state["messages"]]
+
+
+def test_per_turn_overhead_by_backend(tmp_path, graph_factory, dynamodb_tables):
+    turns = 10
+    backends = {
+        "memory": MemorySaver(),
+        "sqlite": SqliteCheckpointSaver(str(tmp_path / "bench.sqlite")),
+        "dynamodb (moto)": build_checkpointer("dynamodb"),
+    }
+
+    timings = {}
+    for name, saver in backends.items():
+        graph = graph_factory(saver)
+        _turn(graph, "warmup")
+        started = time.perf_counter()
+        for _ in range(turns):
+            _turn(graph, f"bench-{name}")
+        timings[name] = (time.perf_counter() - started) / turns * 1000
+
+    print("\nper-turn latency (tool path, stub LLM): " + ", ".join(f"{k}={v:.1f} ms" for k, v in timings.items()))
+    assert timings["sqlite"] < timings["dynamodb (moto)"]
+
+
+def test_sqlite_list_reads_a_page_in_two_statements(graph_factory):
+    saver = SqliteCheckpointSaver(":memory:")
+    state, config = _turn(graph_factory(saver), "l1")
+    expected = {t.checkpoint["id"]: t.pending_writes for t in (saver.get_tuple(t.config) for t in saver.list(config))}
+
+    statements = []
+    with saver.pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+    listed = list(saver.list(config))
+    limited = list(saver.list(config, limit=2))
+
+    assert {t.checkpoint["id"]: t.pending_writes for t in listed} == expected
+    assert any(writes for writes in expected.values())
+    assert [t.config for t in limited] == [t.config for t in listed[:2]]
+    # checkpoints + pending writes per call, with the limit in the SELECT
+    assert len(statements) == 4
+    assert statements[2].endswith("LIMIT 2")
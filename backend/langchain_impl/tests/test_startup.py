@@ -0,0 +1,59 @@
+# Startup cost guard: importing the app/server must stay cheap and offline.
+# Uses `python -X importtime` in a fresh interpreter so earlier test imports don't hide regressions.
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules that only belong behind an accessor / lifespan, never on the import path
+HEAVY_MODULES = (
+    "langchain_openai",
+    "openai",
+    "tiktoken",
+    "langgraph_checkpoint_dynamodb",
+    "boto3",
+    "langchain_community",
+    "uvicorn",
+)
+
+# Generous default so slow CI boxes pass; tighten locally with IMPORT_BUDGET_MS
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "5000"))
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """Return {module: cumulative import time in microseconds} for a fresh `import module`."""
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    profile: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+@pytest.mark.parametrize("module", ["langchain_impl.app", "langchain_impl.server"])
+def test_import_does_not_load_heavy_modules(module):
+    profile = import_profile(module)
+
+    loaded = sorted(name for name in profile if name.split(".")[0] in HEAVY_MODULES)
+    assert loaded == [], f"{module} eagerly imports: {loaded}"
+
+
+def test_server_import_time_within_budget():
+    profile = import_profile("langchain_impl.server")
+
+    import_ms = profile["langchain_impl.server"] / 1000
+    print(f"\n[startup] langchain_impl.server imported in {import_ms:.0f} ms")
+    assert import_ms < IMPORT_BUDGET_MS
@@ -0,0 +1,84 @@
+import json
+import logging
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from langchain_impl import tracing
+from langchain_impl.tracing import STAGE_ERRORS, STAGE_SECONDS, TimedEmbeddings, span
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import tool_call_reply
+
+STAGES = (
+    "node.query_or_respond",
+    "node.tools",
+    "node.generate",
+    "vector.similarity_search",
+    "embeddings.embed_query",
+    "checkpoint.get_tuple",
+    "checkpoint.put",
+    "checkpoint.put_writes",
+)
+
+
+@pytest.fixture
+def log_lines():
+    lines = []
+    handler = logging.Handler()
+    handler.emit = lambda record: lines.append(json.loads(record.getMessage()))
+    tracing.logger.addHandler(handler)
+    yield lines
+    tracing.logger.removeHandler(handler)
+
+
+def test_span_records_latency_and_errors():
+    before = STAGE_SECONDS.count(stage="test.span"), STAGE_ERRORS.value(stage="test.span")
+    with span("test.span"):
+        pass
+    with pytest.raises(ValueError):
+        with span("test.span"):
+            raise ValueError("boom")
+    assert STAGE_SECONDS.count(stage="test.span") == before[0] + 2
+    assert STAGE_ERRORS.value(stage="test.span") == before[1] + 1
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_is_timed_per_stage_and_logged_when_sampled(monkeypatch, stub_llm_factory, fake_embeddings, log_lines):
+    from langchain_impl import app, server
+
+    store = InMemoryStore(TimedEmbeddings(fake_embeddings))
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    monkeypatch.setattr(app, "llm", stub_llm_factory(tool_call_reply("portal"), AIMessage(content="answer")))
+    monkeypatch.setattr(app, "vector_store", store)
+    monkeypatch.setattr(server, "graph", app.build_graph())
+    monkeypatch.setattr(tracing, "LOG_SAMPLE_RATE", 1.0)
+
+    before = {stage: STAGE_SECONDS.count(stage=stage) for stage in STAGES}
+    transport = httpx.ASGITransport(app=server.api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        resp = await ac.post("/api/chat", json={"session_id": "trace-1", "messages": [{"role": "user", "content": "Portal?"}]})
+        assert resp.status_code == 200, resp.text
+
+        monkeypatch.setattr(tracing, "LOG_SAMPLE_RATE", 0.0)
+        resp = await ac.post("/api/chat", json={"session_id": "trace-2", "messages": [{"role": "user", "content": "Again?"}]})
+        assert resp.status_code == 200, resp.text
+        exposition = (await ac.get("/metrics")).text
+
+    for stage in STAGES:
+        assert STAGE_SECONDS.count(stage=stage) > before[stage], stage
+    assert STAGE_SECONDS.count(stage="node.tools") == before["node.tools"] + 2
+    assert 'stage_duration_seconds_bucket{stage="node.generate",le="+Inf"}' in exposition
+
+    # only the sampled request logged, one line per event rather than per message
+    assert [line["event"] for line in log_lines] == ["chat.request", "chat.response"]
+    request, response = log_lines
+    assert request["thread_id"] == "trace-1" and request["roles"] == ["system", "human"]
+    assert response["duration_ms"] > 0 and response["coalesced"] is False
+
+
+def test_errors_are_logged_even_when_unsampled(log_lines):
+    tracing.log_event("chat.request", sample=False, thread_id="t")
+    tracing.log_event("chat.error", sample=False, level=logging.ERROR, error="boom")
+    assert log_lines == [{"event": "chat.error", "error": "boom"}]
@@ -0,0 +1,100 @@
+import httpx
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from langchain_impl import usage
+from langchain_impl.usage import MeteredEmbeddings, per_turn, request_usage
+from langchain_impl.vector_stores import InMemoryStore
+from tests.conftest import tool_call_reply
+
+
+def _reply(content, prompt, completion):
+    message = tool_call_reply("portal") if not content else AIMessage(content=content)
+    message.usage_metadata = {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+    return message
+
+
+@pytest.fixture
+def metered_graph(monkeypatch, stub_llm_factory, fake_embeddings):
+    from langchain_impl import app, server
+
+    monkeypatch.setattr(usage, "count_tokens", lambda text: len(text.split()))
+    store = InMemoryStore(MeteredEmbeddings(fake_embeddings))
+    store.add_documents([Document(page_content="Portal docs", metadata={"source": "portal"})])
+    # router asks for the tool, then generate answers
+    llm = stub_llm_factory(_reply("", 100, 10), _reply("answer", 150, 20))
+    monkeypatch.setattr(app, "llm", llm)
+    monkeypatch.setattr(app, "vector_store", store)
+    graph = app.build_graph()
+    monkeypatch.setattr(server, "graph", graph)
+    return graph
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_turn_and_session_usage_when_asked(metered_graph):
+    from langchain_impl import server
+
+    transport = httpx.ASGITransport(app=server.api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        payload = {"session_id": "u1", "messages": [{"role": "user", "content": "what is the portal"}]}
+        plain = (await ac.post("/api/chat", json=payload)).json()
+        payload["include_usage"] = True
+        payload["messages"].append({"role": "user", "content": "and the api"})
+        data = (await ac.post("/api/chat", json=payload)).json()
+
+    assert "usage" not in plain
+    # one turn = router (100/10) + retrieve (1 query word embedded) + generate (150/20)
+    turn = dict(data["usage"]["turn"])
+    assert turn.pop("cost_usd") > 0
+    assert turn == {"prompt_tokens": 250, "completion_tokens": 30, "embedding_tokens": 1, "total_tokens": 281}
+    assert data["usage"]["session"]["total_tokens"] == 2 * 281
+
+
+def test_ledger_is_checkpointed_and_reports_growth_per_turn(metered_graph):
+    config = {"configurable": {"thread_id": "u2"}}
+    for text in ("first question", "second question", "third question"):
+        metered_graph.invoke({"messages": [{"role": "user", "content": text}]}, config=config)
+
+    records = metered_graph.get_state(config).values["usage"]
+    assert [(r["turn"], r["node"]) for r in records[:3]] == [(1, "query_or_respond"), (1, "tools"), (1, "generate")]
+
+    rows = per_turn(records)
+    assert [r["turn"] for r in rows] == [1, 2, 3]
+    assert [r["cumulative_tokens"] for r in rows] == [281, 562, 843]
+    assert request_usage(records)["turn"]["total_tokens"] == 281
+
+
+def test_turns_are_counted_per_run_not_per_user_message(metered_graph):
+    config = {"configurable": {"thread_id": "u4"}}
+    # a new session that replays earlier messages in its first request
+    history = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "ok"}, {"role": "user", "content": "second"}]
+    metered_graph.invoke({"messages": history}, config=config)
+    metered_graph.invoke({"messages": [{"role": "user", "content": "third"}]}, config=config)
+
+    state = metered_graph.get_state(config).values
+    assert state["turn"] == 2
+    assert [r["turn"] for r in per_turn(state["usage"])] == [1, 2]
+
+
+def test_threads_without_a_counter_continue_from_their_ledger(metered_graph):
+    config = {"configurable": {"thread_id": "u5"}}
+    metered_graph.invoke({"messages": [{"role": "user", "content": "first"}]}, config=config)
+    # as stored before the counter existed
+    ledger = [dict(r, turn=4) for r in metered_graph.get_state(config).values["usage"]]
+    metered_graph.update_state(config, {"usage": ledger, "turn": None})
+
+    metered_graph.invoke({"messages": [{"role": "user", "content": "next"}]}, config=config)
+    assert metered_graph.get_state(config).values["turn"] == 5
+
+
+def test_usage_report_cli_reads_the_checkpoint(metered_graph, capsys, monkeypatch):
+    from langchain_impl import checkpointers
+
+    metered_graph.invoke({"messages": [{"role": "user", "content": "hello"}]}, config={"configurable": {"thread_id": "u3"}})
+    monkeypatch.setattr(checkpointers, "build_checkpointer", lambda backend=None: metered_graph.checkpointer)
+
+    usage.main(["u3", "missing"])
+    out = capsys.readouterr().out
+    assert "thread u3" in out and "(no usage recorded)" in out
+    assert "   1      250          30          1      281         281" in out
@@ -42,25 +42,32 @@ api.interceptors.request.use(
   }
 );
 
-export async function getConversations(userId: string, token: string): Promise<ConversationMetadata[]> {
-    const res = await api.get<ConversationMetadata[]>(`/rag/bedrock/conversation/${userId}`, {
+// Listings are paged: each response carries the cursor of the next page in X-Next-Cursor.
+async function getAllPages<T>(url: string, token: string, combine: (items: T[], page: T[]) => T[]): Promise<T[]> {
+  let items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await api.get<T[]>(url, {
       headers: {
         Authorization: `Bearer ${token}`,
       },
+      params: cursor ? { cursor } : undefined,
       timeout: 30000
     });
+    items = combine(items, res.data);
+    cursor = res.headers["x-next-cursor"];
+  } while (cursor);
+  return items;
+}
 
-    return res.data;
+export async function getConversations(userId: string, token: string): Promise<ConversationMetadata[]> {
+    // most recently updated first, so later pages go after
+    return getAllPages<ConversationMetadata>(`/rag/bedrock/conversation/${userId}`, token, (items, page) => [...items, ...page]);
 }
 
 export async function getMessages(sessionId: string, token: string): Promise<Message[]> {
-  const res = await api.get<Message[]>(`/rag/bedrock/messages/${sessionId}`, {
-    headers: {
-        Authorization: `Bearer ${token}`,
-      },
-      timeout: 30000
-  });
-  return res.data;
+  // each page is oldest first, and the cursor leads to older messages, so later pages go before
+  return getAllPages<Message>(`/rag/bedrock/messages/${sessionId}`, token, (items, page) => [...page, ...items]);
 }
 
 export async function deleteConversation(sessionId: string, token: string): Promise<string> {